@@ -0,0 +1,398 @@
+"""
+Price analytics over the price-history store, served from rollups
+
+Dashboards ask the same few questions of months of history: how has the
+cheapest price for each check-in date moved, what does it cost now compared
+to the previous scrape, how does price depend on how far ahead one books,
+and which hotel is cheapest for each date. Scanning daily_prices for these
+is proportional to the history; instead every write to the store also
+updates two rollup tables in the same transaction (see update_rollups):
+
+    check_in_rollups   (hotel_id, check_in) -> cheapest price per scrape day
+                       (packed arrays, prices as float64), min/max/sum over
+                       scrapes, and the latest and previous scrape's
+                       cheapest price
+    lead_time_rollups  (hotel_id, lead_days) -> count/sum/min/max of the
+                       cheapest price of scrapes made lead_days before check-in
+                       (hotel_id ALL_HOTELS sums every hotel)
+    current_prices     hotel_id -> the latest cheapest price of every check-in
+                       date, packed in an array('d') indexed by day (NaN where
+                       unknown), so comparing hotels slices one array per hotel;
+                       it covers at most MAX_CURRENT_DAYS days up to the
+                       hotel's latest check-in date
+
+A scrape's "cheapest price" is its lowest available room price; scrapes
+with no available room are not rolled up. Queries read one row per
+(hotel, check-in date), (hotel, lead day) or hotel, whatever the length of
+the history, and return columnar results (one list per field).
+"""
+
+import sqlite3
+from array import array
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS check_in_rollups (
+    hotel_id TEXT NOT NULL,
+    check_in TEXT NOT NULL,
+    scrapes INTEGER NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    sum_price REAL NOT NULL,
+    days BLOB NOT NULL,
+    day_mins BLOB NOT NULL,
+    last_scraped_at TEXT NOT NULL,
+    last_price REAL NOT NULL,
+    prev_scraped_at TEXT,
+    prev_price REAL,
+    PRIMARY KEY (hotel_id, check_in)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lead_time_rollups (
+    hotel_id TEXT NOT NULL,
+    lead_days INTEGER NOT NULL,
+    scrapes INTEGER NOT NULL,
+    sum_price REAL NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    PRIMARY KEY (hotel_id, lead_days)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS current_prices (
+    hotel_id TEXT PRIMARY KEY,
+    first_day INTEGER NOT NULL,
+    prices BLOB NOT NULL
+);
+"""
+
+UPSERT_LEAD_TIME = """
+INSERT INTO lead_time_rollups (hotel_id, lead_days, scrapes, sum_price, min_price, max_price)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (hotel_id, lead_days) DO UPDATE SET
+    scrapes = scrapes + excluded.scrapes, sum_price = sum_price + excluded.sum_price,
+    min_price = MIN(min_price, excluded.min_price), max_price = MAX(max_price, excluded.max_price)
+"""
+
+UPSERT_CHECK_IN = """
+INSERT OR REPLACE INTO check_in_rollups
+    (hotel_id, check_in, scrapes, min_price, max_price, sum_price, days, day_mins,
+     last_scraped_at, last_price, prev_scraped_at, prev_price)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_CURRENT = "INSERT OR REPLACE INTO current_prices (hotel_id, first_day, prices) VALUES (?, ?, ?)"
+
+# Most hotels compared in one query
+MAX_COMPARE_HOTELS = 500
+
+# Longest span of check-in dates kept in current_prices and compared at once
+MAX_CURRENT_DAYS = 3 * 366
+
+# lead_time_rollups key of the all-hotels curve (normalized hotel ids contain a '/')
+ALL_HOTELS = "*"
+
+NAN = float("nan")
+
+def cheapest_per_scrape(prices: Iterable[tuple]) -> Dict[Tuple[str, str, str], float]:
+    """
+    Lowest available price of each scrape
+
+    Args:
+        prices: daily_prices rows (hotel_id, room_id, check_in, scraped_at, price,
+            currency, available, ...)
+
+    Returns:
+        (hotel_id, check_in, scraped_at) -> price
+    """
+    cheapest: Dict[Tuple[str, str, str], float] = {}
+    for hotel_id, _, check_in, scraped_at, price, _, available, *_ in prices:
+        if not available or price <= 0:
+            continue
+        key = (hotel_id, check_in, scraped_at)
+        if price < cheapest.get(key, float("inf")):
+            cheapest[key] = price
+    return cheapest
+
+def update_rollups(conn: sqlite3.Connection, prices: List[tuple], skip_stored: bool = True) -> None:
+    """
+    Fold price rows about to be written into the rollups
+
+    Call inside the write transaction, before the rows are inserted.
+    Scrapes may arrive in any order.
+
+    Args:
+        conn: Store connection
+        prices: daily_prices rows
+        skip_stored: Leave out scrapes daily_prices already has (a result
+            stored twice is counted once)
+    """
+    cheapest = cheapest_per_scrape(prices)
+    if skip_stored:
+        for key in list(cheapest):
+            if conn.execute("SELECT 1 FROM daily_prices WHERE hotel_id = ? AND check_in = ? "
+                            "AND scraped_at = ? LIMIT 1", key).fetchone():
+                del cheapest[key]
+    if not cheapest:
+        return
+
+    leads: Dict[Tuple[str, int], List[float]] = {}
+    by_check_in: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+    for (hotel_id, check_in, scraped_at), price in cheapest.items():
+        lead_days = date.fromisoformat(check_in).toordinal() - date.fromisoformat(scraped_at[:10]).toordinal()
+        leads.setdefault((hotel_id, lead_days), []).append(price)
+        leads.setdefault((ALL_HOTELS, lead_days), []).append(price)
+        by_check_in.setdefault((hotel_id, check_in), []).append((scraped_at, price))
+
+    conn.executemany(UPSERT_LEAD_TIME, [
+        (hotel_id, lead_days, len(values), sum(values), min(values), max(values))
+        for (hotel_id, lead_days), values in leads.items()
+    ])
+
+    existing = {}
+    for hotel_id, check_in in by_check_in:
+        row = conn.execute("SELECT * FROM check_in_rollups WHERE hotel_id = ? AND check_in = ?",
+                           (hotel_id, check_in)).fetchone()
+        if row is not None:
+            existing[(hotel_id, check_in)] = row
+
+    rows = []
+    for key, scrapes in by_check_in.items():
+        row = existing.get(key)
+        if row is None:
+            count, low, high, total = 0, float("inf"), float("-inf"), 0.0
+            days, day_mins = array("i"), array("d")
+            last_at, last_price, prev_at, prev_price = "", 0.0, None, None
+        else:
+            _, _, count, low, high, total, days_blob, mins_blob, last_at, last_price, prev_at, prev_price = row
+            days, day_mins = array("i"), array("d")
+            days.frombytes(days_blob)
+            day_mins.frombytes(mins_blob)
+
+        for scraped_at, price in scrapes:
+            count += 1
+            low = min(low, price)
+            high = max(high, price)
+            total += price
+            # Days stay sorted; a later scrape the same day can only lower its minimum
+            day = date.fromisoformat(scraped_at[:10]).toordinal()
+            position = bisect_left(days, day)
+            if position < len(days) and days[position] == day:
+                day_mins[position] = min(day_mins[position], price)
+            else:
+                days.insert(position, day)
+                day_mins.insert(position, price)
+            if scraped_at > last_at:
+                if last_at:
+                    prev_at, prev_price = last_at, last_price
+                last_at, last_price = scraped_at, price
+            elif scraped_at != last_at and (prev_at is None or scraped_at > prev_at):
+                prev_at, prev_price = scraped_at, price
+
+        rows.append((*key, count, low, high, total, days.tobytes(), day_mins.tobytes(),
+                     last_at, last_price, prev_at, prev_price))
+    conn.executemany(UPSERT_CHECK_IN, rows)
+
+    current: Dict[str, Dict[int, float]] = {}
+    for hotel_id, check_in, *_, last_price, _, _ in rows:
+        current.setdefault(hotel_id, {})[date.fromisoformat(check_in).toordinal()] = last_price
+    conn.executemany(UPSERT_CURRENT, [
+        (hotel_id, *_updated_prices(conn, hotel_id, prices)) for hotel_id, prices in current.items()
+    ])
+
+def _updated_prices(conn: sqlite3.Connection, hotel_id: str, updates: Dict[int, float]) -> Tuple[int, bytes]:
+    """
+    A hotel's current_prices array with updates (day ordinal -> price) applied
+
+    Days more than MAX_CURRENT_DAYS before the latest check-in date are
+    dropped, so a far-off date cannot grow the array without bound.
+    """
+    row = conn.execute("SELECT first_day, prices FROM current_prices WHERE hotel_id = ?",
+                       (hotel_id,)).fetchone()
+    prices = array("d")
+    first_day, last_day = min(updates), max(updates)
+    if row is not None:
+        prices.frombytes(row[1])
+        first_day = min(first_day, row[0])
+        last_day = max(last_day, row[0] + len(prices) - 1)
+    first_day = max(first_day, last_day - MAX_CURRENT_DAYS + 1)
+    if row is not None:
+        # Cut the stored array to the window, then grow it to cover the new days at either end
+        prices = prices[max(first_day - row[0], 0):]
+        prices = array("d", [NAN]) * max(row[0] - first_day, 0) + prices
+    prices.extend(array("d", [NAN]) * (last_day - first_day + 1 - len(prices)))
+    for day, price in updates.items():
+        if day >= first_day:
+            prices[day - first_day] = price
+    # Start at the first known price (NaN is the only value that is not equal to itself)
+    known = next(offset for offset, price in enumerate(prices) if price == price)
+    return first_day + known, prices[known:].tobytes()
+
+def rebuild_rollups(conn: sqlite3.Connection, batch_size: int = 50000) -> None:
+    """Recompute the rollups from daily_prices (for stores written before they existed)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM check_in_rollups")
+        conn.execute("DELETE FROM lead_time_rollups")
+        conn.execute("DELETE FROM current_prices")
+        cursor = conn.execute("SELECT hotel_id, room_id, check_in, scraped_at, price, currency, available "
+                              "FROM daily_prices ORDER BY hotel_id, check_in, scraped_at")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            update_rollups(conn, rows, skip_stored=False)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _median(values: array) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+def _date_filter(start: Optional[str], end: Optional[str]) -> Tuple[str, list]:
+    clause, params = "", []
+    if start:
+        clause += " AND check_in >= ?"
+        params.append(start)
+    if end:
+        clause += " AND check_in <= ?"
+        params.append(end)
+    return clause, params
+
+def check_in_stats(conn: sqlite3.Connection, hotel_id: str, start: Optional[str] = None,
+                   end: Optional[str] = None) -> dict:
+    """
+    Per check-in date statistics of a hotel's cheapest price over its history
+
+    Returns:
+        Columnar dict: checkInDates, min, max and mean (of the cheapest
+        price of every scrape), medianDailyMin (median of the cheapest price
+        of each scrape day, so several scrapes a day count once), current
+        and previous (the last two scrapes), change (current - previous,
+        None after a single scrape) and scrapes
+    """
+    clause, params = _date_filter(start, end)
+    rows = conn.execute(
+        "SELECT check_in, scrapes, min_price, max_price, sum_price, day_mins, last_price, prev_price "
+        f"FROM check_in_rollups WHERE hotel_id = ?{clause} ORDER BY check_in",
+        [hotel_id, *params],
+    ).fetchall()
+    result: Dict[str, list] = {name: [] for name in
+                               ("checkInDates", "min", "max", "mean", "medianDailyMin", "current", "previous",
+                                "change", "scrapes")}
+    for check_in, scrapes, low, high, total, mins_blob, last_price, prev_price in rows:
+        day_mins = array("d")
+        day_mins.frombytes(mins_blob)
+        result["checkInDates"].append(check_in)
+        result["min"].append(low)
+        result["max"].append(high)
+        result["mean"].append(round(total / scrapes, 2))
+        result["medianDailyMin"].append(round(_median(day_mins), 2))
+        result["current"].append(last_price)
+        result["previous"].append(prev_price)
+        result["change"].append(None if prev_price is None else round(last_price - prev_price, 2))
+        result["scrapes"].append(scrapes)
+    return {"hotelId": hotel_id, **result}
+
+def lead_time_curve(conn: sqlite3.Connection, hotel_id: Optional[str] = None,
+                    max_days: Optional[int] = None) -> dict:
+    """
+    Cheapest price by days between scrape and check-in
+
+    Args:
+        hotel_id: One hotel, or every hotel in the store when None
+        max_days: Longest lead time to include
+
+    Returns:
+        Columnar dict: leadDays, mean, min, max and scrapes
+    """
+    query = ("SELECT lead_days, scrapes, sum_price, min_price, max_price FROM lead_time_rollups "
+             "WHERE hotel_id = ? AND lead_days >= 0")
+    params: list = [hotel_id or ALL_HOTELS]
+    if max_days is not None:
+        query += " AND lead_days <= ?"
+        params.append(max_days)
+    rows = conn.execute(query + " ORDER BY lead_days", params).fetchall()
+    return {
+        "hotelId": hotel_id,
+        "leadDays": [row[0] for row in rows],
+        "mean": [round(row[2] / row[1], 2) for row in rows],
+        "min": [row[3] for row in rows],
+        "max": [row[4] for row in rows],
+        "scrapes": [row[1] for row in rows],
+    }
+
+def compare_hotels(conn: sqlite3.Connection, hotel_ids: List[str], start: Optional[str] = None,
+                   end: Optional[str] = None) -> dict:
+    """
+    Current cheapest price of several hotels side by side
+
+    At most MAX_CURRENT_DAYS check-in dates are compared: the first ones
+    from start when it is given, otherwise the last ones.
+
+    Returns:
+        hotelIds, checkInDates, prices[i][j] (current price of hotelIds[j]
+        for checkInDates[i], or None), cheapest[i] (index into hotelIds of
+        the cheapest hotel for the date) and currencies per hotel
+
+    Raises:
+        ValueError: for more than MAX_COMPARE_HOTELS hotels
+    """
+    if len(hotel_ids) > MAX_COMPARE_HOTELS:
+        raise ValueError(f"at most {MAX_COMPARE_HOTELS} hotels can be compared")
+    stored: Dict[str, Tuple[int, array]] = {}
+    currencies: Dict[str, str] = {}
+    if hotel_ids:
+        placeholders = ",".join("?" * len(hotel_ids))
+        for hotel_id, first_day, blob in conn.execute(
+                f"SELECT hotel_id, first_day, prices FROM current_prices WHERE hotel_id IN ({placeholders})",
+                hotel_ids):
+            prices = array("d")
+            prices.frombytes(blob)
+            stored[hotel_id] = (first_day, prices)
+        currencies = dict(conn.execute(
+            f"SELECT hotel_id, currency FROM hotels WHERE hotel_id IN ({placeholders})", hotel_ids))
+
+    result = {"hotelIds": hotel_ids, "currencies": [currencies.get(hotel_id) for hotel_id in hotel_ids],
+              "checkInDates": [], "prices": [], "cheapest": []}
+    if not stored:
+        return result
+    first_day = min(first for first, _ in stored.values())
+    last_day = max(first + len(prices) - 1 for first, prices in stored.values())
+    if start:
+        first_day = max(first_day, date.fromisoformat(start).toordinal())
+    if end:
+        last_day = min(last_day, date.fromisoformat(end).toordinal())
+    if start:
+        last_day = min(last_day, first_day + MAX_CURRENT_DAYS - 1)
+    else:
+        first_day = max(first_day, last_day - MAX_CURRENT_DAYS + 1)
+    if last_day < first_day:
+        return result
+
+    # One column per hotel over [first_day, last_day], NaN where it has no price
+    width = last_day - first_day + 1
+    columns = []
+    for hotel_id in hotel_ids:
+        column = array("d", [NAN]) * width
+        if hotel_id in stored:
+            first, prices = stored[hotel_id]
+            low = max(first, first_day)
+            high = min(first + len(prices) - 1, last_day)
+            if low <= high:
+                column[low - first_day:high - first_day + 1] = prices[low - first:high - first + 1]
+        columns.append(column)
+
+    for offset, row in enumerate(zip(*columns)):
+        # NaN is the only value that is not equal to itself
+        known = [(price, j) for j, price in enumerate(row) if price == price]
+        if not known:
+            continue
+        result["checkInDates"].append(date.fromordinal(first_day + offset).isoformat())
+        result["prices"].append([price if price == price else None for price in row])
+        result["cheapest"].append(min(known)[1])
+    return result
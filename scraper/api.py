@@ -1,11 +1,91 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from scrape import scrape_booking
+from typing import Any, AsyncIterator, List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+from datetime import date
+from scrape import (MAX_RANGE_DATES, async_scrape_booking, async_scrape_booking_range, close_async_client,
+                    normalize_hotel_id, parse_fields, projection_key)
+from archive import close_archive
+from search import SEARCH_MAX_PAGES, async_scrape_search
+from delta import DeltaTracker
+import analytics
+from store import close_store, get_store
+from fetch import fetch_layer
+from parse_pool import close_parse_pool, get_parse_pool
+import metrics
+import profiling
+import serialize
+from jobs import DONE, JOB_MAX_ITEMS, Job, JobManager
+from scheduler import MonitoringScheduler, refresh_interval
+from work_queue import QUEUE_PATH, QueueNode, close_queue, get_queue
+from result_cache import ScrapeCache, cache_key
+from selector_registry import registry as selector_registry
 import uvicorn
 
-app = FastAPI(title="Booking.com Scraper API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up the parse worker processes before the first page arrives
+    parse_pool = get_parse_pool()
+    if parse_pool is not None:
+        await asyncio.get_running_loop().run_in_executor(None, parse_pool.start)
+    # Resume monitoring a watchlist loaded from SCRAPER_WATCHLIST
+    if scheduler.entries():
+        scheduler.start()
+    # Take scrapes from the shared queue alongside the other instances
+    global queue_node
+    queue = get_queue()
+    if queue is not None:
+        queue_node = QueueNode(queue, lambda url, checkin: async_scrape_booking(url, checkin),
+                               store_scheduled_result)
+        queue_node.start()
+    yield
+    await scheduler.stop()
+    if queue_node is not None:
+        # Unfinished tasks go back to the queue for the other instances
+        await queue_node.stop()
+        queue_node = None
+    # Release pooled upstream connections on shutdown
+    await job_manager.close()
+    await close_async_client()
+    close_parse_pool()
+    # Write out buffered price rows, archive pages and index records
+    close_store()
+    close_archive()
+    close_queue()
+
+app = FastAPI(title="Booking.com Scraper API", version="1.0.0", lifespan=lifespan)
+
+# Recent results per (hotel, check-in); see result_cache for TTL/size settings
+scrape_cache = ScrapeCache()
+
+def store_scheduled_result(url: str, checkin: str, result: dict) -> None:
+    """Make a watchlist refresh available to /scrape callers"""
+    scrape_cache.put(cache_key(normalize_hotel_id(url), checkin), result)
+
+async def enqueue_refresh(url: str, checkin: str) -> dict:
+    """Scheduler callback with a shared queue: queue the refresh for whichever instance is free"""
+    days_until = (date.fromisoformat(checkin) - date.today()).days
+    # Every instance's scheduler queues the same targets; skip those refreshed half an interval ago
+    fresh_for = refresh_interval(days_until) / 2
+    await asyncio.get_running_loop().run_in_executor(
+        None, get_queue().enqueue, [(normalize_hotel_id(url), url, checkin)], fresh_for)
+    return {"queued": True}
+
+# Watchlist monitoring; see scheduler.py for budget and interval settings. With
+# SCRAPER_QUEUE_PATH set, refreshes go through the shared queue (work_queue.py)
+if QUEUE_PATH:
+    scheduler = MonitoringScheduler(enqueue_refresh)
+else:
+    scheduler = MonitoringScheduler(lambda url, checkin: async_scrape_booking(url, checkin),
+                                    store_scheduled_result)
+
+# This instance's worker of the shared queue, started with the app
+queue_node: Optional[QueueNode] = None
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,12 +99,196 @@ app.add_middleware(
 class ScrapeRequest(BaseModel):
     url: str
     checkin: str
+    # Only rooms that changed since the last delta scrape of this hotel and date (see delta.py)
+    delta: bool = False
+    # Client-chosen id with its own delta baseline; clients sharing one (or none) share the baseline
+    deltaConsumer: Optional[str] = None
+    # Comma-separated fields to extract, e.g. "rooms,currency" (see scrape.FIELD_GROUPS); all when unset
+    fields: Optional[str] = None
+    maxRooms: Optional[int] = None
+    maxAmenities: Optional[int] = None
 
 class ScrapeResponse(BaseModel):
     success: bool
     data: Optional[dict] = None
     error: Optional[str] = None
 
+class BatchScrapeRequest(BaseModel):
+    items: List[ScrapeRequest]
+    concurrency: Optional[int] = None
+    # Return each result's rooms as one list per field (see serialize.rooms_to_columns)
+    columnar: bool = False
+
+class BatchScrapeResult(ScrapeResponse):
+    index: int
+    url: str
+    checkin: str
+
+class JobRequest(BaseModel):
+    items: List[ScrapeRequest]
+
+class QueueItem(BaseModel):
+    url: str
+    checkin: str
+
+class QueueRequest(BaseModel):
+    items: List[QueueItem]
+    # Skip (hotel, check-in) pairs finished less than this many seconds ago
+    freshSeconds: float = 0.0
+
+class WatchRequest(BaseModel):
+    url: str
+    days: int = 30
+    firstDay: int = 0
+
+class ScrapeRangeRequest(BaseModel):
+    url: str
+    start: str
+    end: str
+    step: int = 1
+    concurrency: Optional[int] = None
+
+class SearchRequest(BaseModel):
+    url: str
+    checkin: str
+    maxPages: Optional[int] = None
+    concurrency: Optional[int] = None
+
+class JSONBytesResponse(Response):
+    """
+    JSON response encoded straight from dicts with serialize.dumps
+    
+    Endpoints returning scrape results use it instead of response models, so
+    large results are neither re-validated nor walked by jsonable_encoder.
+    """
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else serialize.dumps(content)
+
+# Site scrape URLs must be on; point it at a stand-in server (benchmarks/standin.py) to run offline
+BOOKING_BASE_URL = os.environ.get("SCRAPER_BOOKING_BASE_URL", "https://www.booking.com").rstrip("/")
+
+# Number of scrapes a batch runs at once, unless the request asks for fewer/more
+BATCH_CONCURRENCY = int(os.environ.get("SCRAPER_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("SCRAPER_BATCH_MAX_CONCURRENCY", "32"))
+
+# Largest room and amenity limits a request may ask for
+MAX_ROOMS_LIMIT = int(os.environ.get("SCRAPER_MAX_ROOMS_LIMIT", "100"))
+MAX_AMENITIES_LIMIT = int(os.environ.get("SCRAPER_MAX_AMENITIES_LIMIT", "100"))
+# Longest deltaConsumer id (each one keeps its own delta baselines)
+DELTA_CONSUMER_MAX_LENGTH = 128
+
+def validate_url(url: str) -> None:
+    """Raise HTTPException(400) if the URL is not under BOOKING_BASE_URL"""
+    if not url.startswith(BOOKING_BASE_URL + "/"):
+        raise HTTPException(status_code=400, detail=f"URL must be from {BOOKING_BASE_URL}")
+
+def validate_scrape_params(url: str, checkin: str) -> None:
+    """Raise HTTPException(400) if the URL or check-in date is invalid"""
+    # Validate URL
+    validate_url(url)
+    
+    # Validate date format, then that it is a real date (2024-13-45 has the right shape)
+    if len(checkin) != 10 or checkin[4] != '-' or checkin[7] != '-':
+        raise HTTPException(status_code=400, detail="Check-in date must be in YYYY-MM-DD format")
+    try:
+        date.fromisoformat(checkin)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Check-in date {checkin} is not a valid date")
+
+def scrape_options(fields: Optional[str], max_rooms: Optional[int], max_amenities: Optional[int],
+                   delta: bool = False, delta_consumer: Optional[str] = None) -> dict:
+    """Projection keyword arguments for async_scrape_booking; raise HTTPException(400) if invalid"""
+    try:
+        projected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if max_rooms is not None and not 1 <= max_rooms <= MAX_ROOMS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"maxRooms must be between 1 and {MAX_ROOMS_LIMIT}")
+    if max_amenities is not None and not 1 <= max_amenities <= MAX_AMENITIES_LIMIT:
+        raise HTTPException(status_code=400, detail=f"maxAmenities must be between 1 and {MAX_AMENITIES_LIMIT}")
+    if delta and projected is not None and not {"rooms", "currency"} <= projected:
+        raise HTTPException(status_code=400, detail="delta needs the rooms and currency fields")
+    if delta_consumer is not None and len(delta_consumer) > DELTA_CONSUMER_MAX_LENGTH:
+        raise HTTPException(status_code=400,
+                            detail=f"deltaConsumer must be at most {DELTA_CONSUMER_MAX_LENGTH} characters")
+    options = {"fields": projected, "max_rooms": max_rooms, "max_amenities": max_amenities}
+    # Default scrapes keep calling async_scrape_booking(url, checkin)
+    return {name: value for name, value in options.items() if value is not None}
+
+def check_profile_request(profile: bool, admin_token: Optional[str]) -> bool:
+    """Return whether profiling was asked for; raise HTTPException(403) if the admin token is wrong"""
+    if profile and not profiling.authorized(admin_token):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Admin-Token header")
+    return profile
+
+async def sampled_scrape(url: str, checkin: str, **options: Any) -> dict:
+    """Scrape one hotel, profiling it in the background for a sample of calls"""
+    if not profiling.should_sample():
+        return await async_scrape_booking(url, checkin, **options)
+    hotel_data, _ = await profiling.run_profiled(
+        lambda: async_scrape_booking(url, checkin, **options), url, checkin, profiling.SAMPLED
+    )
+    return hotel_data
+
+async def cached_scrape(url: str, checkin: str, response: Optional[Response] = None,
+                        profile: bool = False, options: Optional[dict] = None) -> dict:
+    """
+    Scrape one hotel through the result cache
+    
+    Sets the X-Cache header (HIT, MISS or COALESCED) on response if given.
+    A profiled scrape bypasses the cache (X-Cache: BYPASS) and sets the
+    X-Profile-Id header to the id of the saved profile. Projected scrapes
+    (options from scrape_options) are cached apart from full ones.
+    """
+    options = options or {}
+    if profile:
+        hotel_data, scrape_profile = await profiling.run_profiled(
+            lambda: async_scrape_booking(url, checkin, **options), url, checkin, profiling.REQUESTED
+        )
+        if response is not None:
+            response.headers["X-Cache"] = "BYPASS"
+            response.headers["X-Profile-Id"] = scrape_profile.id
+        return hotel_data
+    
+    fetch = sampled_scrape if profiling.PROFILE_SAMPLE_RATE > 0 else async_scrape_booking
+    hotel_data, cache_status = await scrape_cache.get_or_fetch(
+        cache_key(normalize_hotel_id(url), checkin, projection_key(**options)),
+        lambda: fetch(url, checkin, **options)
+    )
+    if response is not None:
+        response.headers["X-Cache"] = cache_status
+    return hotel_data
+
+# Last room state per (consumer, hotel, check-in) for delta=true callers
+delta_tracker = DeltaTracker()
+
+def apply_delta(url: str, checkin: str, hotel_data: dict, consumer: Optional[str] = None) -> dict:
+    """Reduce a successful result to its changes since the consumer's last delta scrape; errors pass through"""
+    if "error" in hotel_data:
+        return hotel_data
+    return delta_tracker.diff(cache_key(normalize_hotel_id(url), checkin), hotel_data, consumer or "")
+
+def scrape_envelope(hotel_data: dict) -> dict:
+    """A scrape result in the ScrapeResponse shape, as a dict"""
+    if "error" in hotel_data:
+        return {"success": False, "data": None, "error": hotel_data["error"]}
+    return {"success": True, "data": hotel_data, "error": None}
+
+async def run_scrape(url: str, checkin: str, response: Optional[Response] = None,
+                     profile: bool = False, delta: bool = False, options: Optional[dict] = None,
+                     delta_consumer: Optional[str] = None) -> dict:
+    """Scrape one hotel and wrap the outcome in the ScrapeResponse shape"""
+    try:
+        # Scrape the hotel data
+        hotel_data = await cached_scrape(url, checkin, response, profile, options)
+    except Exception as e:
+        return {"success": False, "data": None, "error": f"Internal server error: {str(e)}"}
+    if delta:
+        hotel_data = apply_delta(url, checkin, hotel_data, delta_consumer)
+    return scrape_envelope(hotel_data)
+
 @app.get("/")
 async def root():
     return {"message": "Booking.com Scraper API", "version": "1.0.0"}
@@ -33,77 +297,450 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/stats/selectors")
+async def selector_stats():
+    """
+    Selector hit/miss statistics per selector group and page layout
+    
+    A new layout fingerprint or a falling hit rate usually means Booking.com
+    changed its markup.
+    """
+    return selector_registry.stats()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Result cache hit/miss/eviction counters and size"""
+    return scrape_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms, bytes, selector lookups and errors in Prometheus text format"""
+    # Refreshes the scheduler queue depth and lag gauges
+    scheduler.stats()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "folded",
+                      x_admin_token: Optional[str] = Header(None)):
+    """
+    Download a saved scrape profile (requires the X-Admin-Token header)
+    
+    Args:
+        profile_id: Id from the X-Profile-Id header or the profile directory
+        format: "folded" for collapsed stacks (flamegraph.pl, speedscope) or
+            "json" for the summary (page size, selector path, duration)
+    """
+    if not profiling.authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid X-Admin-Token header")
+    if format not in ("folded", "json"):
+        raise HTTPException(status_code=400, detail="format must be folded or json")
+    path = profiling.profile_path(profile_id, "." + format, profiling.PROFILE_DIR)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    if format == "json":
+        return Response(content, media_type="application/json")
+    return PlainTextResponse(content)
+
 @app.post("/scrape", response_model=ScrapeResponse)
-async def scrape_hotel(request: ScrapeRequest):
+async def scrape_hotel(request: ScrapeRequest, response: Response, profile: bool = False,
+                       x_admin_token: Optional[str] = Header(None)):
     """
     Scrape hotel data from Booking.com
     
     Args:
         request: ScrapeRequest containing URL and check-in date
+        profile: Profile this scrape (requires the X-Admin-Token header)
     
     Returns:
         ScrapeResponse with hotel data or error
     """
+    profile = check_profile_request(profile, x_admin_token)
+    validate_scrape_params(request.url, request.checkin)
+    options = scrape_options(request.fields, request.maxRooms, request.maxAmenities, request.delta,
+                             request.deltaConsumer)
+    result = await run_scrape(request.url, request.checkin, response, profile, request.delta, options,
+                              request.deltaConsumer)
+    # Returning a Response skips response_model validation; keep the X-Cache headers
+    return JSONBytesResponse(result, headers=dict(response.headers))
+
+@app.post("/scrape/batch")
+async def scrape_hotel_batch(request: BatchScrapeRequest):
+    """
+    Scrape many (url, checkin) pairs with bounded concurrency
+    
+    Results are streamed as newline-delimited JSON, one BatchScrapeResult per
+    line, in completion order. Invalid items and failed scrapes are reported
+    inline with success=false; they never fail the whole batch.
+    
+    Args:
+        request: BatchScrapeRequest with the items and an optional concurrency limit
+    
+    Returns:
+        application/x-ndjson stream of BatchScrapeResult
+    """
+    concurrency = request.concurrency or BATCH_CONCURRENCY
+    if concurrency < 1 or concurrency > BATCH_MAX_CONCURRENCY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}"
+        )
+    
+    return StreamingResponse(
+        stream_batch(request.items, concurrency, request.columnar),
+        media_type="application/x-ndjson"
+    )
+
+async def scrape_item(index: int, item: ScrapeRequest, semaphore: Optional[asyncio.Semaphore] = None,
+                      columnar: bool = False) -> dict:
+    """Scrape one item of a batch or job into a BatchScrapeResult-shaped dict; invalid items fail inline"""
     try:
-        # Validate URL
-        if not request.url.startswith("https://www.booking.com"):
-            raise HTTPException(status_code=400, detail="URL must be from booking.com")
-        
-        # Validate date format (basic check)
-        if len(request.checkin) != 10 or request.checkin[4] != '-' or request.checkin[7] != '-':
-            raise HTTPException(status_code=400, detail="Check-in date must be in YYYY-MM-DD format")
-        
-        # Scrape the hotel data
-        hotel_data = scrape_booking(request.url, request.checkin)
-        
-        # Check if scraping was successful
-        if "error" in hotel_data:
-            return ScrapeResponse(
-                success=False,
-                error=hotel_data["error"]
-            )
-        
-        return ScrapeResponse(
-            success=True,
-            data=hotel_data
+        validate_scrape_params(item.url, item.checkin)
+        options = scrape_options(item.fields, item.maxRooms, item.maxAmenities, item.delta, item.deltaConsumer)
+    except HTTPException as e:
+        response = {"success": False, "data": None, "error": e.detail}
+    else:
+        if semaphore is None:
+            response = await run_scrape(item.url, item.checkin, delta=item.delta, options=options,
+                                        delta_consumer=item.deltaConsumer)
+        else:
+            async with semaphore:
+                response = await run_scrape(item.url, item.checkin, delta=item.delta, options=options,
+                                            delta_consumer=item.deltaConsumer)
+    if columnar and response["data"] is not None:
+        response["data"] = serialize.columnar(response["data"])
+    return {**response, "index": index, "url": item.url, "checkin": item.checkin}
+
+async def stream_batch(items: List[ScrapeRequest], concurrency: int,
+                       columnar: bool = False) -> AsyncIterator[bytes]:
+    """Run the batch and yield each result as an NDJSON line as soon as it finishes"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(scrape_item(i, item, semaphore, columnar)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            yield serialize.dumps(result) + b"\n"
+    finally:
+        # Client went away or the stream was closed early: stop remaining scrapes
+        for task in tasks:
+            task.cancel()
+
+async def run_job_item(index: int, item: ScrapeRequest) -> dict:
+    """Job worker callback: scrape one item into a BatchScrapeResult dict"""
+    return await scrape_item(index, item)
+
+# Background scrape jobs; see jobs.py for worker count and retention settings
+job_manager = JobManager(run_job_item)
+
+# Longest a GET /jobs/{id}?wait= long-poll is held open
+JOB_MAX_WAIT = 30.0
+# Interval of SSE keep-alive comments while no result arrives
+JOB_EVENTS_KEEPALIVE = 15.0
+
+def get_job_or_404(job_id: str) -> Job:
+    """Return the job or raise HTTPException(404) if it is unknown or expired"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Queue one or many scrapes and return immediately
+    
+    The scrapes run on the in-process worker pool; follow them with
+    GET /jobs/{id} (optionally long-polling) or GET /jobs/{id}/events (SSE).
+    
+    Args:
+        request: JobRequest with the (url, checkin) items
+    
+    Returns:
+        Job summary with its jobId
+    """
+    if not request.items or len(request.items) > JOB_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A job must have between 1 and {JOB_MAX_ITEMS} items")
+    return job_manager.submit(request.items).summary()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, since: int = 0, wait: float = 0):
+    """
+    Job progress and results
+    
+    Args:
+        job_id: Id returned by POST /jobs
+        since: Only return results after the first `since` finished ones
+            (pass the previous response's version to get just the new ones)
+        wait: Long-poll: hold the request up to this many seconds (max 30)
+            until there is a result after `since` or the job is done
+    
+    Returns:
+        Job summary plus results (BatchScrapeResult dicts) in completion order
+    """
+    job = get_job_or_404(job_id)
+    if wait > 0:
+        await job.wait(since, min(wait, JOB_MAX_WAIT))
+    return JSONBytesResponse({**job.summary(), "results": job.new_results(since)})
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, since: int = 0):
+    """
+    Server-sent events for a job
+    
+    Emits a "result" event with a BatchScrapeResult for every finished item
+    (after the first `since`), then a "done" event with the job summary.
+    """
+    job = get_job_or_404(job_id)
+    
+    async def events() -> AsyncIterator[str]:
+        sent = since
+        while True:
+            for result in job.new_results(sent):
+                sent += 1
+                yield f"event: result\nid: {sent}\ndata: {serialize.dumps(result).decode()}\n\n"
+            if job.status == DONE:
+                yield f"event: done\ndata: {json.dumps(job.summary())}\n\n"
+                return
+            if not await job.wait(sent, JOB_EVENTS_KEEPALIVE):
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/watchlist")
+async def list_watchlist():
+    """Hotels and check-in windows kept fresh by the scheduler"""
+    return [entry.to_dict() for entry in scheduler.entries()]
+
+@app.post("/watchlist", status_code=201)
+async def add_watch(request: WatchRequest):
+    """
+    Watch a hotel for a rolling window of check-in dates
+    
+    Args:
+        request: WatchRequest with the URL, the number of check-in dates
+            (days) and the first one as days from today (firstDay)
+    
+    Returns:
+        The watchlist entry with its id
+    """
+    validate_url(request.url)
+    if not 1 <= request.days <= MAX_RANGE_DATES or request.firstDay < 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"days must be between 1 and {MAX_RANGE_DATES} and firstDay must not be negative"
         )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        return ScrapeResponse(
-            success=False,
-            error=f"Internal server error: {str(e)}"
+    entry = scheduler.add(request.url, request.days, request.firstDay)
+    scheduler.start()
+    return entry.to_dict()
+
+@app.delete("/watchlist/{entry_id}")
+async def remove_watch(entry_id: str):
+    """Stop watching a hotel"""
+    if not scheduler.remove(entry_id):
+        raise HTTPException(status_code=404, detail="Watchlist entry not found")
+    return {"removed": entry_id}
+
+@app.get("/stats/scheduler")
+async def scheduler_stats():
+    """Watchlist queue depth, lag, achieved refresh rate and data age"""
+    return scheduler.stats()
+
+@app.get("/stats/fetch")
+async def fetch_stats():
+    """Adaptive concurrency limit, breaker state and retry counters per upstream host"""
+    return fetch_layer.stats()
+
+@app.get("/stats/parse")
+async def parse_stats():
+    """Parse worker pool size, queueing and recycling counters"""
+    parse_pool = get_parse_pool()
+    return parse_pool.stats() if parse_pool is not None else {"workers": 0}
+
+@app.get("/stats/store")
+async def store_stats():
+    """Rows and size of the price history store (SCRAPER_STORE_PATH)"""
+    store = get_store()
+    if store is None:
+        return {"enabled": False}
+    stats = await asyncio.get_running_loop().run_in_executor(None, store.stats)
+    return {"enabled": True, **stats}
+
+@app.get("/stats/delta")
+async def delta_stats():
+    """Tracked (hotel, check-in) states and rooms sent/skipped by delta=true scrapes"""
+    return delta_tracker.stats()
+
+@app.get("/stats/jobs")
+async def job_stats():
+    """Job counts by status and queued items"""
+    return job_manager.stats()
+
+@app.post("/queue", status_code=202)
+async def enqueue_scrapes(request: QueueRequest):
+    """
+    Queue scrapes on the work queue shared by all instances (SCRAPER_QUEUE_PATH)
+    
+    A (hotel, check-in) pair that is already queued or being scraped, or was
+    finished within freshSeconds, is not queued again. Results go to each
+    instance's price store and cache, not back to the caller.
+    
+    Args:
+        request: QueueRequest with the items and freshSeconds
+    
+    Returns:
+        Number of items added and of duplicates
+    """
+    queue = get_queue()
+    if queue is None:
+        raise HTTPException(status_code=503, detail="The shared queue needs SCRAPER_QUEUE_PATH")
+    if not 1 <= len(request.items) <= JOB_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {JOB_MAX_ITEMS} items can be queued at once")
+    for item in request.items:
+        validate_scrape_params(item.url, item.checkin)
+    items = [(normalize_hotel_id(item.url), item.url, item.checkin) for item in request.items]
+    return await asyncio.get_running_loop().run_in_executor(None, queue.enqueue, items, request.freshSeconds)
+
+@app.get("/stats/queue")
+async def queue_stats():
+    """Shared queue tasks by state, live instances, reclaimed/stolen counters and this instance's worker"""
+    queue = get_queue()
+    if queue is None:
+        return {"enabled": False}
+    stats = await asyncio.get_running_loop().run_in_executor(None, queue.stats)
+    return {"enabled": True, **stats, "node": queue_node.stats() if queue_node is not None else None}
+
+@app.post("/scrape/range", response_model=ScrapeResponse)
+async def scrape_hotel_range(request: ScrapeRangeRequest):
+    """
+    Scrape one hotel for every check-in date in a window
+    
+    Args:
+        request: ScrapeRangeRequest with the URL, first and last check-in
+            date (inclusive), step in days and optional concurrency limit
+    
+    Returns:
+        ScrapeResponse whose data is the compact per-date room/price matrix
+    """
+    validate_scrape_params(request.url, request.start)
+    validate_scrape_params(request.url, request.end)
+    concurrency = request.concurrency
+    if concurrency is not None and (concurrency < 1 or concurrency > BATCH_MAX_CONCURRENCY):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}"
+        )
+    
+    try:
+        range_data = await async_scrape_booking_range(
+            request.url, request.start, request.end, request.step, concurrency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return JSONBytesResponse(scrape_envelope(range_data))
+
+@app.post("/scrape/search", response_model=ScrapeResponse)
+async def scrape_search_results(request: SearchRequest):
+    """
+    Scrape every hotel of a search-result listing, following its pagination
+    
+    Args:
+        request: SearchRequest with the search-result URL, check-in date and
+            optional page limit and concurrency limit
+    
+    Returns:
+        ScrapeResponse whose data lists each hotel's headline price in the
+        HotelData shape (see search.async_scrape_search)
+    """
+    validate_scrape_params(request.url, request.checkin)
+    max_pages = request.maxPages
+    if max_pages is not None and (max_pages < 1 or max_pages > SEARCH_MAX_PAGES):
+        raise HTTPException(status_code=400, detail=f"maxPages must be between 1 and {SEARCH_MAX_PAGES}")
+    concurrency = request.concurrency
+    if concurrency is not None and (concurrency < 1 or concurrency > BATCH_MAX_CONCURRENCY):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}"
         )
+    
+    search_data = await async_scrape_search(request.url, request.checkin, max_pages, concurrency)
+    return JSONBytesResponse(scrape_envelope(search_data))
+
+async def run_analytics(func: Any, *args: Any) -> JSONBytesResponse:
+    """Run an analytics query on the price store off the event loop"""
+    store = get_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Analytics need the price store (SCRAPER_STORE_PATH)")
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(None, store.query, func, *args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONBytesResponse(result)
+
+@app.get("/analytics/check-in")
+async def analytics_check_in(hotel: str, start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Per check-in date min/max/mean of a hotel's cheapest price, the median of its daily minimum, and its change since the last scrape
+    
+    Args:
+        hotel: Normalized hotel id (e.g. fr/grand-plaza)
+        start, end: Check-in date range (YYYY-MM-DD, inclusive)
+    """
+    return await run_analytics(analytics.check_in_stats, hotel, start, end)
+
+@app.get("/analytics/lead-time")
+async def analytics_lead_time(hotel: Optional[str] = None, max_days: Optional[int] = None):
+    """Cheapest price by days booked ahead, for one hotel or all stored hotels"""
+    return await run_analytics(analytics.lead_time_curve, hotel, max_days)
+
+@app.get("/analytics/compare")
+async def analytics_compare(hotels: str, start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Current cheapest price of several hotels per check-in date
+    
+    Args:
+        hotels: Comma-separated normalized hotel ids
+        start, end: Check-in date range (YYYY-MM-DD, inclusive)
+    """
+    hotel_ids = [hotel for hotel in hotels.split(",") if hotel]
+    return await run_analytics(analytics.compare_hotels, hotel_ids, start, end)
 
 @app.get("/scrape")
-async def scrape_hotel_get(url: str, checkin: str):
+async def scrape_hotel_get(url: str, checkin: str, response: Response, profile: bool = False,
+                           delta: bool = False, delta_consumer: Optional[str] = None, fields: Optional[str] = None,
+                           max_rooms: Optional[int] = None, max_amenities: Optional[int] = None,
+                           x_admin_token: Optional[str] = Header(None)):
     """
     GET endpoint for scraping (alternative to POST)
     
     Args:
         url: Booking.com hotel page URL
         checkin: Check-in date in YYYY-MM-DD format
+        profile: Profile this scrape (requires the X-Admin-Token header)
+        delta: Only rooms that changed since the last delta scrape of this hotel and date
+        delta_consumer: Client-chosen id with its own delta baseline (see ScrapeRequest.deltaConsumer)
+        fields: Comma-separated fields to extract (hotelName, currency, rooms, rating, amenities)
+        max_rooms, max_amenities: Most rooms and amenities extracted
     
     Returns:
         Hotel data or error
     """
     try:
-        # Validate URL
-        if not url.startswith("https://www.booking.com"):
-            raise HTTPException(status_code=400, detail="URL must be from booking.com")
-        
-        # Validate date format
-        if len(checkin) != 10 or checkin[4] != '-' or checkin[7] != '-':
-            raise HTTPException(status_code=400, detail="Check-in date must be in YYYY-MM-DD format")
+        profile = check_profile_request(profile, x_admin_token)
+        validate_scrape_params(url, checkin)
+        options = scrape_options(fields, max_rooms, max_amenities, delta, delta_consumer)
         
         # Scrape the hotel data
-        hotel_data = scrape_booking(url, checkin)
+        hotel_data = await cached_scrape(url, checkin, response, profile, options)
         
         if "error" in hotel_data:
             raise HTTPException(status_code=500, detail=hotel_data["error"])
+        if delta:
+            hotel_data = apply_delta(url, checkin, hotel_data, delta_consumer)
         
-        return hotel_data
+        return JSONBytesResponse(hotel_data, headers=dict(response.headers))
         
     except HTTPException:
         raise
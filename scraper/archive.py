@@ -0,0 +1,324 @@
+"""
+Content-addressed archive of raw hotel pages, with offline replay
+
+Every fetched page body can be kept so extraction fixes can be backfilled
+without re-scraping. Bodies are zlib-compressed and stored once per SHA-256
+of the raw bytes in append-only segment files; an append-only JSON-lines
+index records hotel id, check-in date, fetch time and where the blob lives.
+
+Layout of an archive directory:
+
+    segments/<writer>-<n>.pack   concatenated compressed bodies
+    index-<writer>.jsonl         one record per archived fetch
+
+Each process writes its own segments and index file (<writer> is unique per
+process), so several API workers can share one directory. Readers merge all
+index files.
+
+Replay re-runs extraction over archived pages on a process pool, without
+network access:
+
+    python archive.py replay ARCHIVE_DIR [--hotel fr/grand-plaza] [--workers 8] > results.ndjson
+    python archive.py stats ARCHIVE_DIR
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+ARCHIVE_DIR = os.environ.get("SCRAPER_ARCHIVE_DIR", "")
+
+# Roll over to a new segment file after this many bytes
+SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+# Pending index records are written out after this many fetches
+FLUSH_EVERY = 64
+COMPRESSION_LEVEL = 6
+# Replay chunks submitted ahead of the one being yielded, per worker
+REPLAY_WINDOW = 2
+
+class PageArchive:
+    """Append-only, content-addressed store of raw page bodies"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._segments_dir = os.path.join(root, "segments")
+        os.makedirs(self._segments_dir, exist_ok=True)
+
+        self._writer = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self._lock = threading.Lock()
+        self._segment_number = 0
+        self._segment = None
+        self._segment_name = ""
+        self._segment_size = 0
+        self._index_path = os.path.join(root, f"index-{self._writer}.jsonl")
+        self._pending: List[str] = []
+
+        # sha256 -> (segment, offset, length) for deduplication; read from the
+        # index files on the first add, which scrapes run in an executor thread
+        self._blobs: Optional[Dict[str, Tuple[str, int, int]]] = None
+
+    def _blob_locations(self) -> Dict[str, Tuple[str, int, int]]:
+        if self._blobs is None:
+            with self._lock:
+                if self._blobs is None:
+                    self._blobs = {record["sha256"]: (record["segment"], record["offset"], record["length"])
+                                   for record in self.records()}
+        return self._blobs
+
+    def add(self, url: str, hotel_id: str, checkin_date: str, content: bytes,
+            fetched_at: Optional[str] = None) -> dict:
+        """
+        Archive one fetched page body
+
+        The body is only written if no page with the same hash is stored yet;
+        an index record is added either way.
+
+        Returns:
+            The index record
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        blobs = self._blob_locations()
+        compressed = None
+        if digest not in blobs:
+            compressed = zlib.compress(content, COMPRESSION_LEVEL)
+
+        with self._lock:
+            location = blobs.get(digest)
+            if location is None:
+                if compressed is None:
+                    compressed = zlib.compress(content, COMPRESSION_LEVEL)
+                location = self._write_blob(compressed)
+                blobs[digest] = location
+            segment, offset, length = location
+            record = {
+                "sha256": digest,
+                "hotelId": hotel_id,
+                "checkInDate": checkin_date,
+                "fetchedAt": fetched_at or datetime.now().isoformat(),
+                "url": url,
+                "segment": segment,
+                "offset": offset,
+                "length": length,
+                "size": len(content),
+            }
+            self._pending.append(json.dumps(record, separators=(',', ':')))
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+        return record
+
+    def _write_blob(self, compressed: bytes) -> Tuple[str, int, int]:
+        if self._segment is None or self._segment_size + len(compressed) > SEGMENT_MAX_BYTES:
+            self._open_segment()
+        offset = self._segment_size
+        self._segment.write(compressed)
+        self._segment_size += len(compressed)
+        return self._segment_name, offset, len(compressed)
+
+    def _open_segment(self) -> None:
+        if self._segment is not None:
+            self._flush()
+            self._segment.close()
+        self._segment_number += 1
+        self._segment_name = f"{self._writer}-{self._segment_number:06d}.pack"
+        self._segment = open(os.path.join(self._segments_dir, self._segment_name), "ab",
+                             buffering=1024 * 1024)
+        self._segment_size = self._segment.tell()
+
+    def _flush(self) -> None:
+        # Blobs reach the disk before the index records that point at them
+        if self._segment is not None:
+            self._segment.flush()
+        if self._pending:
+            with open(self._index_path, "a", encoding="utf-8") as index:
+                index.write("\n".join(self._pending) + "\n")
+            self._pending = []
+
+    def flush(self) -> None:
+        """Write buffered blobs and index records to disk"""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Flush and close the current segment"""
+        with self._lock:
+            self._flush()
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def records(self, hotel_id: Optional[str] = None, checkin_date: Optional[str] = None,
+                since: Optional[str] = None) -> Iterator[dict]:
+        """
+        Iterate over flushed index records of all writers, optionally filtered
+
+        Args:
+            hotel_id: Only records for this normalized hotel id
+            checkin_date: Only records for this check-in date
+            since: Only records fetched at or after this ISO timestamp
+        """
+        return iter_records(self.root, hotel_id, checkin_date, since)
+
+    def read(self, record: dict) -> bytes:
+        """Return the raw page body of an index record"""
+        return read_blob(self.root, record["segment"], record["offset"], record["length"])
+
+    def stats(self) -> dict:
+        """Record, blob and byte counts"""
+        return archive_stats(self.root)
+
+def archive_stats(root: str) -> dict:
+    """Record, blob and byte counts of an archive directory"""
+    records = 0
+    raw_bytes = 0
+    blobs: Dict[str, int] = {}
+    hotels = set()
+    for record in iter_records(root):
+        records += 1
+        raw_bytes += record["size"]
+        blobs[record["sha256"]] = record["length"]
+        hotels.add(record["hotelId"])
+    return {
+        "records": records,
+        "uniquePages": len(blobs),
+        "hotels": len(hotels),
+        "rawBytes": raw_bytes,
+        "storedBytes": sum(blobs.values()),
+    }
+
+def iter_records(root: str, hotel_id: Optional[str] = None, checkin_date: Optional[str] = None,
+                 since: Optional[str] = None) -> Iterator[dict]:
+    """Iterate over the flushed index records of an archive directory (see PageArchive.records)"""
+    for path in sorted(glob.glob(os.path.join(root, "index-*.jsonl"))):
+        with open(path, encoding="utf-8") as index:
+            for line in index:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if hotel_id and record["hotelId"] != hotel_id:
+                    continue
+                if checkin_date and record["checkInDate"] != checkin_date:
+                    continue
+                if since and record["fetchedAt"] < since:
+                    continue
+                yield record
+
+def read_blob(root: str, segment: str, offset: int, length: int) -> bytes:
+    """Read and decompress one stored body"""
+    with open(os.path.join(root, "segments", segment), "rb") as f:
+        f.seek(offset)
+        return zlib.decompress(f.read(length))
+
+_archive: Optional[PageArchive] = None
+_archive_lock = threading.Lock()
+
+def get_archive() -> Optional[PageArchive]:
+    """Return the archive configured by SCRAPER_ARCHIVE_DIR, or None when archiving is off"""
+    global _archive
+    if not ARCHIVE_DIR:
+        return None
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = PageArchive(ARCHIVE_DIR)
+    return _archive
+
+def close_archive() -> None:
+    """Flush and close the configured archive, if it was opened"""
+    global _archive
+    if _archive is not None:
+        _archive.close()
+        _archive = None
+
+def _replay_record(root: str, record: dict, parser_name: Optional[str]) -> dict:
+    """Re-extract one archived page"""
+    from parsers import get_parser
+    from scrape import parse_hotel_page
+
+    try:
+        content = read_blob(root, record["segment"], record["offset"], record["length"])
+        result = parse_hotel_page(content, record["url"], record["checkInDate"], get_parser(parser_name))
+        # The data is as of the original fetch, not the replay
+        result["scrapeDate"] = record["fetchedAt"]
+    except Exception as e:
+        result = {"error": str(e), "checkInDate": record["checkInDate"]}
+    result["archiveSha256"] = record["sha256"]
+    return result
+
+def _replay_chunk(root: str, records: List[dict], parser_name: Optional[str]) -> List[dict]:
+    """Process-pool worker: re-extract a chunk of archived pages"""
+    return [_replay_record(root, record, parser_name) for record in records]
+
+def replay(root: str, hotel_id: Optional[str] = None, checkin_date: Optional[str] = None,
+           since: Optional[str] = None, workers: Optional[int] = None,
+           parser_name: Optional[str] = None, chunksize: int = 16) -> Iterator[dict]:
+    """
+    Re-run extraction over archived pages in parallel, without network access
+
+    Args:
+        root: Archive directory
+        hotel_id, checkin_date, since: Record filters (see PageArchive.records)
+        workers: Worker processes (defaults to the CPU count)
+        parser_name: Parser backend to use (defaults to SCRAPER_PARSER)
+        chunksize: Records handed to a worker at a time
+
+    Yields:
+        One HotelData dict per archived fetch, in index order, with
+        scrapeDate set to the original fetch time
+    """
+    workers = workers or os.cpu_count() or 1
+    records = iter_records(root, hotel_id, checkin_date, since)
+    # Only a few chunks per worker are read ahead, so neither the records
+    # nor the results of a large archive pile up in memory
+    window: Deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in iter(lambda: list(islice(records, chunksize)), []):
+            if len(window) >= REPLAY_WINDOW * workers:
+                yield from window.popleft().result()
+            window.append(executor.submit(_replay_chunk, root, chunk, parser_name))
+        while window:
+            yield from window.popleft().result()
+
+def main(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Raw page archive tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser("replay", help="Re-extract archived pages to NDJSON on stdout")
+    replay_parser.add_argument("archive_dir")
+    replay_parser.add_argument("--hotel", help="Normalized hotel id, e.g. fr/grand-plaza")
+    replay_parser.add_argument("--checkin", help="Check-in date (YYYY-MM-DD)")
+    replay_parser.add_argument("--since", help="Only pages fetched at or after this ISO timestamp")
+    replay_parser.add_argument("--workers", type=int)
+    replay_parser.add_argument("--parser", help="Parser backend (soup, lxml, selectolax)")
+
+    stats_parser = commands.add_parser("stats", help="Show archive size and deduplication")
+    stats_parser.add_argument("archive_dir")
+
+    args = parser.parse_args(argv)
+    if args.command == "stats":
+        print(json.dumps(archive_stats(args.archive_dir), indent=2))
+        return 0
+
+    start = time.perf_counter()
+    count = 0
+    for result in replay(args.archive_dir, args.hotel, args.checkin, args.since, args.workers, args.parser):
+        sys.stdout.write(json.dumps(result) + "\n")
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {count} pages in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f} pages/s)",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
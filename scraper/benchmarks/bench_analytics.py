@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Price analytics benchmark
+
+Fills a store with daily scrapes of many hotels x check-in dates (through
+the same PriceStore batches the scraper uses, so the rollups are maintained
+incrementally) and times the dashboard queries against the rollups. With
+--raw it also times the per check-in min/max query as a scan of
+daily_prices, which is what the queries would cost without rollups.
+
+    python benchmarks/bench_analytics.py --hotels 100 --dates 365 --days 30
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import analytics
+from store import PriceStore
+
+FIRST_CHECKIN = date(2024, 6, 1)
+
+def scrape_results(hotels: int, dates: int, days: int, rooms: int, seed: int = 0):
+    """(hotel_id, result) for every hotel and check-in date, scraped once a day for `days` days"""
+    rng = random.Random(seed)
+    checkins = [(FIRST_CHECKIN + timedelta(days=i)).isoformat() for i in range(dates)]
+    for day in range(days):
+        scraped_at = f"{FIRST_CHECKIN - timedelta(days=days - day)}T08:00:00"
+        for hotel in range(hotels):
+            base = 80 + hotel % 50
+            for checkin in checkins:
+                rooms_data = [
+                    {"roomId": f"room_{r}", "name": f"Room {r}", "occupancy": 2,
+                     "price": round(base * (1 + r * 0.3) * rng.uniform(0.9, 1.2), 2), "refundable": False,
+                     "breakfastIncluded": False, "available": True}
+                    for r in range(rooms)
+                ]
+                yield f"xx/hotel-{hotel}", {
+                    "hotelId": "xx", "hotelName": f"Hotel {hotel}", "currency": "EUR",
+                    "scrapeDate": scraped_at, "checkInDate": checkin, "rooms": rooms_data,
+                    "rating": {"overall": 8.0, "location": 0.0}, "amenities": [],
+                }
+
+def timed(store: PriceStore, func, *args, repeat: int = 5) -> float:
+    store.query(func, *args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        store.query(func, *args)
+    return (time.perf_counter() - start) / repeat
+
+def raw_check_in_stats(conn, hotel_id):
+    return conn.execute(
+        "SELECT check_in, MIN(price), MAX(price), COUNT(*) FROM daily_prices "
+        "WHERE hotel_id = ? AND available GROUP BY check_in ORDER BY check_in", (hotel_id,)
+    ).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hotels", type=int, default=100)
+    parser.add_argument("--dates", type=int, default=365, help="Check-in dates per hotel")
+    parser.add_argument("--days", type=int, default=30, help="Days of daily scrapes")
+    parser.add_argument("--rooms", type=int, default=2, help="Rooms per scrape")
+    parser.add_argument("--raw", action="store_true", help="Also time a scan of daily_prices")
+    args = parser.parse_args()
+
+    scrapes = args.hotels * args.dates * args.days
+    print(f"{args.hotels} hotels x {args.dates} dates x {args.days} days = {scrapes:,} scrapes")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = PriceStore(os.path.join(tmp, "prices.db"), batch_size=2000, flush_seconds=float("inf"))
+        start = time.perf_counter()
+        rows = db.add_many(scrape_results(args.hotels, args.dates, args.days, args.rooms))
+        elapsed = time.perf_counter() - start
+        print(f"ingest with rollups: {rows / elapsed:,.0f} price rows/s ({elapsed:.1f}s)")
+
+        hotel_ids = [f"xx/hotel-{i}" for i in range(args.hotels)]
+        cases = [
+            ("check-in stats, 1 hotel", analytics.check_in_stats, "xx/hotel-0", None, None),
+            ("lead-time curve, 1 hotel", analytics.lead_time_curve, "xx/hotel-0", None),
+            ("lead-time curve, all", analytics.lead_time_curve, None, None),
+            (f"compare {args.hotels} hotels", analytics.compare_hotels, hotel_ids, None, None),
+        ]
+        if args.raw:
+            cases.append(("raw scan, 1 hotel", raw_check_in_stats, "xx/hotel-0"))
+        for name, func, *query_args in cases:
+            print(f"{name:<28} {timed(db, func, *query_args) * 1000:>8.2f} ms")
+        db.close()
+
+if __name__ == "__main__":
+    main()
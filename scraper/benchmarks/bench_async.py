@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for async_scrape_booking
+
+Runs N simultaneous scrapes against the local stand-in server (which adds a
+fixed latency per page) and reports throughput, compared with the blocking
+scrape_booking called sequentially.
+
+    python benchmarks/bench_async.py --latency 0.2 --levels 1 8 32 64
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scrape import scrape_booking, async_scrape_booking, close_async_client
+from standin import start_standin_server
+
+CHECKIN = "2024-01-15"
+
+def hotel_urls(base_url: str, n: int):
+    return [f"{base_url}/hotel/xx/bench-hotel-{i}.html" for i in range(n)]
+
+def run_sync(base_url: str, n: int) -> float:
+    start = time.perf_counter()
+    for url in hotel_urls(base_url, n):
+        result = scrape_booking(url, CHECKIN)
+        assert "error" not in result, result["error"]
+    return time.perf_counter() - start
+
+async def run_async(base_url: str, n: int) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(async_scrape_booking(url, CHECKIN) for url in hotel_urls(base_url, n)))
+    elapsed = time.perf_counter() - start
+    for result in results:
+        assert "error" not in result, result["error"]
+    await close_async_client()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stand-in server latency per page (s)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64], help="Concurrency levels")
+    args = parser.parse_args()
+
+    server, base_url = start_standin_server(latency=args.latency)
+    print(f"Stand-in server: {base_url} (latency {args.latency * 1000:.0f} ms)")
+    print(f"{'N':>5} {'sync s':>9} {'sync p/s':>9} {'async s':>9} {'async p/s':>10} {'speedup':>8}")
+
+    try:
+        for n in args.levels:
+            with contextlib.redirect_stdout(io.StringIO()):
+                sync_elapsed = run_sync(base_url, n)
+                async_elapsed = asyncio.run(run_async(base_url, n))
+            print(f"{n:>5} {sync_elapsed:>9.2f} {n / sync_elapsed:>9.1f} "
+                  f"{async_elapsed:>9.2f} {n / async_elapsed:>10.1f} {sync_elapsed / async_elapsed:>7.1f}x")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Field projection benchmark
+
+Times parse_hotel_page per projection (fields=) on a synthetic page, and
+how much of the page a streamed scrape has to read before the requested
+sections are in. With the lxml backend a projected parse_hotel_page only
+parses that prefix of the page as well; the full result parses it all.
+
+    python benchmarks/bench_fields.py --rooms 40 --amenities 30 --padding-kb 400
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pages import render_hotel_page
+from parsers import get_parser
+from scrape import parse_fields, parse_hotel_page, projected_sections
+from streaming import STREAM_CHUNK_SIZE, StreamingPage
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+CHECKIN = "2024-01-15"
+
+PROJECTIONS = [
+    ("all fields", None),
+    ("price poller", "rooms,currency"),
+    ("catalog", "amenities"),
+    ("header", "hotelName,rating"),
+]
+
+def time_parse(page: bytes, fields, parser, max_rooms, max_amenities, repeat: int) -> float:
+    parse_hotel_page(page, URL, CHECKIN, parser, fields, max_rooms, max_amenities)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse_hotel_page(page, URL, CHECKIN, parser, fields, max_rooms, max_amenities)
+    return (time.perf_counter() - start) / repeat
+
+def streamed(page: bytes, fields, parser):
+    """Bytes a StreamingPage reads until it has the projection's sections"""
+    stream = StreamingPage(parser, projected_sections(fields))
+    for offset in range(0, len(page), STREAM_CHUNK_SIZE):
+        if stream.feed(page[offset:offset + STREAM_CHUNK_SIZE]):
+            break
+    return stream.bytes_fed
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--rooms", type=int, default=40)
+    arg_parser.add_argument("--amenities", type=int, default=30)
+    arg_parser.add_argument("--padding-kb", type=int, default=400)
+    arg_parser.add_argument("--max-rooms", type=int, help="Room limit (default SCRAPER_MAX_ROOMS)")
+    arg_parser.add_argument("--max-amenities", type=int, help="Amenity limit (default SCRAPER_MAX_AMENITIES)")
+    arg_parser.add_argument("--backend", default="lxml", help="Parser backend for the parse_hotel_page timings")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    page = render_hotel_page(rooms=args.rooms, amenities=args.amenities,
+                             padding_kb=args.padding_kb).encode("utf-8")
+    parser = get_parser(args.backend)
+    lxml = get_parser("lxml")
+    print(f"Page: {len(page) // 1024} KB, {args.rooms} rooms, {args.amenities} amenities")
+    print(f"\n{'projection':<14} {'fields':<18} {'parse+extract ms':>17} {'saved':>6} {'streamed KB':>12}")
+    baseline = None
+    for label, spec in PROJECTIONS:
+        fields = parse_fields(spec)
+        seconds = time_parse(page, fields, parser, args.max_rooms, args.max_amenities, args.repeat)
+        baseline = baseline or seconds
+        read = streamed(page, fields, lxml)
+        print(f"{label:<14} {spec or '*':<18} {seconds * 1000:>17.2f} {1 - seconds / baseline:>6.0%} "
+              f"{read // 1024:>12}")
+
+if __name__ == "__main__":
+    main()
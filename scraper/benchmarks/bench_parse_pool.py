@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Parse throughput benchmark: thread executor vs. parse worker processes
+
+Parses the same synthetic pages through async_scrape_booking's parse step
+(parse_off_loop) with everything submitted at once, first on the default
+thread executor, then on a ParsePool of each size. Pool start-up is not
+timed. Throughput should grow with workers up to the number of cores; the
+thread executor stays near single-core speed because parsing holds the GIL.
+
+    python benchmarks/bench_parse_pool.py --pages 400 --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import parse_pool
+from pages import render_hotel_page
+from scrape import parse_hotel_page, parse_off_loop
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+CHECKIN = "2024-01-15"
+
+def corpus(pages: int, rooms: int, padding_kb: int) -> List[bytes]:
+    variants = [render_hotel_page(hotel_id=f"hotel-{i}", rooms=rooms, amenities=20,
+                                  padding_kb=padding_kb, seed=i).encode("utf-8") for i in range(16)]
+    return [variants[i % len(variants)] for i in range(pages)]
+
+async def run(pages: List[bytes], pool: Optional[parse_pool.ParsePool]) -> float:
+    parse_pool._pool = pool
+    start = time.perf_counter()
+    results = await asyncio.gather(*(parse_off_loop(parse_hotel_page, page, URL, CHECKIN) for page in pages))
+    elapsed = time.perf_counter() - start
+    assert all(result["rooms"] for result in results)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--padding-kb", type=int, default=100, help="Filler markup per page")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="Pool sizes")
+    parser.add_argument("--max-tasks", type=int, default=parse_pool.PARSE_MAX_TASKS,
+                        help="Pages per worker before it is replaced (0 = never)")
+    args = parser.parse_args()
+
+    pages = corpus(args.pages, args.rooms, args.padding_kb)
+    print(f"{args.pages} pages of {len(pages[0]) // 1024} KB, {os.cpu_count()} CPUs")
+    print(f"{'executor':>10} {'s':>8} {'pages/s':>9} {'speedup':>8}")
+
+    # Force the thread path regardless of SCRAPER_PARSE_WORKERS
+    saved_workers = parse_pool.PARSE_WORKERS
+    parse_pool.PARSE_WORKERS = 0
+    baseline = asyncio.run(run(pages, None))
+    print(f"{'threads':>10} {baseline:>8.2f} {args.pages / baseline:>9.1f} {1.0:>7.2f}x")
+    parse_pool.PARSE_WORKERS = max(args.workers)
+
+    try:
+        for workers in args.workers:
+            pool = parse_pool.ParsePool(workers, max_tasks=args.max_tasks)
+            pool.start()
+            try:
+                elapsed = asyncio.run(run(pages, pool))
+            finally:
+                pool.close()
+            print(f"{f'{workers} proc':>10} {elapsed:>8.2f} {args.pages / elapsed:>9.1f} "
+                  f"{baseline / elapsed:>7.2f}x")
+    finally:
+        parse_pool.PARSE_WORKERS = saved_workers
+        parse_pool._pool = None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Parser backend benchmark
+
+Times parse and extract separately for every backend in parsers.PARSERS and
+reports peak memory. Each backend runs in a fresh process so the RSS figures
+are not polluted by the others.
+
+    python benchmarks/bench_parsers.py                  # synthetic pages
+    python benchmarks/bench_parsers.py --pages saved/   # saved *.html pages
+    python benchmarks/bench_parsers.py --archive arch/  # pages from a page archive
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pages import render_hotel_page
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+def synthetic_corpus() -> List[Tuple[str, bytes]]:
+    return [
+        ("small", render_hotel_page(rooms=5, amenities=10).encode("utf-8")),
+        ("large", render_hotel_page(rooms=10, amenities=30, padding_kb=600).encode("utf-8")),
+        ("many-rooms", render_hotel_page(rooms=60, amenities=30, padding_kb=200).encode("utf-8")),
+        ("no-rooms", render_hotel_page(rooms=0, amenities=10, padding_kb=50).encode("utf-8")),
+    ]
+
+def saved_corpus(directory: str) -> List[Tuple[str, bytes]]:
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "rb") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+def archive_corpus(directory: str, limit: int) -> List[Tuple[str, bytes]]:
+    from archive import iter_records, read_blob
+
+    corpus = []
+    seen = set()
+    for record in iter_records(directory):
+        if record["sha256"] in seen:
+            continue
+        seen.add(record["sha256"])
+        content = read_blob(directory, record["segment"], record["offset"], record["length"])
+        corpus.append((f"{record['hotelId']}@{record['checkInDate']}", content))
+        if len(corpus) >= limit:
+            break
+    return corpus
+
+def extract_all(parser, root, content: bytes) -> None:
+    from scrape import (extract_amenities, extract_currency, extract_hotel_id, extract_hotel_name,
+                        extract_overall_rating, extract_rooms, page_layout)
+    layout = page_layout(content)
+    extract_hotel_name(parser, root, layout)
+    extract_overall_rating(parser, root, layout)
+    extract_amenities(parser, root, layout)
+    extract_rooms(parser, root, extract_hotel_id(URL), layout)
+    extract_currency(parser, root, layout)
+
+def run_backend(name: str, corpus: List[Tuple[str, bytes]], repeat: int) -> Dict[str, object]:
+    """Benchmark one backend; runs in its own process"""
+    from parsers import get_parser
+
+    parser = get_parser(name)
+    # Warm up imports and selector compilation before measuring
+    extract_all(parser, parser.parse(corpus[0][1]), corpus[0][1])
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = {}
+    for label, content in corpus:
+        parse_time = extract_time = 0.0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            root = parser.parse(content)
+            parsed = time.perf_counter()
+            extract_all(parser, root, content)
+            parse_time += parsed - start
+            extract_time += time.perf_counter() - parsed
+            del root
+        timings[label] = (parse_time / repeat, extract_time / repeat)
+
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    # Python-heap peak for the largest page (C-level allocations are in RSS)
+    largest = max(corpus, key=lambda item: len(item[1]))[1]
+    tracemalloc.start()
+    extract_all(parser, parser.parse(largest), largest)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"timings": timings, "rss_growth_kb": rss_growth, "heap_peak_kb": heap_peak // 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", help="Directory of saved Booking.com hotel pages (*.html)")
+    parser.add_argument("--archive", help="Page archive directory (see archive.py)")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum pages taken from --archive")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", help="Backends to run (default: all)")
+    args = parser.parse_args()
+
+    from parsers import PARSERS
+
+    if args.archive:
+        corpus = archive_corpus(args.archive, args.limit)
+    elif args.pages:
+        corpus = saved_corpus(args.pages)
+    else:
+        corpus = synthetic_corpus()
+    if not corpus:
+        sys.exit(f"No pages found in {args.archive or args.pages}")
+    print("Pages: " + ", ".join(f"{label} ({len(content) // 1024} KB)" for label, content in corpus))
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in args.backends or list(PARSERS):
+        with context.Pool(1) as pool:
+            try:
+                results[name] = pool.apply(run_backend, (name, corpus, args.repeat))
+            except RuntimeError as e:
+                print(f"Skipping {name}: {e}")
+
+    print(f"\n{'backend':<12} {'page':<14} {'parse ms':>9} {'extract ms':>11} {'total ms':>9}")
+    for name, result in results.items():
+        for label, (parse_time, extract_time) in result["timings"].items():
+            print(f"{name:<12} {label:<14} {parse_time * 1000:>9.2f} {extract_time * 1000:>11.2f} "
+                  f"{(parse_time + extract_time) * 1000:>9.2f}")
+
+    print(f"\n{'backend':<12} {'RSS growth KB':>14} {'heap peak KB':>13}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['rss_growth_kb']:>14} {result['heap_peak_kb']:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Shared work queue scaling benchmark
+
+Drains one queue of simulated scrapes (a fixed sleep each) with 1, 2, 4, ...
+node processes and prints tasks per second per node count. With scrapes
+that wait on the network rather than the CPU, throughput should grow
+about linearly with the nodes until the SQLite write lock (one short
+transaction per claim batch, start and finish) becomes the limit.
+
+    python benchmarks/bench_queue.py --tasks 800 --latency 0.05 --nodes 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from work_queue import QueueNode, WorkQueue
+
+def run_node(path: str, node_id: str, latency: float, concurrency: int, prefetch: int):
+    async def scrape(url, checkin):
+        await asyncio.sleep(latency)
+        return {"checkInDate": checkin}
+
+    async def main():
+        node = QueueNode(WorkQueue(path), scrape, node_id=node_id, concurrency=concurrency,
+                         prefetch=prefetch, poll_interval=0.01)
+        node.start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+def drain(nodes: int, tasks: int, args) -> Tuple[float, int]:
+    """Seconds for nodes processes to finish tasks queued tasks, and how many were stolen"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "queue.db")
+        queue = WorkQueue(path)
+        processes = [multiprocessing.Process(target=run_node,
+                                             args=(path, f"node-{i}", args.latency, args.concurrency, args.prefetch))
+                     for i in range(nodes)]
+        for process in processes:
+            process.start()
+        # Wait for every node to be up before queueing, so startup is not timed
+        while len(queue.stats()["nodes"]) < nodes:
+            time.sleep(0.01)
+        queue.enqueue([(f"xx/hotel-{n}", f"https://www.booking.com/hotel/xx/hotel-{n}.html", "2030-01-01")
+                       for n in range(tasks)])
+        start = time.perf_counter()
+        while queue.stats()["tasks"]["done"] < tasks:
+            time.sleep(0.01)
+        seconds = time.perf_counter() - start
+        stolen = queue.stats()["stolen"]
+        for process in processes:
+            process.kill()
+            process.join()
+        queue.close()
+    return seconds, stolen
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--tasks", type=int, default=800)
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="Seconds per simulated scrape")
+    arg_parser.add_argument("--concurrency", type=int, default=8, help="Scrapes per node")
+    arg_parser.add_argument("--prefetch", type=int, default=16)
+    arg_parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = arg_parser.parse_args()
+
+    ideal = args.concurrency / args.latency
+    print(f"{args.tasks} tasks of {args.latency * 1000:.0f}ms, {args.concurrency} per node "
+          f"(ideal {ideal:.0f} tasks/s per node)")
+    print(f"\n{'nodes':>5} {'seconds':>8} {'tasks/s':>8} {'speedup':>8} {'stolen':>7}")
+    baseline = None
+    for nodes in args.nodes:
+        seconds, stolen = drain(nodes, args.tasks, args)
+        rate = args.tasks / seconds
+        baseline = baseline or rate
+        print(f"{nodes:>5} {seconds:>8.2f} {rate:>8.0f} {rate / baseline:>7.2f}x {stolen:>7}")
+
+if __name__ == "__main__":
+    main()
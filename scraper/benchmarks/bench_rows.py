@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Room-row extraction benchmark
+
+Compares the per-field fallback queries (select_one per selector, row text
+computed twice) with ParserBackend.first_matches (one walk per row, row text
+computed once) on a page with many rate rows.
+
+    python benchmarks/bench_rows.py --rooms 60
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pages import render_hotel_page
+from parsers import PARSERS, get_parser
+from scrape import (OCCUPANCY_SELECTORS, PRICE_SELECTORS, ROOM_FIELD_SELECTORS, ROOM_NAME_SELECTORS,
+                    ROOM_SELECTORS)
+
+def per_field(parser, rows) -> None:
+    for row in rows:
+        for selectors in (ROOM_NAME_SELECTORS, PRICE_SELECTORS, OCCUPANCY_SELECTORS):
+            for selector in selectors:
+                if parser.select_one(row, selector) is not None:
+                    break
+        "refundable" in parser.text(row).lower()
+        "breakfast" in parser.text(row).lower()
+
+def single_pass(parser, rows) -> None:
+    for row in rows:
+        parser.first_matches(row, ROOM_FIELD_SELECTORS)
+        row_text = parser.text(row).lower()
+        "refundable" in row_text
+        "breakfast" in row_text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    content = render_hotel_page(rooms=args.rooms, amenities=20).encode("utf-8")
+    print(f"{'backend':<12} {'per-field ms':>13} {'single-pass ms':>15} {'speedup':>8}")
+    for name in PARSERS:
+        try:
+            backend = get_parser(name)
+        except RuntimeError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        rows = backend.select(backend.parse(content), ROOM_SELECTORS[0])
+        old = timeit.timeit(lambda: per_field(backend, rows), number=args.repeat) / args.repeat
+        new = timeit.timeit(lambda: single_pass(backend, rows), number=args.repeat) / args.repeat
+        print(f"{name:<12} {old * 1000:>13.2f} {new * 1000:>15.2f} {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
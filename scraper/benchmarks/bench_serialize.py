@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark
+
+Encodes a batch of scrape results the way the API used to (ScrapeResponse /
+BatchScrapeResult models, FastAPI's response_model re-validation, then the
+JSON encoder) and the way it does now (dicts straight to bytes with
+serialize.dumps, optionally with columnar rooms). Reports time per batch
+and the peak memory allocated while encoding it.
+
+    python benchmarks/bench_serialize.py --results 500 --rooms 40
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pydantic import BaseModel, TypeAdapter
+
+import serialize
+from pages import render_hotel_page
+from scrape import parse_hotel_page
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+# The models the API used to build for every result
+class ScrapeResponse(BaseModel):
+    success: bool
+    data: Optional[dict] = None
+    error: Optional[str] = None
+
+class BatchScrapeResult(ScrapeResponse):
+    index: int
+    url: str
+    checkin: str
+
+SCRAPE_RESPONSE = TypeAdapter(ScrapeResponse)
+
+def results(count: int, rooms: int) -> List[dict]:
+    page = render_hotel_page(rooms=rooms, amenities=30).encode("utf-8")
+    hotel_data = parse_hotel_page(page, URL, "2024-01-15")
+    return [dict(hotel_data, hotelId=f"hotel-{i}") for i in range(count)]
+
+def model_single(hotel_data: dict) -> bytes:
+    # POST /scrape: model, model_dump, response_model validation, JSON mode dump, json.dumps
+    response = ScrapeResponse(success=True, data=hotel_data)
+    validated = SCRAPE_RESPONSE.validate_python(response.model_dump())
+    content = SCRAPE_RESPONSE.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+def model_batch_line(index: int, hotel_data: dict) -> bytes:
+    response = ScrapeResponse(success=True, data=hotel_data)
+    result = BatchScrapeResult(index=index, url=URL, checkin="2024-01-15", **response.model_dump())
+    return (result.model_dump_json() + "\n").encode("utf-8")
+
+def direct_single(hotel_data: dict) -> bytes:
+    return serialize.dumps({"success": True, "data": hotel_data, "error": None})
+
+def direct_batch_line(index: int, hotel_data: dict, columnar: bool = False) -> bytes:
+    data = serialize.columnar(hotel_data) if columnar else hotel_data
+    return serialize.dumps({"success": True, "data": data, "error": None, "index": index,
+                            "url": URL, "checkin": "2024-01-15"}) + b"\n"
+
+def measure(encode: Callable[[List[dict]], int], batch: List[dict], repeat: int):
+    encode(batch)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        size = encode(batch)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    encode(batch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=500, help="Results per batch")
+    parser.add_argument("--rooms", type=int, default=40, help="Rooms per result")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stdlib", action="store_true", help="Use the json fallback even if orjson is installed")
+    args = parser.parse_args()
+    if args.stdlib:
+        serialize.orjson = None
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch = results(args.results, args.rooms)
+    rooms = len(batch[0]["rooms"])
+    encoder = "orjson" if serialize.orjson is not None else "json"
+    print(f"{args.results} results x {rooms} rooms, encoder: {encoder}")
+
+    cases = [
+        ("single, models", lambda b: sum(len(model_single(d)) for d in b)),
+        ("single, direct", lambda b: sum(len(direct_single(d)) for d in b)),
+        ("batch, models", lambda b: sum(len(model_batch_line(i, d)) for i, d in enumerate(b))),
+        ("batch, direct", lambda b: sum(len(direct_batch_line(i, d)) for i, d in enumerate(b))),
+        ("batch, columnar", lambda b: sum(len(direct_batch_line(i, d, True)) for i, d in enumerate(b))),
+    ]
+    print(f"{'path':<18} {'ms/batch':>9} {'peak KB':>9} {'out KB':>8}")
+    for name, encode in cases:
+        elapsed, peak, size = measure(encode, batch, args.repeat)
+        print(f"{name:<18} {elapsed * 1000:>9.1f} {peak / 1024:>9.0f} {size / 1024:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Price store ingest benchmark
+
+Writes the same scrape results to SQLite two ways and reports price rows
+per second and the time of a room history lookup afterwards:
+
+- per-row: what the backend's storeHotelData does today, one statement and
+  one commit at a time (find the hotel by name, update or create it, find
+  or create each room by name, insert each price), rollback journal
+- batched: store.PriceStore, WAL mode, upserts by key and one transaction
+  with executemany per batch of results
+
+    python benchmarks/bench_store.py --results 2000 --rooms 5 --batch 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pages import render_hotel_page
+from scrape import parse_hotel_page
+from store import PriceStore
+
+CHECKIN = "2024-01-15"
+
+PER_ROW_SCHEMA = """
+CREATE TABLE hotels (id INTEGER PRIMARY KEY, name TEXT, currency TEXT, amenities TEXT,
+                     rating_overall REAL, rating_location REAL);
+CREATE TABLE rooms (id INTEGER PRIMARY KEY, hotel_id INTEGER, name TEXT, occupancy INTEGER);
+CREATE TABLE daily_prices (id INTEGER PRIMARY KEY, room_id INTEGER, check_in TEXT, price REAL,
+                           available INTEGER, refundable INTEGER, breakfast_included INTEGER,
+                           scraped_at TEXT);
+"""
+
+def results(count: int, rooms: int, hotels: int) -> List[tuple]:
+    """(hotel_id, result) pairs: `hotels` hotels scraped over consecutive check-in dates"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        templates = [
+            parse_hotel_page(render_hotel_page(rooms=rooms, seed=i).encode("utf-8"),
+                             f"https://www.booking.com/hotel/xx/hotel-{i}.html", CHECKIN)
+            for i in range(hotels)
+        ]
+    pairs = []
+    for n in range(count):
+        hotel = n % hotels
+        day = n // hotels
+        result = dict(templates[hotel], hotelName=f"Hotel {hotel}",
+                      checkInDate=f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}",
+                      scrapeDate=f"2024-01-01T00:{n // 60 % 60:02d}:{n % 60:02d}.{n:06d}")
+        pairs.append((f"xx/hotel-{hotel}", result))
+    return pairs
+
+def ingest_per_row(path: str, pairs: List[tuple]) -> int:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(PER_ROW_SCHEMA)
+    rows = 0
+    for _, data in pairs:
+        hotel = conn.execute("SELECT id FROM hotels WHERE name = ? LIMIT 1", (data["hotelName"],)).fetchone()
+        values = (data["currency"], json.dumps(data["amenities"]), data["rating"]["overall"],
+                  data["rating"]["location"])
+        if hotel is None:
+            hotel_id = conn.execute("INSERT INTO hotels (name, currency, amenities, rating_overall, "
+                                    "rating_location) VALUES (?, ?, ?, ?, ?)",
+                                    (data["hotelName"], *values)).lastrowid
+        else:
+            hotel_id = hotel[0]
+            conn.execute("UPDATE hotels SET currency = ?, amenities = ?, rating_overall = ?, "
+                         "rating_location = ? WHERE id = ?", (*values, hotel_id))
+        for room in data["rooms"]:
+            found = conn.execute("SELECT id FROM rooms WHERE hotel_id = ? AND name = ? LIMIT 1",
+                                 (hotel_id, room["name"])).fetchone()
+            if found is None:
+                room_id = conn.execute("INSERT INTO rooms (hotel_id, name, occupancy) VALUES (?, ?, ?)",
+                                       (hotel_id, room["name"], room["occupancy"])).lastrowid
+            else:
+                room_id = found[0]
+            conn.execute("INSERT INTO daily_prices (room_id, check_in, price, available, refundable, "
+                         "breakfast_included, scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (room_id, data["checkInDate"], room["price"], room["available"],
+                          room["refundable"], room["breakfastIncluded"], data["scrapeDate"]))
+            rows += 1
+    conn.close()
+    return rows
+
+def lookup_per_row(path: str) -> float:
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    conn.execute("SELECT p.price FROM daily_prices p JOIN rooms r ON r.id = p.room_id "
+                 "JOIN hotels h ON h.id = r.hotel_id WHERE h.name = 'Hotel 0' AND r.name = ? "
+                 "AND p.check_in = ?", ("Room 0", CHECKIN)).fetchall()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def ingest_batched(path: str, pairs: List[tuple], batch: int) -> int:
+    db = PriceStore(path, batch_size=batch, flush_seconds=float("inf"))
+    rows = db.add_many(pairs)
+    db.close()
+    return rows
+
+def lookup_batched(path: str, room_id: str) -> float:
+    db = PriceStore(path)
+    start = time.perf_counter()
+    db.price_history("xx/hotel-0", room_id=room_id, check_in=CHECKIN)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=2000, help="Scrape results to store")
+    parser.add_argument("--rooms", type=int, default=5, help="Rooms per result")
+    parser.add_argument("--hotels", type=int, default=50, help="Distinct hotels")
+    parser.add_argument("--batch", type=int, default=200, help="Results per transaction (batched)")
+    parser.add_argument("--skip-per-row", action="store_true", help="Only run the batched writer")
+    args = parser.parse_args()
+
+    pairs = results(args.results, args.rooms, args.hotels)
+    room_id = pairs[0][1]["rooms"][0]["roomId"]
+    print(f"{args.results} results x {len(pairs[0][1]['rooms'])} rooms, {args.hotels} hotels")
+    print(f"{'writer':<9} {'rows/s':>10} {'seconds':>8} {'lookup ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [("batched", ingest_batched, (pairs, args.batch), lookup_batched, (room_id,))]
+        if not args.skip_per_row:
+            cases.insert(0, ("per-row", ingest_per_row, (pairs,), lookup_per_row, ()))
+        for name, ingest, ingest_args, lookup, lookup_args in cases:
+            path = os.path.join(tmp, f"{name}.db")
+            start = time.perf_counter()
+            rows = ingest(path, *ingest_args)
+            elapsed = time.perf_counter() - start
+            lookup_seconds = lookup(path, *lookup_args)
+            print(f"{name:<9} {rows / elapsed:>10,.0f} {elapsed:>8.2f} {lookup_seconds * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
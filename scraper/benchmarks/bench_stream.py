@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Streaming parse benchmark
+
+Scrapes stand-in pages of growing size (unrelated markup after the hotel
+sections, as on real pages) with the buffered path and with
+SCRAPER_STREAM_PARSE, and reports time to result, bytes downloaded and the
+peak RSS growth while scraping. Each mode runs in a fresh process so the
+RSS figures (which include libxml2's trees) are not polluted by the other.
+
+    python benchmarks/bench_stream.py --padding-kb 0 500 2000 --pages 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from standin import start_standin_server
+
+CHECKIN = "2024-01-15"
+
+def run_mode(streamed: bool, base_url: str, pages: int, conn) -> None:
+    import scrape
+    from metrics import DOWNLOADED_BYTES
+
+    scrape.STREAM_PARSE = streamed
+    urls = [f"{base_url}/hotel/xx/bench-hotel-{i}.html" for i in range(pages)]
+
+    async def run() -> float:
+        async with scrape.new_async_client() as client:
+            # Warm up imports, parser state and the connection
+            await scrape.async_scrape_booking(urls[0], CHECKIN, client)
+            DOWNLOADED_BYTES.reset()
+            baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            for url in urls:
+                result = await scrape.async_scrape_booking(url, CHECKIN, client)
+                assert "error" not in result, result["error"]
+            elapsed = time.perf_counter() - start
+            return elapsed, baseline
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, baseline = asyncio.run(run())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((elapsed / pages, DOWNLOADED_BYTES.value() / pages, peak - baseline))
+
+def measure(streamed: bool, base_url: str, pages: int):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=run_mode, args=(streamed, base_url, pages, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--padding-kb", type=int, nargs="+", default=[0, 500, 2000],
+                        help="KB of markup after the hotel sections")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--rooms", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'padding':>8} {'mode':>9} {'ms/page':>8} {'KB/page':>8} {'peak RSS +KB':>13}")
+    for padding_kb in args.padding_kb:
+        server, base_url = start_standin_server(rooms=args.rooms, padding_kb=padding_kb)
+        try:
+            for streamed in (False, True):
+                seconds, size, rss = measure(streamed, base_url, args.pages)
+                mode = "streamed" if streamed else "buffered"
+                print(f"{padding_kb:>6}KB {mode:>9} {seconds * 1000:>8.1f} {size / 1024:>8.0f} {rss:>13}")
+        finally:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
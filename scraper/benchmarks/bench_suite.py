@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Offline extraction benchmark with regression thresholds
+
+Runs the stages of scrape.parse_hotel_page one by one (parse, layout
+fingerprint, each field extraction, serialization) over a corpus of pages
+with no network access, and reports per-stage time, Python heap
+allocations and peak RSS per parser backend. Each backend runs in a fresh
+process.
+
+Results can be stored as a baseline and later runs compared against it;
+the exit status is 1 when any page's throughput dropped by more than the
+threshold.
+
+    python benchmarks/bench_suite.py --save-baseline     # record baselines/<backend>.json
+    python benchmarks/bench_suite.py                     # compare, fail on regression
+    python benchmarks/bench_suite.py --threshold 0.10 --pages saved/
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_parsers import archive_corpus, saved_corpus, synthetic_corpus
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+CHECKIN = "2024-01-15"
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_THRESHOLD = 0.15
+
+def page_stages() -> List[Tuple[str, Callable[[dict], None]]]:
+    """
+    The stages of parse_hotel_page, in order
+
+    Each stage reads what it needs from and stores its output in a shared
+    per-page dict, so stages can be timed individually.
+    """
+    from scrape import (HotelData, Rating, extract_amenities, extract_currency, extract_hotel_id,
+                        extract_hotel_name, extract_overall_rating, extract_rooms, hotel_data_to_dict,
+                        page_layout)
+
+    def parse(page: dict) -> None:
+        page["root"] = page["parser"].parse(page["content"])
+
+    def layout(page: dict) -> None:
+        page["layout"] = page_layout(page["content"])
+
+    def field(name: str, extract: Callable) -> Tuple[str, Callable[[dict], None]]:
+        def run(page: dict) -> None:
+            page[name] = extract(page["parser"], page["root"], page["layout"])
+        return name, run
+
+    def rooms(page: dict) -> None:
+        page["rooms"] = extract_rooms(page["parser"], page["root"], extract_hotel_id(URL), page["layout"])
+
+    def serialize(page: dict) -> None:
+        hotel_data = HotelData(
+            hotel_id=extract_hotel_id(URL),
+            hotel_name=page["hotel_name"] or "Unknown Hotel",
+            currency=page["currency"],
+            scrape_date="2024-01-01T00:00:00",
+            check_in_date=CHECKIN,
+            rooms=page["rooms"],
+            rating=Rating(page["rating"], 0.0),
+            amenities=page["amenities"][:10]
+        )
+        json.dumps(hotel_data_to_dict(hotel_data))
+
+    return [
+        ("parse", parse),
+        ("layout", layout),
+        field("hotel_name", extract_hotel_name),
+        field("currency", extract_currency),
+        ("rooms", rooms),
+        field("rating", extract_overall_rating),
+        field("amenities", extract_amenities),
+        ("serialize", serialize),
+    ]
+
+def run_backend(name: str, corpus: List[Tuple[str, bytes]], repeat: int) -> dict:
+    """Benchmark one backend over the corpus; runs in its own process"""
+    from parsers import get_parser
+
+    parser = get_parser(name)
+    stages = page_stages()
+
+    def run_page(content: bytes) -> Dict[str, float]:
+        page = {"parser": parser, "content": content}
+        timings = {}
+        for stage, run in stages:
+            start = time.perf_counter()
+            run(page)
+            timings[stage] = time.perf_counter() - start
+        return timings
+
+    # Warm up imports, selector compilation and the selector registry
+    for _, content in corpus:
+        run_page(content)
+
+    pages = {}
+    for label, content in corpus:
+        runs = [run_page(content) for _ in range(repeat)]
+        stage_ms = {stage: statistics.median(run[stage] for run in runs) * 1000 for stage, _ in stages}
+        total = statistics.median(sum(run.values()) for run in runs)
+
+        tracemalloc.start()
+        run_page(content)
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        pages[label] = {
+            "bytes": len(content),
+            "pagesPerSec": round(1 / total, 2),
+            "totalMs": round(total * 1000, 3),
+            "stagesMs": {stage: round(ms, 3) for stage, ms in stage_ms.items()},
+            "heapPeakKb": heap_peak // 1024,
+        }
+
+    return {
+        "backend": name,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "peakRssKb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "pages": pages,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """
+    Pages whose throughput regressed by more than threshold
+
+    Args:
+        baseline: A stored run_backend result
+        current: The run_backend result to check
+        threshold: Allowed relative throughput drop (0.15 = 15%)
+
+    Returns:
+        One message per regressed page (empty if none)
+    """
+    regressions = []
+    for label, page in current["pages"].items():
+        before = baseline["pages"].get(label)
+        if before is None:
+            continue
+        change = page["pagesPerSec"] / before["pagesPerSec"] - 1
+        if change < -threshold:
+            slowest = max(page["stagesMs"], key=lambda stage: page["stagesMs"][stage]
+                          - before["stagesMs"].get(stage, 0.0))
+            regressions.append(f"{current['backend']}/{label}: {before['pagesPerSec']:.1f} -> "
+                               f"{page['pagesPerSec']:.1f} pages/s ({change:+.0%}, mostly in {slowest})")
+    return regressions
+
+def print_report(result: dict, baseline: dict = None) -> None:
+    stage_names = list(next(iter(result["pages"].values()))["stagesMs"])
+    print(f"\n{result['backend']} (peak RSS {result['peakRssKb'] // 1024} MB)")
+    print(f"{'page':<16} {'KB':>6} " + " ".join(f"{stage[:10]:>10}" for stage in stage_names)
+          + f" {'total ms':>9} {'pages/s':>8} {'vs base':>8} {'heap KB':>8}")
+    for label, page in result["pages"].items():
+        before = (baseline or {}).get("pages", {}).get(label)
+        delta = f"{page['pagesPerSec'] / before['pagesPerSec'] - 1:+.0%}" if before else "-"
+        print(f"{label:<16} {page['bytes'] // 1024:>6} "
+              + " ".join(f"{page['stagesMs'][stage]:>10.3f}" for stage in stage_names)
+              + f" {page['totalMs']:>9.3f} {page['pagesPerSec']:>8.1f} {delta:>8} {page['heapPeakKb']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", help="Directory of saved Booking.com hotel pages (*.html)")
+    parser.add_argument("--archive", help="Page archive directory (see archive.py)")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum pages taken from --archive")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--backends", nargs="+", help="Backends to run (default: all)")
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative throughput drop before failing (default: 0.15)")
+    args = parser.parse_args()
+
+    from parsers import PARSERS
+
+    if args.archive:
+        corpus = archive_corpus(args.archive, args.limit)
+    elif args.pages:
+        corpus = saved_corpus(args.pages)
+    else:
+        corpus = synthetic_corpus()
+    if not corpus:
+        sys.exit(f"No pages found in {args.archive or args.pages}")
+
+    context = multiprocessing.get_context("spawn")
+    regressions = []
+    for name in args.backends or list(PARSERS):
+        with context.Pool(1) as pool:
+            try:
+                result = pool.apply(run_backend, (name, corpus, args.repeat))
+            except RuntimeError as e:
+                print(f"Skipping {name}: {e}")
+                continue
+
+        path = os.path.join(args.baseline_dir, f"{name}.json")
+        baseline = None
+        if os.path.exists(path):
+            with open(path) as f:
+                baseline = json.load(f)
+        print_report(result, baseline)
+
+        if args.save_baseline:
+            os.makedirs(args.baseline_dir, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2)
+            print(f"Baseline saved to {path}")
+        elif baseline is not None:
+            regressions.extend(compare(baseline, result, args.threshold))
+
+    if regressions:
+        print(f"\nThroughput regressions beyond {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for the scraper API
+
+Sends scrape requests at a target rate and reports latency percentiles,
+throughput and a breakdown of errors. The load is open loop: requests go
+out on schedule whether or not earlier ones have answered, so a slow API
+shows up as latency instead of a lower request rate. Requests that would
+exceed --max-in-flight are dropped and counted.
+
+Endpoints: "scrape" (POST /scrape), "scrape-get" (GET /scrape) and
+"batch" (POST /scrape/batch with --batch-size items per request).
+Requests cycle through --hotels distinct hotels and --checkins dates, so
+the result cache only starts answering once every pair was asked once.
+
+Without --api everything runs offline: the stand-in server (standin.py)
+and the API (uvicorn, with SCRAPER_BOOKING_BASE_URL pointing at the
+stand-in) are started as subprocesses and stopped afterwards.
+
+    python benchmarks/loadgen.py --rps 50 --duration 30 --latency 0.1 --jitter 0.05
+    python benchmarks/loadgen.py --endpoint batch --batch-size 20 --rps 2 --error-rate 0.05
+    python benchmarks/loadgen.py --api http://127.0.0.1:8000 --standin http://127.0.0.1:8100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPER_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+ENDPOINTS = ("scrape", "scrape-get", "batch")
+FIRST_CHECKIN = date(2030, 1, 1)
+
+# (method, path, keyword arguments for httpx, number of hotels asked for)
+Request = Tuple[str, str, dict, int]
+
+@dataclass
+class LoadStats:
+    """Outcome of a load run; outcomes counts "ok" or an error key per request"""
+    latencies: List[float] = field(default_factory=list)
+    outcomes: Counter = field(default_factory=Counter)
+    # Per-hotel outcomes of batch requests
+    items: Counter = field(default_factory=Counter)
+    cache: Counter = field(default_factory=Counter)
+    sent: int = 0
+    dropped: int = 0
+    elapsed: float = 0.0
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted values, or None if there are none"""
+    if not values:
+        return None
+    rank = max(int(-(-p * len(values) // 100)), 1)
+    return values[min(rank, len(values)) - 1]
+
+def error_kind(message: Optional[str]) -> str:
+    """Short key for a scrape error message: upstream_<status>, circuit_open or the message itself"""
+    message = message or ""
+    match = re.search(r"'(\d{3}) ", message)
+    if match:
+        return f"upstream_{match.group(1)}"
+    if "Circuit open" in message:
+        return "circuit_open"
+    first_line = message.strip().splitlines()[0] if message.strip() else "unknown"
+    return first_line[:60]
+
+def classify(response: Optional[httpx.Response], error: Optional[Exception] = None) -> str:
+    """Outcome key of one API response: "ok", http_<status>[: kind], scrape: kind or the exception class"""
+    if error is not None:
+        return type(error).__name__
+    if response.status_code != 200:
+        try:
+            detail = response.json().get("detail")
+        except ValueError:
+            detail = None
+        if isinstance(detail, str):
+            return f"http_{response.status_code}: {error_kind(detail)}"
+        return f"http_{response.status_code}"
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        if isinstance(body, dict) and body.get("success") is False:
+            return f"scrape: {error_kind(body.get('error'))}"
+    return "ok"
+
+def batch_items(response: httpx.Response) -> Counter:
+    """Per-item outcomes of an NDJSON batch response"""
+    items = Counter()
+    for line in response.text.splitlines():
+        if line.strip():
+            result = json.loads(line)
+            items["ok" if result.get("success") else error_kind(result.get("error"))] += 1
+    return items
+
+def request_factory(endpoint: str, standin_url: str, hotels: int = 1000, checkins: int = 30,
+                    fields: Optional[str] = None, batch_size: int = 10) -> Callable[[int], Request]:
+    """
+    Build the function that returns the i-th request of a run
+
+    Args:
+        endpoint: One of ENDPOINTS
+        standin_url: Base URL the hotel URLs are built on (the API's SCRAPER_BOOKING_BASE_URL)
+        hotels: Distinct hotel slugs to cycle through
+        checkins: Distinct check-in dates per hotel
+        fields: Optional fields= projection
+        batch_size: Items per batch request
+
+    Raises:
+        ValueError: If endpoint is unknown
+    """
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"Unknown endpoint {endpoint}, expected one of {', '.join(ENDPOINTS)}")
+
+    def item(n: int) -> dict:
+        checkin = FIRST_CHECKIN + timedelta(days=(n // hotels) % checkins)
+        body = {"url": f"{standin_url}/hotel/xx/load-hotel-{n % hotels}.html",
+                "checkin": checkin.isoformat()}
+        if fields:
+            body["fields"] = fields
+        return body
+
+    def make(i: int) -> Request:
+        if endpoint == "scrape":
+            return "POST", "/scrape", {"json": item(i)}, 1
+        if endpoint == "scrape-get":
+            return "GET", "/scrape", {"params": item(i)}, 1
+        items = [item(i * batch_size + n) for n in range(batch_size)]
+        return "POST", "/scrape/batch", {"json": {"items": items}}, batch_size
+
+    return make
+
+async def run_load(client: httpx.AsyncClient, make_request: Callable[[int], Request], rps: float,
+                   duration: float, max_in_flight: int = 100) -> LoadStats:
+    """
+    Send rps * duration requests on an open-loop schedule
+
+    Args:
+        client: Client whose base_url is the API
+        make_request: Returns the i-th request (see request_factory)
+        rps: Target requests per second
+        duration: Seconds to send requests for
+        max_in_flight: Requests outstanding before new ones are dropped
+
+    Returns:
+        LoadStats; elapsed runs until the last response arrived
+    """
+    stats = LoadStats()
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    in_flight = 0
+
+    async def send(i: int):
+        nonlocal in_flight
+        method, path, kwargs, size = make_request(i)
+        start = time.perf_counter()
+        response, error = None, None
+        try:
+            response = await client.request(method, path, **kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            in_flight -= 1
+        stats.latencies.append(time.perf_counter() - start)
+        outcome = classify(response, error)
+        stats.outcomes[outcome] += 1
+        if response is not None:
+            if "X-Cache" in response.headers:
+                stats.cache[response.headers["X-Cache"]] += 1
+            if path == "/scrape/batch" and outcome == "ok":
+                stats.items.update(batch_items(response))
+            elif size > 1:
+                stats.items[outcome] += size
+
+    start = loop.time()
+    for i in range(max(int(rps * duration), 1)):
+        delay = start + i / rps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            stats.dropped += 1
+            continue
+        in_flight += 1
+        stats.sent += 1
+        task = asyncio.create_task(send(i))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    stats.elapsed = loop.time() - start
+    stats.latencies.sort()
+    return stats
+
+def summarize(stats: LoadStats, rps: float) -> dict:
+    """JSON-friendly report of a run; latencies in milliseconds"""
+    latency = {f"p{p}": percentile(stats.latencies, p) for p in (50, 95, 99)}
+    latency["max"] = stats.latencies[-1] if stats.latencies else None
+    completed = sum(stats.outcomes.values())
+    report = {
+        "targetRps": rps,
+        "sent": stats.sent,
+        "dropped": stats.dropped,
+        "completed": completed,
+        "ok": stats.outcomes["ok"],
+        "seconds": round(stats.elapsed, 3),
+        "throughput": round(completed / stats.elapsed, 2) if stats.elapsed else 0.0,
+        "latencyMs": {name: round(value * 1000, 2) if value is not None else None
+                      for name, value in latency.items()},
+        "errors": {key: count for key, count in stats.outcomes.most_common() if key != "ok"},
+        "cache": dict(stats.cache),
+    }
+    if stats.items:
+        report["items"] = dict(stats.items)
+        report["itemsPerSecond"] = round(stats.items["ok"] / stats.elapsed, 2) if stats.elapsed else 0.0
+    return report
+
+def print_report(report: dict):
+    latency = report["latencyMs"]
+    print(f"Sent {report['sent']} requests ({report['dropped']} dropped at the in-flight cap), "
+          f"{report['ok']}/{report['completed']} ok in {report['seconds']}s")
+    print(f"Throughput: {report['throughput']} req/s (target {report['targetRps']})")
+    if "itemsPerSecond" in report:
+        print(f"Batch items: {report['itemsPerSecond']} ok/s, {report['items']}")
+    print("Latency ms: " + "  ".join(f"{name} {value}" for name, value in latency.items()))
+    if report["cache"]:
+        print("X-Cache: " + ", ".join(f"{name} {count}" for name, count in sorted(report["cache"].items())))
+    for key, count in report["errors"].items():
+        print(f"  {count:>6}  {key}")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    """Poll url until it answers; raise RuntimeError if the process exits or time runs out"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not answer within {timeout:.0f}s")
+
+def start_services(args) -> Tuple[str, str, List[subprocess.Popen]]:
+    """Start the stand-in server and the API as subprocesses; returns (standin_url, api_url, processes)"""
+    processes = []
+    standin_port, api_port = free_port(), free_port()
+    standin_url = f"http://127.0.0.1:{standin_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+    standin_cmd = [sys.executable, os.path.join(BENCHMARKS_DIR, "standin.py"), "--port", str(standin_port),
+                   "--latency", str(args.latency), "--jitter", str(args.jitter), "--rooms", str(args.rooms),
+                   "--capacity", str(args.capacity), "--rate-limit", str(args.rate_limit),
+                   "--error-rate", str(args.error_rate), "--padding-kb", str(args.padding_kb)]
+    if args.pages_dir:
+        standin_cmd += ["--pages-dir", os.path.abspath(args.pages_dir)]
+    env = {**os.environ, "SCRAPER_BOOKING_BASE_URL": standin_url}
+    try:
+        processes.append(subprocess.Popen(standin_cmd, stdout=subprocess.DEVNULL))
+        wait_ready(f"{standin_url}/hotel/xx/ready.html", processes[-1])
+        # The API logs every scrape on stdout; keep warnings and errors
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(api_port), "--log-level", "warning"],
+            cwd=SCRAPER_DIR, env=env, stdout=subprocess.DEVNULL))
+        wait_ready(f"{api_url}/health", processes[-1])
+    except Exception:
+        stop_services(processes)
+        raise
+    return standin_url, api_url, processes
+
+def stop_services(processes: List[subprocess.Popen]):
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def drive(args, api_url: str, standin_url: str) -> dict:
+    make_request = request_factory(args.endpoint, standin_url, args.hotels, args.checkins,
+                                   args.fields, args.batch_size)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as client:
+        stats = await run_load(client, make_request, args.rps, args.duration, args.max_in_flight)
+    return summarize(stats, args.rps)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--endpoint", choices=ENDPOINTS, default="scrape")
+    arg_parser.add_argument("--rps", type=float, default=20.0, help="Target requests per second")
+    arg_parser.add_argument("--duration", type=float, default=10.0, help="Seconds to send requests for")
+    arg_parser.add_argument("--max-in-flight", type=int, default=200, help="Outstanding requests before dropping")
+    arg_parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request")
+    arg_parser.add_argument("--hotels", type=int, default=1000, help="Distinct hotels to cycle through")
+    arg_parser.add_argument("--checkins", type=int, default=30, help="Distinct check-in dates per hotel")
+    arg_parser.add_argument("--batch-size", type=int, default=10, help="Items per batch request")
+    arg_parser.add_argument("--fields", help="fields= projection sent with every item")
+    arg_parser.add_argument("--api", help="Use a running API instead of starting one")
+    arg_parser.add_argument("--standin", help="Base URL of the hotel pages (the API's SCRAPER_BOOKING_BASE_URL)")
+    arg_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    group = arg_parser.add_argument_group("stand-in server (without --api)")
+    group.add_argument("--latency", type=float, default=0.05)
+    group.add_argument("--jitter", type=float, default=0.0)
+    group.add_argument("--rooms", type=int, default=5)
+    group.add_argument("--capacity", type=int, default=0)
+    group.add_argument("--rate-limit", type=float, default=0.0)
+    group.add_argument("--error-rate", type=float, default=0.0)
+    group.add_argument("--padding-kb", type=int, default=0)
+    group.add_argument("--pages-dir", help="Serve the saved *.html hotel pages in this directory")
+    args = arg_parser.parse_args()
+
+    processes = []
+    if args.api:
+        api_url = args.api.rstrip("/")
+        standin_url = (args.standin or "https://www.booking.com").rstrip("/")
+    else:
+        standin_url, api_url, processes = start_services(args)
+    try:
+        report = asyncio.run(drive(args, api_url, standin_url))
+    finally:
+        stop_services(processes)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
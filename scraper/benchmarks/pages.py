@@ -0,0 +1,145 @@
+"""
+Synthetic Booking.com hotel and search-result pages for offline benchmarks and tests
+
+The markup mirrors the selectors used by scrape.py so every extraction
+stage has real work to do.
+"""
+
+import random
+from typing import List, Optional
+
+AMENITIES = [
+    "Free WiFi", "Swimming pool", "Fitness centre", "Non-smoking rooms",
+    "Airport shuttle", "Restaurant", "Room service", "Bar", "Spa",
+    "Parking on site", "Family rooms", "24-hour front desk", "Lift",
+    "Heating", "Air conditioning", "Laundry", "Garden", "Terrace",
+]
+
+ROOM_TYPES = [
+    "Standard Double Room", "Deluxe King Room", "Twin Room", "Superior Queen Room",
+    "Junior Suite", "Family Room", "Studio", "Executive Suite",
+]
+
+def render_room_row(hotel_id: str, index: int, price: Optional[float],
+                    currency: str = "€", rng: Optional[random.Random] = None) -> str:
+    """Render one room/rate row of the hotel room table"""
+    rng = rng or random.Random(index)
+    name = ROOM_TYPES[index % len(ROOM_TYPES)]
+    occupancy = rng.choice([1, 2, 2, 3, 4])
+    conditions = []
+    if rng.random() < 0.5:
+        conditions.append("<li>Free cancellation - refundable</li>")
+    if rng.random() < 0.4:
+        conditions.append("<li>Breakfast included</li>")
+    price_html = ""
+    if price is not None:
+        price_html = f'<span class="prco-valign-middle-helper">{currency} {price:,.2f}</span>'
+    return (
+        f'<tr data-block-id="hotel_room_{hotel_id}_{index}" class="hprt-table-row">'
+        f'<td class="hprt-table-cell-roomtype"><a class="hprt-roomtype-icon-link" href="#room_{index}">{name}</a>'
+        f'<div class="hprt-facilities-block">{"".join(f"<span>{a}</span>" for a in AMENITIES[:6])}</div></td>'
+        f'<td class="hprt-table-cell-occupancy"><span class="occupancy-info">Max people: {occupancy}</span></td>'
+        f'<td class="hprt-table-cell-price"><div class="bui-price-display">{price_html}</div></td>'
+        f'<td class="hprt-table-cell-conditions"><ul>{"".join(conditions)}</ul></td>'
+        f'</tr>'
+    )
+
+def render_hotel_page(hotel_id: str = "grand-plaza", name: str = "Grand Plaza Hotel",
+                      rooms: int = 5, amenities: int = 10, rating: float = 8.6,
+                      currency: str = "€", padding_kb: int = 0, seed: int = 0) -> str:
+    """
+    Render a synthetic hotel page
+
+    Args:
+        hotel_id: Hotel slug used in room block ids
+        name: Hotel name shown in the title
+        rooms: Number of room rows (0 renders a page with no room table)
+        amenities: Number of facility entries
+        rating: Overall review score
+        currency: Currency symbol shown next to prices and in the header
+        padding_kb: Approximate KB of unrelated markup (scripts, reviews) to add
+        seed: Seed for room conditions and prices
+
+    Returns:
+        HTML document as a string
+    """
+    rng = random.Random(seed)
+    facility_items: List[str] = [
+        f'<li class="bui-list__item"><div class="bui-list__description">{AMENITIES[i % len(AMENITIES)]}</div></li>'
+        for i in range(amenities)
+    ]
+    room_rows = [
+        render_room_row(hotel_id, i, round(rng.uniform(60, 900), 2), currency, rng)
+        for i in range(rooms)
+    ]
+    # Unrelated markup that real pages carry: review snippets, nav, inline JSON
+    filler: List[str] = []
+    size = 0
+    i = 0
+    while size < padding_kb * 1024:
+        chunk = (
+            f'<div class="review-card"><p class="review-title">Review {i}</p>'
+            f'<p class="review-text">{"Lovely stay, friendly staff and a great location. " * 4}</p>'
+            f'<span class="review-date">2024-01-{(i % 28) + 1:02d}</span></div>'
+        )
+        filler.append(chunk)
+        size += len(chunk)
+        i += 1
+    room_table = ""
+    if room_rows:
+        room_table = (
+            '<table class="hprt-table"><thead><tr><th>Room type</th><th>Sleeps</th>'
+            '<th>Price</th><th>Your choices</th></tr></thead>'
+            f'<tbody>{"".join(room_rows)}</tbody></table>'
+        )
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>{name} - Booking.com</title></head><body>'
+        f'<header><nav><span class="currency">{currency}</span></nav></header>'
+        f'<div id="hp_hotel_name_wrapper"><h2 data-testid="title" class="pp-header__title">{name}</h2></div>'
+        f'<div data-testid="review-score-component"><div class="score">{rating}</div><div>Very good</div></div>'
+        f'<div class="hotel-facilities-group"><ul class="bui-list">{"".join(facility_items)}</ul></div>'
+        f'<div id="available_rooms">{room_table}</div>'
+        f'<section class="reviews">{"".join(filler)}</section>'
+        '</body></html>'
+    )
+
+def render_search_page(city: str = "Paris", hotels: int = 100, offset: int = 0, rows: int = 25,
+                       currency: str = "€", seed: int = 0) -> str:
+    """
+    Render a synthetic search-result page
+
+    Args:
+        city: Destination shown in the heading and used in hotel slugs
+        hotels: Number of properties the search found
+        offset: Index of the first property on this page
+        rows: Properties per page
+        currency: Currency symbol shown next to prices
+        seed: Seed for prices and review scores
+
+    Returns:
+        HTML document as a string, with cards offset..offset+rows-1 and the
+        pagination control
+    """
+    rng = random.Random(seed * 100003 + offset)
+    slug = city.lower().replace(" ", "-")
+    cards = []
+    for i in range(offset, min(offset + rows, hotels)):
+        score = f'<div data-testid="review-score"><div>{rng.uniform(6, 9.8):.1f}</div><div>Very good</div></div>'
+        price = f'<span data-testid="price-and-discounted-price">{currency} {rng.uniform(60, 900):,.0f}</span>'
+        cards.append(
+            f'<div data-testid="property-card" role="listitem">'
+            f'<h3><a data-testid="title-link" href="/hotel/xx/{slug}-hotel-{i}.html">'
+            f'<div data-testid="title">{city} Hotel {i}</div></a></h3>{score}'
+            f'<div data-testid="recommended-units"><h4>{ROOM_TYPES[i % len(ROOM_TYPES)]}</h4></div>'
+            f'<div data-testid="availability-rate-information">{price}</div></div>'
+        )
+    pages = max((hotels + rows - 1) // rows, 1)
+    pagination = "".join(f'<li><button type="button">{page}</button></li>' for page in range(1, pages + 1))
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>Hotels in {city} - Booking.com</title></head><body>'
+        f'<h1>{city}: {hotels:,} properties found</h1><div role="list">{"".join(cards)}</div>'
+        f'<div data-testid="pagination"><nav><ol>{pagination}</ol></nav></div>'
+        '</body></html>'
+    )
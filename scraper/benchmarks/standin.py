@@ -0,0 +1,227 @@
+"""
+Local Booking.com stand-in server
+
+Serves hotel pages so the scraper can be exercised without touching
+booking.com. Every request to /hotel/<cc>/<slug>.html returns a page
+rendered by pages.render_hotel_page, or, with `pages_dir`, one of the saved
+*.html pages in that directory (<slug>.html if there is one, otherwise a
+page picked by the slug). /searchresults.html returns a synthetic result
+page (pages.render_search_page) for its offset= and rows= parameters.
+
+Each response can be delayed by `latency` plus up to `jitter` seconds and
+padded with `padding_kb` of unrelated markup. To exercise the fetch layer
+the server can also push back: requests beyond `capacity` concurrent ones
+or beyond `rate_limit` per second get 429, a fraction `error_rate` gets
+503, all with an optional Retry-After header. These attributes can be
+changed while the server runs.
+
+    python benchmarks/standin.py --port 8100 --latency 0.1 --jitter 0.05 --error-rate 0.01
+"""
+
+import glob
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from pages import render_hotel_page, render_search_page
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0, rooms: int = 5,
+                 capacity: int = 0, error_rate: float = 0.0, retry_after: Optional[str] = None,
+                 padding_kb: int = 0, jitter: float = 0.0, rate_limit: float = 0.0,
+                 pages_dir: Optional[str] = None, search_hotels: int = 100):
+        super().__init__(address, StandinHandler)
+        self.latency = latency
+        # Extra random delay, uniform in [0, jitter] seconds
+        self.jitter = jitter
+        self.rooms = rooms
+        # KB of unrelated markup after the hotel sections
+        self.padding_kb = padding_kb
+        # Concurrent requests served before answering 429 (0 = unlimited)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # Requests per second served before answering 429 (0 = unlimited)
+        self.rate_limit = rate_limit
+        # Fraction of requests answered with 503
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        # Properties found by every search
+        self.search_hotels = search_hotels
+        self.in_flight = 0
+        self.counts = {"served": 0, "throttled": 0, "errors": 0}
+        self._pages = {}
+        self._saved = {}
+        if pages_dir:
+            for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+                with open(path, "rb") as f:
+                    self._saved[os.path.splitext(os.path.basename(path))[0]] = f.read()
+            if not self._saved:
+                raise ValueError(f"No *.html pages in {pages_dir}")
+
+    @property
+    def rate_limit(self) -> float:
+        return self._rate_limit
+
+    @rate_limit.setter
+    def rate_limit(self, value: float):
+        # A new limit starts with a full bucket
+        with self._lock:
+            self._rate_limit = value
+            self._tokens = float(value)
+            self._refilled = time.monotonic()
+
+    def _take_token(self) -> bool:
+        """Token bucket for rate_limit (burst of one second's worth); call with the lock held"""
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._refilled) * self.rate_limit, self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def admit(self) -> int:
+        """Take a request slot; returns 200, or the status to refuse it with"""
+        with self._lock:
+            if self.error_rate and random.random() < self.error_rate:
+                self.counts["errors"] += 1
+                return 503
+            if ((self.capacity and self.in_flight >= self.capacity)
+                    or (self.rate_limit and not self._take_token())):
+                self.counts["throttled"] += 1
+                return 429
+            self.in_flight += 1
+            self.counts["served"] += 1
+            return 200
+
+    def done(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def delay(self) -> float:
+        """Seconds to hold the next response"""
+        return self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def page_for(self, hotel_id: str, checkin: str = "") -> bytes:
+        """Render (and memoize) the page for a hotel slug; prices vary by check-in date"""
+        if self._saved:
+            saved = self._saved.get(hotel_id)
+            if saved is None:
+                names = list(self._saved)
+                saved = self._saved[names[zlib.crc32(hotel_id.encode()) % len(names)]]
+            return saved
+        key = (hotel_id, checkin)
+        page = self._pages.get(key)
+        if page is None:
+            page = render_hotel_page(hotel_id=hotel_id, name=hotel_id.replace("-", " ").title(),
+                                     rooms=self.rooms, padding_kb=self.padding_kb,
+                                     seed=zlib.crc32(checkin.encode())).encode("utf-8")
+            self._pages[key] = page
+        return page
+
+    def search_page_for(self, city: str, offset: int, rows: int, checkin: str = "") -> bytes:
+        """Render (and memoize) a search-result page"""
+        key = ("search", city, offset, rows, checkin)
+        page = self._pages.get(key)
+        if page is None:
+            page = render_search_page(city=city, hotels=self.search_hotels, offset=offset, rows=rows,
+                                      seed=zlib.crc32(checkin.encode())).encode("utf-8")
+            self._pages[key] = page
+        return page
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # waits for the client's delayed ACK (about 40ms per response)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        match = re.search(r'/hotel/(?:[^/]+/)?([^/?.]+)', parts.path)
+        is_search = parts.path.startswith("/searchresults")
+        if not match and not is_search:
+            self.send_error(404)
+            return
+        status = self.server.admit()
+        if status != 200:
+            self.send_response(status)
+            if self.server.retry_after is not None:
+                self.send_header("Retry-After", self.server.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            delay = self.server.delay()
+            if delay:
+                time.sleep(delay)
+            checkin = params.get("checkin", "")
+            if is_search:
+                rows = params.get("rows", "25")
+                offset = params.get("offset", "0")
+                body = self.server.search_page_for(params.get("ss", "Paris"),
+                                                   int(offset) if offset.isdigit() else 0,
+                                                   int(rows) if rows.isdigit() else 25, checkin)
+            else:
+                body = self.server.page_for(match.group(1), checkin)
+        finally:
+            self.server.done()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_standin_server(latency: float = 0.0, rooms: int = 5, host: str = "127.0.0.1",
+                         port: int = 0, **options) -> Tuple[StandinServer, str]:
+    """
+    Start the stand-in server on a background thread
+
+    Args:
+        options: capacity, rate_limit, error_rate, retry_after, jitter,
+            padding_kb, pages_dir and search_hotels (see StandinServer)
+
+    Returns:
+        (server, base_url) - call server.shutdown() when done
+    """
+    server = StandinServer((host, port), latency=latency, rooms=rooms, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve stand-in Booking.com hotel and search pages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay, up to this many seconds")
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--capacity", type=int, default=0, help="Concurrent requests before answering 429")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second before answering 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--retry-after", help="Retry-After header sent with 429/503 responses")
+    parser.add_argument("--padding-kb", type=int, default=0, help="KB of unrelated markup per page")
+    parser.add_argument("--pages-dir", help="Serve the saved *.html hotel pages in this directory")
+    parser.add_argument("--search-hotels", type=int, default=100, help="Properties found by every search")
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), latency=args.latency, rooms=args.rooms,
+                           capacity=args.capacity, error_rate=args.error_rate, retry_after=args.retry_after,
+                           padding_kb=args.padding_kb, jitter=args.jitter, rate_limit=args.rate_limit,
+                           pages_dir=args.pages_dir, search_hotels=args.search_hotels)
+    print(f"Stand-in server on http://{args.host}:{args.port}/hotel/xx/<slug>.html", flush=True)
+    server.serve_forever()
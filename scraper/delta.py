@@ -0,0 +1,98 @@
+"""
+Change detection between successive scrapes of a hotel and check-in date
+
+Polling a hotel mostly returns what the previous poll returned. Each room
+is reduced to a 64-bit fingerprint of the fields a consumer stores (name,
+occupancy, price, availability, conditions and the page currency); the
+last fingerprints per (hotel, check-in date) are kept, and a scrape in
+delta mode is reduced to the rooms that are new or whose fingerprint
+changed, the ids of rooms that vanished, and a noChange marker when there
+is nothing else.
+
+DeltaTracker keeps the last state in memory for the API (see
+SCRAPER_DELTA_MAX_KEYS), separately per consumer so that two clients
+polling the same hotel do not take each other's changes; the price store
+keeps its own per-room state in SQLite to write only changed rows (see
+store.py).
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# (hotel, check-in) states kept by the API's tracker, least recently used dropped first
+DELTA_MAX_KEYS = int(os.environ.get("SCRAPER_DELTA_MAX_KEYS", "50000"))
+
+def room_fingerprint(room: dict, currency: str = "") -> int:
+    """Signed 64-bit fingerprint of a room's stored fields (fits an SQLite INTEGER)"""
+    state = "\x1f".join((room["name"], str(room["occupancy"]), repr(room["price"]), currency,
+                         "1" if room["available"] else "0", "1" if room["refundable"] else "0",
+                         "1" if room["breakfastIncluded"] else "0"))
+    digest = hashlib.blake2b(state.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def room_state(hotel_data: dict) -> Dict[str, int]:
+    """roomId -> fingerprint of every room of a result"""
+    currency = hotel_data["currency"]
+    return {room["roomId"]: room_fingerprint(room, currency) for room in hotel_data["rooms"]}
+
+def diff_result(hotel_data: dict, previous: Optional[Dict[str, int]],
+                current: Dict[str, int]) -> dict:
+    """
+    Delta form of a result against the previous room state
+
+    Returns:
+        Copy of hotel_data whose rooms are only the new or changed ones, with
+        removedRooms (ids no longer on the page), unchangedRooms (count) and
+        noChange (nothing new, changed or removed)
+    """
+    previous = previous or {}
+    rooms = [room for room in hotel_data["rooms"] if previous.get(room["roomId"]) != current[room["roomId"]]]
+    removed = [room_id for room_id in previous if room_id not in current]
+    return {
+        **hotel_data,
+        "rooms": rooms,
+        "removedRooms": removed,
+        "unchangedRooms": len(current) - len(rooms),
+        "noChange": not rooms and not removed,
+    }
+
+class DeltaTracker:
+    """Last room state per (hotel, check-in date), bounded LRU"""
+
+    def __init__(self, max_keys: int = DELTA_MAX_KEYS):
+        self.max_keys = max_keys
+        # (consumer, key) -> room state
+        self._states: "OrderedDict[Tuple[str, str], Dict[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"results": 0, "unchanged": 0, "roomsSent": 0, "roomsSkipped": 0, "evictions": 0}
+
+    def diff(self, key: str, hotel_data: dict, consumer: str = "") -> dict:
+        """
+        Reduce a successful result to its changes since the consumer's last call for key
+
+        Each consumer has its own baseline, so a delta is relative to what
+        was last returned to that consumer for the hotel and date; callers
+        that share a consumer (the default "" included) share the baseline.
+        A key the consumer never saw (or that was evicted) returns every room.
+        """
+        current = room_state(hotel_data)
+        with self._lock:
+            previous = self._states.pop((consumer, key), None)
+            self._states[(consumer, key)] = current
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+                self._counters["evictions"] += 1
+        result = diff_result(hotel_data, previous, current)
+        with self._lock:
+            self._counters["results"] += 1
+            self._counters["unchanged"] += result["noChange"]
+            self._counters["roomsSent"] += len(result["rooms"])
+            self._counters["roomsSkipped"] += result["unchangedRooms"]
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._states), "maxKeys": self.max_keys, **self._counters}
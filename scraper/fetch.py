@@ -0,0 +1,372 @@
+"""
+Adaptive fetch layer shared by all scrape paths
+
+Every upstream GET goes through FetchLayer.get, which keeps per-host state:
+
+- Concurrency: an AIMD limit on requests in flight to the host. Until the
+  host first throttles us each success adds 1 (slow start, doubling per
+  round of requests); after that each success adds 1/limit (about +1 per
+  round). Each throttling response (429/503) halves the limit, at most once
+  per cooldown.
+- Retries: retryable statuses (429, 5xx gateway errors) and transport errors
+  are retried with exponential backoff and full jitter. A Retry-After header
+  delays the retry and pauses every request to the host until it passes.
+- Circuit breaker: after SCRAPER_BREAKER_THRESHOLD consecutive failed
+  attempts the breaker opens and requests fail fast with CircuitOpenError.
+  After SCRAPER_BREAKER_OPEN_SECONDS one trial request is let through
+  (half-open); its outcome closes or re-opens the breaker.
+
+The limit, breaker and counters are shared by every event loop of the
+process; requests in flight and waiters are counted per loop, since each
+thread running asyncio.run (the sync wrappers) has its own.
+
+State per host is available from FetchLayer.stats() and as metrics.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import CIRCUIT_STATE, FETCH_RETRIES, HOST_CONCURRENCY_LIMIT, HOST_IN_FLIGHT
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})
+
+INITIAL_CONCURRENCY = float(os.environ.get("SCRAPER_HOST_INITIAL_CONCURRENCY", "8"))
+MAX_HOST_CONCURRENCY = float(os.environ.get("SCRAPER_HOST_MAX_CONCURRENCY", "64"))
+MAX_RETRIES = int(os.environ.get("SCRAPER_FETCH_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("SCRAPER_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("SCRAPER_BACKOFF_MAX", "30"))
+# A Retry-After longer than this is not waited for; the request fails instead
+RETRY_AFTER_MAX = float(os.environ.get("SCRAPER_RETRY_AFTER_MAX", "120"))
+# Minimum seconds between two multiplicative decreases of a host's limit
+DECREASE_COOLDOWN = float(os.environ.get("SCRAPER_DECREASE_COOLDOWN", "1"))
+BREAKER_THRESHOLD = int(os.environ.get("SCRAPER_BREAKER_THRESHOLD", "5"))
+BREAKER_OPEN_SECONDS = float(os.environ.get("SCRAPER_BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose breaker is open"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+class LoopSlots:
+    """Requests in flight to a host and requests waiting for a slot, on one event loop"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+class HostState:
+    """Concurrency limit, breaker and counters for one upstream host"""
+
+    def __init__(self, host: str, initial_limit: float, max_limit: float,
+                 breaker_threshold: int, breaker_open_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.host = host
+        self.limit = initial_limit
+        self.max_limit = max_limit
+        self.breaker_threshold = breaker_threshold
+        self.breaker_open_seconds = breaker_open_seconds
+        self.breaker = CLOSED
+        self.consecutive_failures = 0
+        self.blocked_until = 0.0
+        self._clock = clock
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._last_decrease = float("-inf")
+        self._slow_start = True
+        # Dropped with their loop, so slots of a finished asyncio.run go away
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LoopSlots]" = \
+            weakref.WeakKeyDictionary()
+        self._slots_lock = threading.Lock()
+        self.counters = {"requests": 0, "throttled": 0, "retries": 0, "failures": 0,
+                         "breakerOpens": 0, "rejected": 0}
+        self._publish()
+
+    @property
+    def in_flight(self) -> int:
+        """Requests in flight to the host, over all event loops"""
+        with self._slots_lock:
+            return sum(slots.in_flight for slots in self._slots.values())
+
+    @property
+    def waiting(self) -> int:
+        """Requests waiting for a slot, over all event loops"""
+        with self._slots_lock:
+            return sum(len(slots.waiters) for slots in self._slots.values())
+
+    def _loop_slots(self) -> LoopSlots:
+        """Slots of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._slots_lock:
+            slots = self._slots.get(loop)
+            if slots is None:
+                slots = self._slots[loop] = LoopSlots()
+            return slots
+
+    def _publish(self) -> None:
+        HOST_CONCURRENCY_LIMIT.set(round(self.limit, 2), self.host)
+        HOST_IN_FLIGHT.set(self.in_flight, self.host)
+        CIRCUIT_STATE.set(_STATE_VALUES[self.breaker], self.host)
+
+    def _check_breaker(self) -> None:
+        if self.breaker == CLOSED:
+            return
+        now = self._clock()
+        if self.breaker == OPEN:
+            retry_in = self._opened_at + self.breaker_open_seconds - now
+            if retry_in > 0:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.host, retry_in)
+            self.breaker = HALF_OPEN
+            self._publish()
+        if self._trial_in_flight:
+            self.counters["rejected"] += 1
+            raise CircuitOpenError(self.host, 0.0)
+        self._trial_in_flight = True
+
+    async def acquire(self) -> None:
+        """
+        Wait for a request slot on this host
+
+        Raises:
+            CircuitOpenError: if the breaker is open (or half-open with its
+                trial request already running)
+        """
+        slots = self._loop_slots()
+        self._check_breaker()
+        # Past the check a half-open breaker means this request is the trial
+        trial = self.breaker == HALF_OPEN
+        try:
+            if slots.in_flight < max(int(self.limit), 1) and not slots.waiters:
+                slots.in_flight += 1
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                slots.waiters.append(waiter)
+                try:
+                    # release() hands the slot over, so in_flight already counts us
+                    await waiter
+                except asyncio.CancelledError:
+                    if waiter.done() and not waiter.cancelled():
+                        self.release()
+                    else:
+                        slots.waiters.remove(waiter)
+                    raise
+            self._publish()
+
+            delay = self.blocked_until - self._clock()
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self.release()
+                    raise
+        except BaseException:
+            # A trial that was never sent must not keep the breaker half-open for good
+            if trial:
+                self._trial_in_flight = False
+            raise
+        self.counters["requests"] += 1
+
+    def release(self) -> None:
+        """Give a request slot of the running loop back and hand free slots to its waiters"""
+        self._loop_slots().in_flight -= 1
+        self._wake()
+        self._publish()
+
+    def _wake(self) -> None:
+        # Waiters of other loops are woken when their own requests finish
+        slots = self._loop_slots()
+        while slots.waiters and slots.in_flight < max(int(self.limit), 1):
+            waiter = slots.waiters.popleft()
+            if not waiter.done():
+                slots.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self) -> None:
+        """The host answered normally: additive increase, close the breaker"""
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        self.breaker = CLOSED
+        self.limit = min(self.limit + (1 if self._slow_start else 1 / self.limit), self.max_limit)
+        self._wake()
+        self._publish()
+
+    def on_throttle(self, retry_after: Optional[float]) -> None:
+        """The host asked us to slow down: multiplicative decrease, honor Retry-After"""
+        self.counters["throttled"] += 1
+        now = self._clock()
+        self._slow_start = False
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.limit / 2, 1.0)
+            self._last_decrease = now
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        self._publish()
+
+    def on_failure(self) -> None:
+        """A failed attempt (retryable status or transport error); may open the breaker"""
+        self.counters["failures"] += 1
+        self.consecutive_failures += 1
+        if self.breaker == HALF_OPEN or self.consecutive_failures >= self.breaker_threshold:
+            if self.breaker != OPEN:
+                self.counters["breakerOpens"] += 1
+            self.breaker = OPEN
+            self._opened_at = self._clock()
+        self._trial_in_flight = False
+        self._publish()
+
+    def on_abandoned(self) -> None:
+        """An attempt ended without an outcome (e.g. cancelled)"""
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        now = self._clock()
+        return {
+            "limit": round(self.limit, 2),
+            "inFlight": self.in_flight,
+            "waiting": self.waiting,
+            "breaker": self.breaker,
+            "consecutiveFailures": self.consecutive_failures,
+            "blockedForSeconds": round(max(self.blocked_until - now, 0.0), 3),
+            "breakerRetryInSeconds": round(max(self._opened_at + self.breaker_open_seconds - now, 0.0), 3)
+                                     if self.breaker == OPEN else None,
+            **self.counters,
+        }
+
+class FetchLayer:
+    """Per-host adaptive concurrency, retries and circuit breaking for GET requests"""
+
+    def __init__(self, initial_limit: float = INITIAL_CONCURRENCY, max_limit: float = MAX_HOST_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, retry_after_max: float = RETRY_AFTER_MAX,
+                 breaker_threshold: int = BREAKER_THRESHOLD,
+                 breaker_open_seconds: float = BREAKER_OPEN_SECONDS,
+                 clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        self.initial_limit = initial_limit
+        self.max_limit = max_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_open_seconds = breaker_open_seconds
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._hosts: Dict[str, HostState] = {}
+
+    def host(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(host, self.initial_limit, self.max_limit,
+                                                  self.breaker_threshold, self.breaker_open_seconds,
+                                                  self._clock)
+        return state
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number attempt + 1"""
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def get(self, client: httpx.AsyncClient, url: str, stream: bool = False,
+                  **kwargs) -> httpx.Response:
+        """
+        GET url through the host's concurrency limit, retrying retryable failures
+
+        With stream=True the body is not read and the caller must close the
+        response; the host slot is given back once the headers are in.
+
+        Returns:
+            The final response; it may still have a retryable status if the
+            retries ran out or Retry-After asked for more than retry_after_max
+
+        Raises:
+            CircuitOpenError: if the host's breaker is open
+            httpx.TransportError: if the last attempt failed without a response
+        """
+        state = self.host(urlsplit(url).netloc)
+        attempt = 0
+        while True:
+            acquired = outcome = False
+            try:
+                await state.acquire()
+                acquired = True
+                if stream:
+                    response = await client.send(client.build_request("GET", url, **kwargs), stream=True)
+                else:
+                    response = await client.get(url, **kwargs)
+            except httpx.TransportError as e:
+                outcome = True
+                state.on_failure()
+                if attempt >= self.max_retries:
+                    raise
+                reason, retry_after = type(e).__name__, None
+            else:
+                outcome = True
+                if response.status_code not in RETRYABLE_STATUSES:
+                    state.on_success()
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code in THROTTLE_STATUSES:
+                    state.on_throttle(retry_after)
+                state.on_failure()
+                if attempt >= self.max_retries or (retry_after or 0) > self.retry_after_max:
+                    return response
+                if stream:
+                    await response.aclose()
+                reason = str(response.status_code)
+            finally:
+                if acquired:
+                    if not outcome:
+                        state.on_abandoned()
+                    state.release()
+
+            delay = max(self.backoff(attempt), retry_after or 0.0)
+            attempt += 1
+            state.counters["retries"] += 1
+            FETCH_RETRIES.inc(state.host, reason)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, dict]:
+        """State and counters per host"""
+        return {host: state.stats() for host, state in self._hosts.items()}
+
+    def reset(self) -> None:
+        """Forget all host state"""
+        self._hosts.clear()
+
+fetch_layer = FetchLayer()
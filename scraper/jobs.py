@@ -0,0 +1,198 @@
+"""
+In-process scrape jobs for the API
+
+POST /jobs returns as soon as the scrapes are queued; a fixed pool of worker
+tasks on the API's event loop works through them and clients follow progress
+by polling, long-polling or an SSE stream. Workers take items round-robin
+across jobs, so a small job is not stuck behind a large one. Finished jobs
+are kept for a retention window and then dropped.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+JOB_WORKERS = int(os.environ.get("SCRAPER_JOB_WORKERS", "8"))
+# Seconds a finished job stays available
+JOB_RETENTION = float(os.environ.get("SCRAPER_JOB_RETENTION", "3600"))
+JOB_MAX_ITEMS = int(os.environ.get("SCRAPER_JOB_MAX_ITEMS", "1000"))
+
+class Job:
+    """A set of scrape items and their results, in completion order"""
+
+    def __init__(self, items: List[Any]):
+        self.id = uuid.uuid4().hex
+        self.items = items
+        self.results: List[Optional[dict]] = [None] * len(items)
+        # Item indices in the order they finished
+        self.order: List[int] = []
+        self.failed = 0
+        self.next_index = 0
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.finished_clock: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def status(self) -> str:
+        if len(self.order) == len(self.items):
+            return DONE
+        return RUNNING if self.started_at else QUEUED
+
+    @property
+    def version(self) -> int:
+        """Number of finished items; grows with every change"""
+        return len(self.order)
+
+    def complete(self, index: int, result: dict, now: float) -> None:
+        """Store the result of an item and wake up waiters"""
+        self.results[index] = result
+        self.order.append(index)
+        if not result.get("success", True):
+            self.failed += 1
+        if self.status == DONE:
+            self.finished_at = datetime.now().isoformat()
+            self.finished_clock = now
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """
+        Wait until the job has more than version finished items or is done
+
+        Returns:
+            True if there is something new, False on timeout
+        """
+        if self.version > version or self.status == DONE:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def new_results(self, since: int = 0) -> List[dict]:
+        """Results finished after the first since items, in completion order"""
+        return [self.results[index] for index in self.order[since:]]
+
+    def summary(self) -> dict:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "total": len(self.items),
+            "completed": len(self.order),
+            "failed": self.failed,
+            "version": self.version,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+class JobManager:
+    """Queue of scrape jobs served by a pool of worker tasks"""
+
+    def __init__(self, run_item: Callable[[int, Any], Awaitable[dict]], workers: int = JOB_WORKERS,
+                 retention: float = JOB_RETENTION, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            run_item: Coroutine function scraping one item, called with
+                (index, item); returns the result dict (success=False on failure)
+            workers: Number of items processed at once
+            retention: Seconds finished jobs are kept
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.workers = workers
+        self.retention = retention
+        self._run_item = run_item
+        self._clock = clock
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # Jobs with items not yet handed to a worker, served round-robin
+        self._pending: Deque[Job] = deque()
+        self._available: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_workers(self) -> None:
+        # Workers belong to the running loop; start them on first use
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._pending.clear()
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, items: List[Any]) -> Job:
+        """Queue a job for items and return it"""
+        self._ensure_workers()
+        self.purge()
+        job = Job(items)
+        self._jobs[job.id] = job
+        if items:
+            self._pending.append(job)
+            for _ in items:
+                self._available.release()
+        else:
+            job.finished_at = job.created_at
+            job.finished_clock = self._clock()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job that has not expired, or None"""
+        self.purge()
+        return self._jobs.get(job_id)
+
+    def purge(self) -> None:
+        """Drop finished jobs older than the retention window"""
+        expired = self._clock() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_clock is not None and job.finished_clock <= expired]:
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            await self._available.acquire()
+            job = self._pending.popleft()
+            index = job.next_index
+            job.next_index += 1
+            if job.next_index < len(job.items):
+                self._pending.append(job)
+            if job.started_at is None:
+                job.started_at = datetime.now().isoformat()
+            try:
+                result = await self._run_item(index, job.items[index])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result = {"index": index, "success": False, "error": f"Internal server error: {e}"}
+            job.complete(index, result, self._clock())
+
+    async def close(self) -> None:
+        """Stop the workers; unfinished items are abandoned"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def stats(self) -> dict:
+        """Job counts by status and queued items"""
+        self.purge()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {
+            "jobs": counts,
+            "queuedItems": sum(len(job.items) - job.next_index for job in self._pending),
+            "workers": self.workers,
+            "retention": self.retention,
+        }
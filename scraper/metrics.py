@@ -0,0 +1,218 @@
+"""
+In-process scraper metrics in Prometheus text format
+
+A minimal counter/histogram implementation (no client library needed) cheap
+enough to leave on: recording is a lock, a bisect and two increments.
+Metrics live in module-level instances below and are rendered by render()
+for the API's /metrics endpoint.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond field extraction up to slow downloads
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Every metric registers itself here on creation, in render order
+METRICS: List[object] = []
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Add amount to the series identified by the label values"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def drain(self) -> dict:
+        """Return the recorded series and clear them"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict) -> None:
+        """Add series drained from another process"""
+        with self._lock:
+            for labels, value in values.items():
+                self._values[labels] = self._values.get(labels, 0) + value
+
+class Gauge(Counter):
+    """Value that can go up and down, with optional labels"""
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set the series identified by the label values"""
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+    def merge(self, values: dict) -> None:
+        with self._lock:
+            self._values.update(values)
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation in the series identified by the label values"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def lap(self, start: float, *labels: str) -> float:
+        """Observe the seconds since start and return the current perf_counter time"""
+        now = time.perf_counter()
+        self.observe(now - start, *labels)
+        return now
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]!r}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def drain(self) -> dict:
+        """Return the recorded series and clear them"""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: dict) -> None:
+        """Add series drained from another process"""
+        with self._lock:
+            for labels, counts in series.items():
+                current = self._series.get(labels)
+                if current is None:
+                    self._series[labels] = list(counts)
+                else:
+                    for i, count in enumerate(counts):
+                        current[i] += count
+
+STAGE_SECONDS = Histogram(
+    "scraper_stage_seconds",
+    "Time spent per scrape stage (connect includes DNS and TLS; fields are extraction stages)",
+    ["stage"])
+DOWNLOADED_BYTES = Counter("scraper_downloaded_bytes_total", "Bytes of page bodies downloaded")
+PAGES = Counter("scraper_pages_total", "Pages downloaded")
+ERRORS = Counter("scraper_errors_total", "Failed scrapes by error type", ["type"])
+SELECTOR_LOOKUPS = Counter(
+    "scraper_selector_lookups_total",
+    "Selector group lookups by outcome (primary: first declared selector matched, "
+    "fallback: a later selector matched, miss: none matched)",
+    ["group", "outcome"])
+HOST_CONCURRENCY_LIMIT = Gauge("scraper_host_concurrency_limit", "Adaptive concurrency limit per upstream host",
+                               ["host"])
+HOST_IN_FLIGHT = Gauge("scraper_host_in_flight", "Requests in flight per upstream host", ["host"])
+CIRCUIT_STATE = Gauge("scraper_circuit_state", "Circuit breaker state per host (0 closed, 1 half-open, 2 open)",
+                      ["host"])
+FETCH_RETRIES = Counter("scraper_fetch_retries_total", "Retried upstream requests by host and reason",
+                        ["host", "reason"])
+STREAM_EARLY_STOPS = Counter("scraper_stream_early_stops_total",
+                             "Streamed pages whose download stopped once the needed sections were parsed")
+SCHEDULER_QUEUE_DEPTH = Gauge("scraper_scheduler_queue_depth", "Watchlist targets due for a refresh")
+SCHEDULER_LAG = Gauge("scraper_scheduler_lag_seconds", "Time the most overdue watchlist target has been due")
+SCHEDULER_DISPATCHES = Counter("scraper_scheduler_dispatches_total", "Watchlist scrapes started")
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def reset() -> None:
+    """Clear all recorded values"""
+    for metric in METRICS:
+        metric.reset()
+
+def drain() -> Dict[str, dict]:
+    """
+    Recorded values of all metrics by name, clearing them
+
+    Worker processes send this back with their results so the parent can
+    merge() it into the metrics it serves.
+    """
+    return {metric.name: values for metric in METRICS if (values := metric.drain())}
+
+def merge(drained: Dict[str, dict]) -> None:
+    """Add values returned by drain() in another process"""
+    for metric in METRICS:
+        values = drained.get(metric.name)
+        if values:
+            metric.merge(values)
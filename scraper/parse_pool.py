@@ -0,0 +1,211 @@
+"""
+Process pool for CPU-bound page parsing
+
+Parsing and field extraction hold the GIL, so with the default thread
+executor one API process parses a single page at a time however many
+scrapes are in flight. With SCRAPER_PARSE_WORKERS set, pages are parsed by a
+pool of worker processes instead: the raw HTML bytes go to a worker, which
+runs the extraction and sends back only the result dict, together with the
+metrics and selector statistics it recorded (merged into this process so
+/metrics and /stats/selectors stay complete).
+
+- Workers are started and warmed up (extractors and parser backend
+  imported) when the pool starts rather than on the first page.
+- At most workers + SCRAPER_PARSE_QUEUE pages are handed to the pool at
+  once; further callers wait for a slot, so a burst of downloads holds the
+  scrapes back instead of queueing unbounded page bodies.
+- Each worker process is replaced after SCRAPER_PARSE_MAX_TASKS pages to cap
+  memory growth from parser caches and heap fragmentation. Before Python
+  3.11 (no max_tasks_per_child) the whole pool is replaced instead, once it
+  has parsed that many pages per worker.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+import metrics
+from metrics import STAGE_SECONDS
+from selector_registry import registry
+
+# 0 parses on the thread executor in this process
+PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", "0"))
+# Pages waiting for a free worker beyond those being parsed (0 = one per worker)
+PARSE_QUEUE = int(os.environ.get("SCRAPER_PARSE_QUEUE", "0"))
+# Pages a worker process parses before it is replaced (0 = never)
+PARSE_MAX_TASKS = int(os.environ.get("SCRAPER_PARSE_MAX_TASKS", "500"))
+
+# ProcessPoolExecutor replaces single workers itself (max_tasks_per_child)
+PER_WORKER_RECYCLING = sys.version_info >= (3, 11)
+
+def _init_worker() -> None:
+    # Import the extractors and the configured parser backend up front
+    import scrape  # noqa: F401
+    registry.track_deltas = True
+
+def _warm() -> int:
+    return os.getpid()
+
+def _run(func: Callable, args: tuple) -> tuple:
+    result = func(*args)
+    return result, metrics.drain(), registry.drain()
+
+def _shutdown(executor: ProcessPoolExecutor, wait: bool) -> None:
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=wait, cancel_futures=True)
+    else:
+        executor.shutdown(wait=wait)
+
+class ParsePool:
+    """Worker processes running page parsers, with bounded submission"""
+
+    def __init__(self, workers: int = PARSE_WORKERS, queue_size: int = PARSE_QUEUE,
+                 max_tasks: int = PARSE_MAX_TASKS):
+        """
+        Args:
+            workers: Worker processes
+            queue_size: Pages allowed to wait for a worker (0 = one per worker)
+            max_tasks: Pages per worker process before it is replaced (0 = never)
+        """
+        self.workers = workers
+        self.queue_size = queue_size or workers
+        self.max_tasks = max_tasks
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._start_lock = threading.Lock()
+        # Pages handed to the current executor (for whole-pool recycling)
+        self._pages = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._submitted = 0
+        self._waiting = 0
+        self.counters = {"completed": 0, "failed": 0, "waited": 0, "restarts": 0, "recycled": 0}
+        self.wait_seconds = 0.0
+
+    def start(self) -> None:
+        """Start and warm up the worker processes (blocking; no-op if running)"""
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            # Forked workers would inherit the API's threads and event loop;
+            # forkserver/spawn also allow max_tasks_per_child
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            options = {"max_tasks_per_child": self.max_tasks or None} if PER_WORKER_RECYCLING else {}
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_init_worker,
+                **options,
+            )
+            # Each submit finds no idle worker and starts a new one
+            for future in [executor.submit(_warm) for _ in range(self.workers)]:
+                future.result()
+            self._pages = 0
+            self._executor = executor
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        Run func(*args) in a worker process, waiting for a slot if the pool is full
+
+        func must be a module-level function (it is pickled by name) and
+        return a picklable result.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The semaphore belongs to the loop it was created on
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+        if self._executor is None:
+            await loop.run_in_executor(None, self.start)
+
+        if self._slots.locked():
+            self.counters["waited"] += 1
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        waited = time.perf_counter() - started
+        self.wait_seconds += waited
+        STAGE_SECONDS.observe(waited, "parse_wait")
+
+        self._submitted += 1
+        try:
+            if self._executor is None:
+                # Restarted or recycled while this page waited for a slot
+                await loop.run_in_executor(None, self.start)
+            parsed = loop.run_in_executor(self._executor, _run, func, args)
+            self._pages += 1
+            if not PER_WORKER_RECYCLING and self.max_tasks and self._pages >= self.max_tasks * self.workers:
+                self._recycle()
+            result, drained_metrics, drained_selectors = await parsed
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            self.counters["failed"] += 1
+            self._restart()
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self._submitted -= 1
+            self._slots.release()
+        metrics.merge(drained_metrics)
+        registry.merge(drained_selectors)
+        self.counters["completed"] += 1
+        return result
+
+    def _restart(self) -> None:
+        if self._executor is not None:
+            _shutdown(self._executor, wait=False)
+            self._executor = None
+            self.counters["restarts"] += 1
+
+    def _recycle(self) -> None:
+        # The next page starts a fresh pool; pages already submitted finish
+        # on this one, whose workers exit once it is idle
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self.counters["recycled"] += 1
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._executor is not None:
+            _shutdown(self._executor, wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queueSize": self.queue_size,
+            "maxTasksPerWorker": self.max_tasks,
+            "running": self._executor is not None,
+            "inPool": self._submitted,
+            "waiting": self._waiting,
+            "waitSeconds": round(self.wait_seconds, 3),
+            **self.counters,
+        }
+
+_pool: Optional[ParsePool] = None
+
+def get_parse_pool() -> Optional[ParsePool]:
+    """The shared parse pool, or None when SCRAPER_PARSE_WORKERS is 0"""
+    global _pool
+    if PARSE_WORKERS <= 0:
+        return None
+    if _pool is None:
+        _pool = ParsePool()
+    return _pool
+
+def close_parse_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,312 @@
+"""
+Pluggable HTML parsing backends for the scraper
+
+The extraction logic in scrape.py only needs a few operations on a page:
+parse it, run a CSS selector (all matches or the first one) from a node,
+get a node's text or an attribute, and walk a subtree to resolve several
+simple selectors at once. Each backend implements them on top of a
+different HTML library; they all follow BeautifulSoup's text semantics
+(no <script>, <style> or <template> content, no comments) so the
+extracted data is identical whichever backend is used.
+
+The backend is chosen with the SCRAPER_PARSER environment variable
+("soup", "lxml" or "selectolax"), or per call via get_parser(name).
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+import soupsieve
+from bs4 import BeautifulSoup, Tag
+
+# Elements whose content BeautifulSoup does not consider text
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+DEFAULT_PARSER = os.environ.get("SCRAPER_PARSER", "soup")
+
+class ParserBackend:
+    """Base class for parsing backends"""
+
+    name = ""
+
+    def parse(self, content: bytes) -> Any:
+        """Parse raw HTML and return the document root"""
+        raise NotImplementedError
+
+    def select(self, node: Any, selector: str) -> List[Any]:
+        """Return all descendants of node matching a CSS selector"""
+        raise NotImplementedError
+
+    def select_one(self, node: Any, selector: str) -> Optional[Any]:
+        """Return the first descendant of node matching a CSS selector, or None"""
+        raise NotImplementedError
+
+    def text(self, node: Any, strip: bool = False) -> str:
+        """
+        Return the text content of node
+
+        With strip=True every text fragment is stripped before joining, like
+        BeautifulSoup's get_text(strip=True).
+        """
+        raise NotImplementedError
+
+    def iter_descendants(self, node: Any) -> Iterator[Any]:
+        """Yield the descendant elements of node in document order"""
+        raise NotImplementedError
+
+    def tag_name(self, node: Any) -> str:
+        """Return the lower-case tag name of an element"""
+        raise NotImplementedError
+
+    def attribute(self, node: Any, name: str) -> Optional[str]:
+        """Return the value of an attribute of an element, or None"""
+        raise NotImplementedError
+
+    def classes(self, node: Any) -> List[str]:
+        """Return the class names of an element"""
+        raise NotImplementedError
+
+    def first_matches(self, node: Any, selectors: Tuple[str, ...]) -> Dict[str, Any]:
+        """
+        Find the first descendant of node matching each selector
+
+        Equivalent to calling select_one for every selector, but simple
+        selectors (tag.class) are resolved in a single walk over the subtree:
+        each element is dispatched by its class names to the selectors that
+        need them. Complex selectors fall back to select_one.
+
+        Returns:
+            Dict of selector -> element, without the selectors that did not match
+        """
+        matches: Dict[str, Any] = {}
+        plan = _match_plan(selectors)
+        remaining = len(plan.simple)
+        if remaining:
+            for elem in self.iter_descendants(node):
+                classes = self.classes(elem)
+                for cls in classes:
+                    for selector, tag, required in plan.by_class.get(cls, ()):
+                        if selector in matches or (tag and tag != self.tag_name(elem)):
+                            continue
+                        if required and not required.issubset(classes):
+                            continue
+                        matches[selector] = elem
+                        remaining -= 1
+                if not remaining:
+                    break
+        for selector in plan.complex:
+            elem = self.select_one(node, selector)
+            if elem is not None:
+                matches[selector] = elem
+        return matches
+
+class _MatchPlan:
+    """Selectors of a first_matches() call, split into simple and complex ones"""
+
+    def __init__(self, selectors: Tuple[str, ...]):
+        self.simple: List[str] = []
+        self.complex: List[str] = []
+        # class name -> (selector, required tag, other required classes)
+        self.by_class: Dict[str, List[Tuple[str, str, frozenset]]] = {}
+        for selector in dict.fromkeys(selectors):
+            match = _SIMPLE_SELECTOR.match(selector.strip())
+            if not match:
+                self.complex.append(selector)
+                continue
+            tag, class_list = match.group(1) or "", match.group(2).split('.')[1:]
+            self.simple.append(selector)
+            self.by_class.setdefault(class_list[0], []).append(
+                (selector, tag.lower(), frozenset(class_list[1:]))
+            )
+
+_SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][\w-]*)?((?:\.[-\w]+)+)$')
+
+_match_plans: Dict[Tuple[str, ...], _MatchPlan] = {}
+
+def _match_plan(selectors: Tuple[str, ...]) -> _MatchPlan:
+    plan = _match_plans.get(selectors)
+    if plan is None:
+        plan = _match_plans[selectors] = _MatchPlan(selectors)
+    return plan
+
+class SoupParser(ParserBackend):
+    """BeautifulSoup with the pure-Python html.parser (the original behaviour)"""
+
+    name = "soup"
+
+    def __init__(self):
+        # Compiled soupsieve patterns are immutable and safe to share
+        self._compiled: Dict[str, Any] = {}
+
+    def _compile(self, selector: str) -> Any:
+        compiled = self._compiled.get(selector)
+        if compiled is None:
+            compiled = self._compiled[selector] = soupsieve.compile(selector)
+        return compiled
+
+    def parse(self, content: bytes) -> Any:
+        return BeautifulSoup(content, 'html.parser')
+
+    def select(self, node: Any, selector: str) -> List[Any]:
+        return self._compile(selector).select(node)
+
+    def select_one(self, node: Any, selector: str) -> Optional[Any]:
+        return self._compile(selector).select_one(node)
+
+    def text(self, node: Any, strip: bool = False) -> str:
+        return node.get_text(strip=strip)
+
+    def iter_descendants(self, node: Any) -> Iterator[Any]:
+        return (elem for elem in node.descendants if isinstance(elem, Tag))
+
+    def tag_name(self, node: Any) -> str:
+        return node.name
+
+    def attribute(self, node: Any, name: str) -> Optional[str]:
+        value = node.get(name)
+        # Multi-valued attributes (class, rel) come back as lists
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def classes(self, node: Any) -> List[str]:
+        return node.get('class') or []
+
+class LxmlParser(ParserBackend):
+    """lxml's libxml2 HTML parser with compiled cssselect selectors"""
+
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.etree
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+
+        self._etree = lxml.etree
+        self._html = lxml.html
+        self._css_selector = CSSSelector
+        # lxml parsers and compiled selectors (XPath evaluators) must not be
+        # shared between threads, so each thread gets its own
+        self._local = threading.local()
+
+    def _thread_state(self) -> Any:
+        state = self._local
+        if not hasattr(state, "compiled"):
+            state.compiled = {}
+            state.utf8_parser = self._html.HTMLParser(encoding='utf-8')
+        return state
+
+    def _compile(self, selector: str) -> Any:
+        compiled_selectors = self._thread_state().compiled
+        compiled = compiled_selectors.get(selector)
+        if compiled is None:
+            compiled = compiled_selectors[selector] = self._css_selector(selector)
+        return compiled
+
+    def parse(self, content: bytes) -> Any:
+        # libxml2 assumes latin-1 without a charset declaration; pages that
+        # decode as UTF-8 are parsed as UTF-8, as BeautifulSoup would
+        try:
+            content.decode('utf-8')
+            parser = self._thread_state().utf8_parser
+        except UnicodeDecodeError:
+            parser = None
+        root = self._html.document_fromstring(content, parser=parser)
+        self._etree.strip_elements(root, *NON_TEXT_TAGS, with_tail=False)
+        return root
+
+    def select(self, node: Any, selector: str) -> List[Any]:
+        return self._compile(selector)(node)
+
+    def select_one(self, node: Any, selector: str) -> Optional[Any]:
+        matches = self._compile(selector)(node)
+        return matches[0] if matches else None
+
+    def text(self, node: Any, strip: bool = False) -> str:
+        if strip:
+            return ''.join(fragment.strip() for fragment in node.itertext())
+        return ''.join(node.itertext())
+
+    def iter_descendants(self, node: Any) -> Iterator[Any]:
+        return node.iterdescendants(self._etree.Element)
+
+    def tag_name(self, node: Any) -> str:
+        return node.tag
+
+    def attribute(self, node: Any, name: str) -> Optional[str]:
+        return node.get(name)
+
+    def classes(self, node: Any) -> List[str]:
+        return (node.get('class') or '').split()
+
+class SelectolaxParser(ParserBackend):
+    """selectolax (lexbor) - a fast C HTML5 parser with native CSS selectors"""
+
+    name = "selectolax"
+
+    # Joins text fragments so they can be stripped individually
+    _SEPARATOR = '\x00'
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError as e:
+            raise RuntimeError("The selectolax parser backend requires the selectolax package") from e
+        self._html_parser = LexborHTMLParser
+
+    def parse(self, content: bytes) -> Any:
+        tree = self._html_parser(content)
+        tree.strip_tags(list(NON_TEXT_TAGS))
+        return tree.root
+
+    def select(self, node: Any, selector: str) -> List[Any]:
+        return node.css(selector)
+
+    def select_one(self, node: Any, selector: str) -> Optional[Any]:
+        return node.css_first(selector)
+
+    def text(self, node: Any, strip: bool = False) -> str:
+        if strip:
+            fragments = node.text(separator=self._SEPARATOR).split(self._SEPARATOR)
+            return ''.join(fragment.strip() for fragment in fragments)
+        return node.text()
+
+    def iter_descendants(self, node: Any) -> Iterator[Any]:
+        elems = node.traverse(include_text=False)
+        next(elems, None)  # traverse() starts with the node itself
+        return elems
+
+    def tag_name(self, node: Any) -> str:
+        return node.tag
+
+    def attribute(self, node: Any, name: str) -> Optional[str]:
+        return node.attributes.get(name)
+
+    def classes(self, node: Any) -> List[str]:
+        return (node.attributes.get('class') or '').split()
+
+PARSERS: Dict[str, Type[ParserBackend]] = {
+    SoupParser.name: SoupParser,
+    LxmlParser.name: LxmlParser,
+    SelectolaxParser.name: SelectolaxParser,
+}
+
+_instances: Dict[str, ParserBackend] = {}
+
+def get_parser(name: Optional[str] = None) -> ParserBackend:
+    """
+    Return the (shared) parser backend instance for name
+
+    Args:
+        name: Backend name; defaults to SCRAPER_PARSER (or "soup")
+
+    Raises:
+        ValueError: if the backend name is unknown
+    """
+    name = name or DEFAULT_PARSER
+    parser = _instances.get(name)
+    if parser is None:
+        if name not in PARSERS:
+            raise ValueError(f"Unknown parser backend '{name}', expected one of: {', '.join(PARSERS)}")
+        parser = _instances[name] = PARSERS[name]()
+    return parser
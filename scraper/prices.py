@@ -0,0 +1,197 @@
+"""
+Locale-aware price and currency normalization
+
+Price strings on hotel pages come in many shapes: "€ 1.234,56",
+"US$1,234.56", "1 234,56 zł", "CHF 1'234.50", "₹1,23,456" or text glued
+together by the markup such as "7.97.9". normalize_price turns one of them
+into a Price (amount, ISO 4217 currency code or None); normalize_prices does
+the same for a whole batch and returns the amounts in an array('d') with the
+currencies dictionary-encoded, which is compact enough to hold hundreds of
+thousands of prices.
+
+Separators are resolved per string:
+
+- With both '.' and ',' present, the last one is the decimal separator
+  ("1.234,56", "1,234.56", "1,23,456.00").
+- With one of them repeated, it groups digits if the last group has three
+  digits and the ones between two or three ("1.234.567", "1,23,456");
+  otherwise the first one is the decimal point and the rest is dropped
+  ("7.97.9" -> 7.97).
+- A single separator followed by exactly three digits groups thousands
+  ("1,234", "1.234") unless the locale says it is the decimal separator.
+- Spaces (including no-break and narrow no-break spaces) and apostrophes
+  only ever group thousands.
+
+Results are memoized per (text, locale), since the same few price strings
+repeat across rooms, dates and hotels.
+"""
+
+import os
+import re
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Distinct (text, locale) pairs kept by the normalize_price memo
+PRICE_CACHE_SIZE = int(os.environ.get("SCRAPER_PRICE_CACHE_SIZE", "65536"))
+
+# Currency symbols and local abbreviations -> ISO 4217 code. Ambiguous
+# symbols map to the currency they most often mean on booking pages.
+CURRENCY_SYMBOLS = {
+    "$": "USD", "US$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "JP¥": "JPY",
+    "CN¥": "CNY", "元": "CNY", "₹": "INR", "Rs.": "INR", "₩": "KRW", "₽": "RUB",
+    "руб.": "RUB", "₺": "TRY", "TL": "TRY", "zł": "PLN", "Kč": "CZK", "Ft": "HUF",
+    "₪": "ILS", "฿": "THB", "₫": "VND", "₱": "PHP", "₴": "UAH", "₦": "NGN",
+    "RM": "MYR", "Rp": "IDR", "R$": "BRL", "A$": "AUD", "AU$": "AUD", "C$": "CAD",
+    "CA$": "CAD", "NZ$": "NZD", "HK$": "HKD", "S$": "SGD", "MX$": "MXN",
+    "NT$": "TWD", "lei": "RON", "лв.": "BGN", "kn": "HRK", "Fr.": "CHF",
+}
+
+# ISO 4217 codes recognized when written out ("EUR 120", "120 CHF")
+CURRENCY_CODES = frozenset("""
+    AED ARS AUD BGN BRL CAD CHF CLP CNY COP CZK DKK EGP EUR GBP HKD HRK HUF IDR
+    ILS INR ISK JPY KRW KZT MAD MXN MYR NGN NOK NZD PEN PHP PLN QAR RON RSD RUB
+    SAR SEK SGD THB TRY TWD UAH USD VND ZAR
+""".split())
+
+# Decimal separator by locale; full tags ("de-CH") are checked before the language
+LOCALE_DECIMAL = {
+    "en": ".", "ja": ".", "zh": ".", "ko": ".", "th": ".", "he": ".", "ms": ".",
+    "hi": ".", "de-ch": ".", "fr-ch": ".", "it-ch": ".", "es-mx": ".",
+    "de": ",", "fr": ",", "es": ",", "it": ",", "nl": ",", "pt": ",", "ru": ",",
+    "pl": ",", "cs": ",", "sk": ",", "hu": ",", "ro": ",", "bg": ",", "hr": ",",
+    "sv": ",", "da": ",", "nb": ",", "no": ",", "fi": ",", "tr": ",", "uk": ",",
+    "el": ",", "id": ",", "vi": ",",
+}
+
+# Longest symbols first so "US$" wins over "$"
+_SYMBOL_PATTERN = "|".join(re.escape(s) for s in sorted(CURRENCY_SYMBOLS, key=len, reverse=True))
+_CURRENCY = re.compile(rf"(?<![A-Za-z])(?:([A-Z]{{3}})|({_SYMBOL_PATTERN}))(?![A-Za-z])")
+# A number with its separators; a space only counts when a group of three digits follows
+_NUMBER = re.compile(r"\d(?:[\d.,'\u2019]|[ \u00a0\u202f](?=\d{3}(?!\d)))*")
+_GROUPING = re.compile(r"[ \u00a0\u202f'\u2019]")
+
+class Price(NamedTuple):
+    amount: float
+    currency: Optional[str]
+
+def locale_decimal(locale: Optional[str]) -> Optional[str]:
+    """Decimal separator of a locale tag ("de-DE", "en_GB"), None if unknown"""
+    if not locale:
+        return None
+    tag = locale.lower().replace("_", "-")
+    return LOCALE_DECIMAL.get(tag) or LOCALE_DECIMAL.get(tag.split("-")[0])
+
+def detect_currency(text: str) -> Optional[str]:
+    """ISO 4217 code of the first currency symbol or code in text, if any"""
+    for match in _CURRENCY.finditer(text):
+        code, symbol = match.groups()
+        if symbol:
+            return CURRENCY_SYMBOLS[symbol]
+        if code in CURRENCY_CODES:
+            return code
+    return None
+
+def parse_amount(number: str, decimal: Optional[str] = None) -> float:
+    """
+    Value of a number matched in a price string (see the module docstring)
+
+    Args:
+        number: Digits with separators, e.g. "1.234,56"
+        decimal: The locale's decimal separator, if known
+    """
+    number = _GROUPING.sub("", number).rstrip(".,")
+    dots = number.count(".")
+    commas = number.count(",")
+    if dots and commas:
+        point = "." if number.rfind(".") > number.rfind(",") else ","
+        integer, _, fraction = number.rpartition(point)
+        integer = integer.replace("." if point == "," else ",", "").replace(point, "")
+        return float(f"{integer}.{fraction}")
+    if not dots and not commas:
+        return float(number)
+
+    separator = "." if dots else ","
+    parts = number.split(separator)
+    if len(parts) > 2:
+        if len(parts[-1]) == 3 and all(len(part) in (2, 3) for part in parts[1:-1]):
+            return float("".join(parts))
+        return float(f"{parts[0]}.{parts[1]}")
+    integer, fraction = parts
+    if len(fraction) == 3 and decimal != separator:
+        return float(integer + fraction)
+    return float(f"{integer}.{fraction}")
+
+@lru_cache(maxsize=PRICE_CACHE_SIZE)
+def normalize_price(text: str, locale: Optional[str] = None) -> Price:
+    """
+    Parse a price string into its amount and currency
+
+    Args:
+        text: Price text as shown on the page, e.g. "€ 1.234,56"
+        locale: Locale tag of the page ("de-DE"), to settle "1.234" vs "1,234"
+
+    Returns:
+        Price(amount, currency); amount is 0.0 if text holds no number and
+        currency is None if it names none
+    """
+    if not text:
+        return Price(0.0, None)
+    currency = detect_currency(text)
+    match = _NUMBER.search(text)
+    if match is None:
+        return Price(0.0, currency)
+    return Price(parse_amount(match.group(), locale_decimal(locale)), currency)
+
+class PriceBatch:
+    """Normalized prices of a batch: amounts in an array, currencies dictionary-encoded"""
+
+    __slots__ = ("amounts", "currency_ids", "currencies")
+
+    def __init__(self):
+        self.amounts = array("d")
+        # Index into currencies per price; 0 is "no currency"
+        self.currency_ids = array("H")
+        self.currencies: List[Optional[str]] = [None]
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __getitem__(self, index: int) -> Price:
+        return Price(self.amounts[index], self.currencies[self.currency_ids[index]])
+
+    def currency(self, index: int) -> Optional[str]:
+        return self.currencies[self.currency_ids[index]]
+
+def normalize_prices(texts: Iterable[str], locale: Optional[str] = None) -> PriceBatch:
+    """
+    Normalize many price strings at once
+
+    Each distinct string is parsed once (through the normalize_price memo)
+    and the results go into typed arrays, so the batch holds 10 bytes per
+    price instead of a tuple and a float object.
+
+    Args:
+        texts: Price strings
+        locale: Locale tag applied to every string
+
+    Returns:
+        PriceBatch in input order
+    """
+    batch = PriceBatch()
+    amounts = batch.amounts
+    currency_ids = batch.currency_ids
+    currency_index: Dict[Optional[str], int] = {None: 0}
+    seen: Dict[str, tuple] = {}
+    for text in texts:
+        entry = seen.get(text)
+        if entry is None:
+            amount, currency = normalize_price(text, locale)
+            currency_id = currency_index.get(currency)
+            if currency_id is None:
+                currency_id = currency_index[currency] = len(batch.currencies)
+                batch.currencies.append(currency)
+            entry = seen[text] = (amount, currency_id)
+        amounts.append(entry[0])
+        currency_ids.append(entry[1])
+    return batch
@@ -0,0 +1,226 @@
+"""
+On-demand and sampled profiling of single scrapes
+
+A profiled scrape runs with a background thread that samples the Python
+stacks of the threads working on it (the event loop thread and the executor
+thread parsing the page) every SCRAPER_PROFILE_INTERVAL seconds. Samples are
+written in the collapsed-stack format understood by flamegraph.pl,
+speedscope and inferno, next to a JSON summary with the page size and the
+selector taken for each group.
+
+Samples are wall-clock: a scrape stuck on the network shows up as time in
+the event loop's selector. The event loop thread is shared, so its samples
+can include other requests running at the same time.
+
+Profiling is off unless SCRAPER_PROFILE_TOKEN (on-demand, per request) or
+SCRAPER_PROFILE_SAMPLE_RATE (background sampling) is set. While it is off,
+the scrape path only checks the ENABLED flag.
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar, copy_context
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+PROFILE_TOKEN = os.environ.get("SCRAPER_PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("SCRAPER_PROFILE_SAMPLE_RATE", "0"))
+# Sampled profiles of scrapes faster than this are discarded
+PROFILE_MIN_SECONDS = float(os.environ.get("SCRAPER_PROFILE_MIN_SECONDS", "0"))
+PROFILE_INTERVAL = float(os.environ.get("SCRAPER_PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.environ.get("SCRAPER_PROFILE_DIR", "profiles")
+# Oldest profiles beyond this many are deleted
+PROFILE_KEEP = int(os.environ.get("SCRAPER_PROFILE_KEEP", "200"))
+
+ENABLED = bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+REQUESTED = "requested"
+SAMPLED = "sampled"
+
+PROFILE_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+current_profile: ContextVar[Optional["ScrapeProfile"]] = ContextVar("current_profile", default=None)
+
+class ScrapeProfile:
+    """Stack samples and scrape details for one profiled scrape"""
+
+    def __init__(self, url: str, checkin_date: str, reason: str, interval: Optional[float] = None):
+        self.id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.url = url
+        self.checkin_date = checkin_date
+        self.reason = reason
+        self.interval = interval or PROFILE_INTERVAL
+        self.page_bytes: Optional[int] = None
+        self.selector_path: List[dict] = []
+        self.error: Optional[str] = None
+        self.duration = 0.0
+        self.samples: Counter = Counter()
+        self._threads: Counter = Counter()
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        """Start sampling the calling thread (and threads added with wrap)"""
+        self._threads[threading.get_ident()] += 1
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.duration = time.perf_counter() - self._started
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self) -> None:
+        names = {}
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self._threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                if thread_id not in names:
+                    names[thread_id] = next((t.name for t in threading.enumerate() if t.ident == thread_id),
+                                            str(thread_id))
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names[thread_id])
+                self.samples[";".join(reversed(stack))] += 1
+
+    def wrap(self, func: Callable) -> Callable:
+        """
+        Wrap func so the thread running it is sampled while it runs
+
+        func also runs in a copy of the current context, so the profile stays
+        reachable through current_profile in executor threads.
+        """
+        context = copy_context()
+
+        def run(*args: Any) -> Any:
+            thread_id = threading.get_ident()
+            self._threads[thread_id] += 1
+            try:
+                return context.run(func, *args)
+            finally:
+                self._threads[thread_id] -= 1
+                if not self._threads[thread_id]:
+                    del self._threads[thread_id]
+        return run
+
+    def folded(self) -> str:
+        """Samples as collapsed stacks ("frame;frame;frame count" per line)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "reason": self.reason,
+            "url": self.url,
+            "checkInDate": self.checkin_date,
+            "durationSeconds": round(self.duration, 4),
+            "pageBytes": self.page_bytes,
+            "selectorPath": self.selector_path,
+            "samples": sum(self.samples.values()),
+            "intervalSeconds": self.interval,
+            "error": self.error,
+        }
+
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        """Write <id>.folded and <id>.json to directory and prune old profiles; returns the id"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.id}.folded"), "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        with open(os.path.join(directory, f"{self.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        prune(directory)
+        return self.id
+
+def prune(directory: str, keep: int = PROFILE_KEEP) -> None:
+    """Delete the oldest profiles beyond keep (0 keeps everything)"""
+    if keep <= 0:
+        return
+    ids = sorted(name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+    for profile_id in ids[:-keep]:
+        for extension in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+def profile_path(profile_id: str, extension: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    """Path of a stored profile file, or None if the id is malformed or unknown"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(directory, profile_id + extension)
+    return path if os.path.exists(path) else None
+
+def authorized(token: Optional[str]) -> bool:
+    """True if token is the configured admin token"""
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def should_sample() -> bool:
+    """Decide whether a scrape is profiled in the background"""
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def profiled(func: Callable) -> Callable:
+    """func, wrapped for sampling if a profile is active in this context"""
+    if not ENABLED:
+        return func
+    profile = current_profile.get()
+    return func if profile is None else profile.wrap(func)
+
+def note_page(size: int) -> None:
+    """Record the downloaded page size on the active profile"""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.page_bytes = size
+
+def note_selector(group: str, selector: Optional[str], tried: int) -> None:
+    """Record a selector lookup on the active profile"""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.selector_path.append({"group": group, "selector": selector, "tried": tried})
+
+async def run_profiled(fetch: Callable[[], Awaitable[dict]], url: str, checkin_date: str,
+                       reason: str) -> Tuple[dict, Optional[ScrapeProfile]]:
+    """
+    Run a scrape under a profile and persist it
+
+    Args:
+        fetch: Coroutine function performing the scrape
+        url, checkin_date: Recorded in the profile summary
+        reason: REQUESTED or SAMPLED; sampled profiles shorter than
+            PROFILE_MIN_SECONDS are discarded
+
+    Returns:
+        (result, profile) - profile is None if it was discarded
+    """
+    profile = ScrapeProfile(url, checkin_date, reason)
+    token = current_profile.set(profile)
+    profile.start()
+    try:
+        result = await fetch()
+    finally:
+        profile.stop()
+        current_profile.reset(token)
+    profile.error = result.get("error")
+
+    if reason == SAMPLED and profile.duration < PROFILE_MIN_SECONDS:
+        return result, None
+    await asyncio.get_running_loop().run_in_executor(None, profile.save, PROFILE_DIR)
+    print(f"Saved {reason} profile {profile.id} ({profile.duration:.2f}s) for {url}")
+    return result, profile
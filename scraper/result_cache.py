@@ -0,0 +1,139 @@
+"""
+Scrape result cache for the API
+
+Successful scrape results are kept for a TTL in a memory-bounded LRU keyed
+on (hotel, check-in date). Concurrent requests for a key that is being
+fetched share that one upstream fetch (single-flight) instead of starting
+their own.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Cache status values, also sent in the X-Cache response header
+HIT = "HIT"
+MISS = "MISS"
+COALESCED = "COALESCED"
+
+CACHE_TTL = float(os.environ.get("SCRAPER_CACHE_TTL", "300"))
+CACHE_MAX_BYTES = int(os.environ.get("SCRAPER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+class ScrapeCache:
+    """TTL + LRU cache of scrape results with in-flight request coalescing"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: Seconds a result stays fresh (0 disables caching, not coalescing)
+            max_bytes: Upper bound on the summed JSON size of cached results
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # key -> (expires_at, size, result), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, int, dict]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the fresh cached result for key, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, result = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._bytes -= size
+            self._counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """Cache a result, evicting least recently used entries to stay under max_bytes"""
+        if self.ttl <= 0:
+            return
+        size = len(json.dumps(result, separators=(',', ':')))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (self._clock() + self.ttl, size, result)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._counters["evictions"] += 1
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[dict]]) -> Tuple[dict, str]:
+        """
+        Return the cached result for key, or fetch it
+
+        Only results without an "error" key are cached. If a fetch for key is
+        already running, its result is shared instead of fetching again.
+
+        Args:
+            key: Cache key (see cache_key)
+            fetch: Coroutine function performing the scrape
+
+        Returns:
+            (result, status) where status is HIT, MISS or COALESCED
+        """
+        result = self.get(key)
+        if result is not None:
+            self._counters["hits"] += 1
+            return result, HIT
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+            # shield: a caller going away must not cancel the shared fetch
+            return await asyncio.shield(task), COALESCED
+
+        self._counters["misses"] += 1
+
+        async def fetch_and_store() -> dict:
+            result = await fetch()
+            if "error" not in result:
+                self.put(key, result)
+            return result
+
+        task = asyncio.ensure_future(fetch_and_store())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task), MISS
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def clear(self) -> None:
+        """Drop all cached results (in-flight fetches are unaffected)"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """Cache counters and current size"""
+        lookups = self._counters["hits"] + self._counters["misses"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "hitRate": round((self._counters["hits"] + self._counters["coalesced"]) / lookups, 4) if lookups else None,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "ttl": self.ttl,
+            "inFlight": len(self._in_flight),
+        }
+
+def cache_key(hotel_id: str, checkin_date: str, projection: str = "") -> str:
+    """Cache key for a hotel and check-in date, and a projection (see scrape.projection_key)"""
+    key = f"{hotel_id}|{checkin_date}"
+    return f"{key}|{projection}" if projection else key
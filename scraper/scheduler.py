@@ -0,0 +1,316 @@
+"""
+Staleness-driven monitoring scheduler
+
+The scheduler owns a watchlist of hotels, each with a rolling window of
+check-in dates (e.g. the next 30 days). Every (hotel, check-in date) pair is
+a target with its own refresh interval, short for near dates and growing
+with the distance to the check-in date:
+
+    interval = base_interval * (1 + days_until_checkin / proximity_days)
+
+(SCRAPER_SCHEDULER_BASE_INTERVAL, SCRAPER_SCHEDULER_PROXIMITY_DAYS).
+
+Targets wait in a priority queue ordered by the time they become stale
+(ties and never-scraped targets go nearest check-in first). A single loop
+dispatches the most overdue target whenever the global request budget
+(SCRAPER_SCHEDULER_REQUESTS_PER_MINUTE, spaced with random jitter) allows, so
+upstream requests go where the data is stalest relative to how fast it
+changes instead of being spread uniformly.
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from metrics import SCHEDULER_DISPATCHES, SCHEDULER_LAG, SCHEDULER_QUEUE_DEPTH
+
+REQUESTS_PER_MINUTE = float(os.environ.get("SCRAPER_SCHEDULER_REQUESTS_PER_MINUTE", "30"))
+# Relative spread of the pause between dispatches (0.3 = +/-30%)
+JITTER = float(os.environ.get("SCRAPER_SCHEDULER_JITTER", "0.3"))
+MAX_IN_FLIGHT = int(os.environ.get("SCRAPER_SCHEDULER_MAX_IN_FLIGHT", "4"))
+BASE_INTERVAL = float(os.environ.get("SCRAPER_SCHEDULER_BASE_INTERVAL", "3600"))
+PROXIMITY_DAYS = float(os.environ.get("SCRAPER_SCHEDULER_PROXIMITY_DAYS", "7"))
+# First retry delay after a failed scrape, doubled per consecutive failure
+RETRY_DELAY = float(os.environ.get("SCRAPER_SCHEDULER_RETRY_DELAY", "300"))
+WATCHLIST_PATH = os.environ.get("SCRAPER_WATCHLIST", "")
+DEFAULT_WINDOW_DAYS = 30
+# Seconds of dispatch history used for the achieved refresh rate and lag
+STATS_WINDOW = 300.0
+
+def refresh_interval(days_until: int, base_interval: float = BASE_INTERVAL,
+                     proximity_days: float = PROXIMITY_DAYS) -> float:
+    """Seconds between refreshes of a check-in date days_until days away"""
+    return base_interval * (1 + max(days_until, 0) / proximity_days)
+
+class WatchEntry:
+    """A hotel and the rolling window of check-in dates to keep fresh"""
+
+    def __init__(self, url: str, days: int = DEFAULT_WINDOW_DAYS, first_day: int = 0,
+                 entry_id: Optional[str] = None):
+        self.id = entry_id or uuid.uuid4().hex[:12]
+        self.url = url
+        self.days = days
+        self.first_day = first_day
+
+    def checkin_dates(self, today: date) -> List[str]:
+        start = today + timedelta(days=self.first_day)
+        return [(start + timedelta(days=offset)).isoformat() for offset in range(self.days)]
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "url": self.url, "days": self.days, "firstDay": self.first_day}
+
+class Target:
+    """Refresh state of one (watch entry, check-in date)"""
+
+    def __init__(self, entry: WatchEntry, checkin: str, due: float):
+        self.entry = entry
+        self.checkin = checkin
+        self.due = due
+        self.last_scraped: Optional[float] = None
+        self.failures = 0
+        self.in_flight = False
+        # Bumped on every reschedule; older heap items for this target are stale
+        self.version = 0
+
+class MonitoringScheduler:
+    """Keeps watchlist targets fresh within a global request budget"""
+
+    def __init__(self, scrape: Callable[[str, str], Awaitable[dict]],
+                 on_result: Optional[Callable[[str, str, dict], None]] = None,
+                 requests_per_minute: float = REQUESTS_PER_MINUTE, jitter: float = JITTER,
+                 max_in_flight: int = MAX_IN_FLIGHT, base_interval: float = BASE_INTERVAL,
+                 proximity_days: float = PROXIMITY_DAYS, retry_delay: float = RETRY_DELAY,
+                 path: str = WATCHLIST_PATH, clock: Callable[[], float] = time.monotonic,
+                 today: Callable[[], date] = date.today, rng: Optional[random.Random] = None):
+        """
+        Args:
+            scrape: Coroutine function scraping (url, checkin) into a result dict
+            on_result: Called with (url, checkin, result) after each scrape
+            requests_per_minute: Global dispatch budget
+            jitter: Relative random spread of the pause between dispatches
+            max_in_flight: Scrapes running at once
+            base_interval: Refresh interval of a check-in date that is today
+            proximity_days: Days ahead at which the interval has doubled
+            retry_delay: First retry delay after a failure
+            path: JSON file the watchlist is loaded from and saved to ("" = memory only)
+            clock, today, rng: Time, date and randomness sources (injectable for tests)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.jitter = jitter
+        self.max_in_flight = max_in_flight
+        self.base_interval = base_interval
+        self.proximity_days = proximity_days
+        self.retry_delay = retry_delay
+        self.path = path
+        self._scrape = scrape
+        self._on_result = on_result
+        self._clock = clock
+        self._today = today
+        self._rng = rng or random.Random()
+
+        self._entries: Dict[str, WatchEntry] = {}
+        self._targets: Dict[Tuple[str, str], Target] = {}
+        # (due, days until check-in, sequence, key, version)
+        self._heap: List[Tuple[float, int, int, Tuple[str, str], int]] = []
+        self._sequence = 0
+        self._synced_day: Optional[date] = None
+        self._in_flight = 0
+        self._dispatches: Deque[Tuple[float, float]] = deque()  # (time, lag)
+        self._task: Optional[asyncio.Task] = None
+        # Running _dispatch tasks, kept referenced until they finish
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._counters = {"dispatched": 0, "succeeded": 0, "failed": 0}
+
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for item in json.load(f):
+                    entry = WatchEntry(item["url"], item["days"], item["firstDay"], item["id"])
+                    self._entries[entry.id] = entry
+
+    # Watchlist
+
+    def add(self, url: str, days: int = DEFAULT_WINDOW_DAYS, first_day: int = 0) -> WatchEntry:
+        """Watch a hotel for the check-in dates first_day .. first_day + days - 1 days from today"""
+        entry = WatchEntry(url, days, first_day)
+        self._entries[entry.id] = entry
+        self._changed()
+        return entry
+
+    def remove(self, entry_id: str) -> bool:
+        """Stop watching an entry; returns False if it does not exist"""
+        if self._entries.pop(entry_id, None) is None:
+            return False
+        self._changed()
+        return True
+
+    def entries(self) -> List[WatchEntry]:
+        return list(self._entries.values())
+
+    def _changed(self) -> None:
+        self._synced_day = None
+        if self.path:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump([entry.to_dict() for entry in self._entries.values()], f, indent=2)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Priority queue
+
+    def _days_until(self, checkin: str) -> int:
+        return (date.fromisoformat(checkin) - self._today()).days
+
+    def _push(self, target: Target) -> None:
+        target.version += 1
+        self._sequence += 1
+        key = (target.entry.id, target.checkin)
+        heapq.heappush(self._heap, (target.due, self._days_until(target.checkin), self._sequence,
+                                    key, target.version))
+
+    def sync_targets(self) -> None:
+        """Create targets for new entries and dates, drop those outside every window"""
+        today = self._today()
+        if self._synced_day == today:
+            return
+        now = self._clock()
+        wanted = set()
+        for entry in self._entries.values():
+            for checkin in entry.checkin_dates(today):
+                key = (entry.id, checkin)
+                wanted.add(key)
+                if key not in self._targets:
+                    target = self._targets[key] = Target(entry, checkin, now)
+                    self._push(target)
+        for key in [key for key in self._targets if key not in wanted]:
+            del self._targets[key]
+        self._synced_day = today
+
+    def next_target(self) -> Optional[Target]:
+        """The most overdue target that is not being scraped, or None; heap order is kept"""
+        while self._heap:
+            _, _, _, key, version = self._heap[0]
+            target = self._targets.get(key)
+            if target is None or target.version != version or target.in_flight:
+                heapq.heappop(self._heap)
+                continue
+            return target
+        return None
+
+    def _reschedule(self, target: Target, result: dict) -> None:
+        now = self._clock()
+        interval = refresh_interval(self._days_until(target.checkin), self.base_interval, self.proximity_days)
+        if "error" in result:
+            target.failures += 1
+            target.due = now + min(interval, self.retry_delay * 2 ** (target.failures - 1))
+        else:
+            target.failures = 0
+            target.last_scraped = now
+            target.due = now + interval
+        if (target.entry.id, target.checkin) in self._targets:
+            self._push(target)
+
+    # Dispatch loop
+
+    def start(self) -> None:
+        """Start the dispatch loop on the running event loop (no-op if running)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the dispatch loop and cancel the scrapes it started"""
+        tasks = list(self._dispatch_tasks)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def pause_seconds(self) -> float:
+        """Pause before the next dispatch: the budget spacing with jitter"""
+        spacing = 60.0 / self.requests_per_minute
+        return spacing * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    async def _run(self) -> None:
+        while True:
+            self.sync_targets()
+            target = self.next_target()
+            now = self._clock()
+            if target is None or target.due > now or self._in_flight >= self.max_in_flight:
+                # Nothing due: sleep until the next due time, a watchlist change
+                # or, at most, a second. No free slot: until a scrape finishes
+                if target is None or self._in_flight >= self.max_in_flight:
+                    delay = 1.0
+                else:
+                    delay = min(target.due - now, 1.0)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            target.in_flight = True
+            self._in_flight += 1
+            self._dispatches.append((now, now - target.due))
+            self._counters["dispatched"] += 1
+            SCHEDULER_DISPATCHES.inc()
+            task = asyncio.create_task(self._dispatch(target))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+            await asyncio.sleep(self.pause_seconds())
+
+    async def _dispatch(self, target: Target) -> None:
+        try:
+            result = await self._scrape(target.entry.url, target.checkin)
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            target.in_flight = False
+            self._in_flight -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+        self._counters["failed" if "error" in result else "succeeded"] += 1
+        if self._on_result is not None and "error" not in result:
+            self._on_result(target.entry.url, target.checkin, result)
+        self._reschedule(target, result)
+
+    # Observability
+
+    def stats(self) -> dict:
+        """Queue depth, lag, achieved refresh rate and data age"""
+        self.sync_targets()
+        now = self._clock()
+        while self._dispatches and self._dispatches[0][0] < now - STATS_WINDOW:
+            self._dispatches.popleft()
+
+        due = [target for target in self._targets.values() if not target.in_flight and target.due <= now]
+        lag = max((now - target.due for target in due), default=0.0)
+        ages = [now - target.last_scraped for target in self._targets.values() if target.last_scraped is not None]
+        window = min(STATS_WINDOW, max(now - self._dispatches[0][0], 1.0)) if self._dispatches else STATS_WINDOW
+        SCHEDULER_QUEUE_DEPTH.set(len(due))
+        SCHEDULER_LAG.set(round(lag, 3))
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "entries": len(self._entries),
+            "targets": len(self._targets),
+            "queueDepth": len(due),
+            "inFlight": self._in_flight,
+            "lagSeconds": round(lag, 3),
+            "meanDispatchLagSeconds": round(sum(lag for _, lag in self._dispatches) / len(self._dispatches), 3)
+                                      if self._dispatches else None,
+            "refreshesPerMinute": round(len(self._dispatches) * 60.0 / window, 2),
+            "budgetPerMinute": self.requests_per_minute,
+            "neverScraped": len(self._targets) - len(ages),
+            "meanAgeSeconds": round(sum(ages) / len(ages), 1) if ages else None,
+            **self._counters,
+        }
@@ -1,11 +1,30 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Optional
+import httpx
+from typing import Any, Awaitable, Callable, Coroutine, Dict, FrozenSet, Iterable, List, Optional, TypeVar, Union
+import asyncio
+import os
+import queue
+import threading
 import re
-from datetime import datetime
+import sqlite3
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from archive import get_archive
+from fetch import fetch_layer
+from metrics import DOWNLOADED_BYTES, ERRORS, PAGES, SELECTOR_LOOKUPS, STAGE_SECONDS, STREAM_EARLY_STOPS
+from parse_pool import get_parse_pool
+from parsers import ParserBackend, get_parser
+from prices import detect_currency, normalize_price
+import profiling
+from selector_registry import PageLayout, registry
+from store import get_store
+from streaming import SECTIONS, STREAM_CHUNK_SIZE, STREAM_PARSE, STREAM_WINDOW, StreamingPage
 
 class Room:
+    __slots__ = ("room_id", "name", "occupancy", "price", "refundable", "breakfast_included", "available")
+    
     def __init__(self, room_id: str, name: str, occupancy: int, price: float, 
                  refundable: bool, breakfast_included: bool, available: bool):
         self.room_id = room_id
@@ -17,11 +36,16 @@ class Room:
         self.available = available
 
 class Rating:
+    __slots__ = ("overall", "location")
+    
     def __init__(self, overall: float, location: float):
         self.overall = overall
         self.location = location
 
 class HotelData:
+    __slots__ = ("hotel_id", "hotel_name", "currency", "scrape_date", "check_in_date", "rooms",
+                 "rating", "amenities")
+    
     def __init__(self, hotel_id: str, hotel_name: str, currency: str, 
                  scrape_date: str, check_in_date: str, rooms: List[Room], 
                  rating: Rating, amenities: List[str]):
@@ -34,42 +58,9 @@ class HotelData:
         self.rating = rating
         self.amenities = amenities
 
-def extract_price(price_text: str) -> float:
-    """Extract numeric price from price text"""
-    if not price_text:
-        return 0.0
-    
-    try:
-        # Clean the price text - remove currency symbols and extra characters
-        cleaned_text = re.sub(r'[^\d.,]', '', price_text)
-        
-        # Handle cases with multiple dots (like "7.97.9")
-        if cleaned_text.count('.') > 1:
-            # Split by dots and take the first two parts
-            parts = cleaned_text.split('.')
-            if len(parts) >= 2:
-                cleaned_text = f"{parts[0]}.{parts[1]}"
-            else:
-                cleaned_text = parts[0]
-        
-        # Remove commas and extract the first valid number
-        cleaned_text = cleaned_text.replace(',', '')
-        
-        # Use a more specific regex to match valid price patterns
-        price_match = re.search(r'^\d+\.?\d*$', cleaned_text)
-        if price_match:
-            return float(price_match.group())
-        
-        # Fallback: try to extract any number sequence
-        price_match = re.search(r'(\d+\.?\d*)', cleaned_text)
-        if price_match:
-            return float(price_match.group(1))
-        
-        return 0.0
-        
-    except (ValueError, TypeError) as e:
-        print(f"Error parsing price '{price_text}': {e}")
-        return 0.0
+def extract_price(price_text: str, locale: Optional[str] = None) -> float:
+    """Extract numeric price from price text (see prices.normalize_price)"""
+    return normalize_price(price_text, locale or PRICE_LOCALE).amount
 
 def extract_rating(rating_text: str) -> float:
     """Extract numeric rating from rating text"""
@@ -81,264 +72,965 @@ def extract_rating(rating_text: str) -> float:
         return float(rating_match.group())
     return 0.0
 
-def scrape_booking(url: str, checkin_date: str) -> dict:
+# Headers to mimic a real browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+REQUEST_TIMEOUT = 30
+
+# Locale of the price strings on fetched pages ("de-DE"); inferred per string when unset
+PRICE_LOCALE = os.environ.get("SCRAPER_PRICE_LOCALE") or None
+
+# Connection pool limits for the shared async client
+MAX_CONNECTIONS = int(os.environ.get("SCRAPER_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("SCRAPER_MAX_KEEPALIVE", "20"))
+
+# Learn per-layout selector order and skip selectors that cannot match
+ADAPTIVE_SELECTORS = os.environ.get("SCRAPER_ADAPTIVE_SELECTORS", "1") != "0"
+
+# Rooms and amenities kept per page unless the caller asks for another limit
+MAX_ROOMS = int(os.environ.get("SCRAPER_MAX_ROOMS", "5"))
+MAX_AMENITIES = int(os.environ.get("SCRAPER_MAX_AMENITIES", "10"))
+
+# Result fields that can be projected, and the selector group extracting each
+FIELD_GROUPS = {
+    "hotelName": "hotel_name",
+    "currency": "currency",
+    "rooms": "rooms",
+    "rating": "rating",
+    "amenities": "amenities",
+}
+
+# Date range sweeps: parallel fetches per range and the longest range accepted
+RANGE_CONCURRENCY = int(os.environ.get("SCRAPER_RANGE_CONCURRENCY", "8"))
+MAX_RANGE_DATES = 366
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def build_scrape_url(url: str, checkin_date: str) -> str:
+    """Add check-in date to URL if not present"""
+    if 'checkin=' not in url:
+        separator = '&' if '?' in url else '?'
+        url = f"{url}{separator}checkin={checkin_date}"
+    return url
+
+def strip_checkin(url: str) -> str:
+    """Remove any checkin query parameter so another date can be added"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'checkin']
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def error_result(error: str, checkin_date: str) -> dict:
+    """Build the error response returned when a scrape fails"""
+    return {
+        "error": error,
+        "hotelId": "error",
+        "hotelName": "Error",
+        "currency": "USD",
+        "scrapeDate": datetime.now().isoformat(),
+        "checkInDate": checkin_date,
+        "rooms": [],
+        "rating": {"overall": 0.0, "location": 0.0},
+        "amenities": []
+    }
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Optional[FrozenSet[str]]:
     """
-    Scrape Booking.com hotel data using BeautifulSoup
+    Validate a field projection
     
     Args:
-        url: Booking.com hotel page URL
-        checkin_date: Check-in date in YYYY-MM-DD format
+        fields: Comma-separated string or iterable of FIELD_GROUPS names;
+            None or empty for every field
     
     Returns:
-        HotelData object as dictionary
+        The requested fields, or None when every field is requested
+    
+    Raises:
+        ValueError: on an unknown field name
     """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    requested = frozenset(field.strip() for field in fields if field.strip())
+    unknown = requested - FIELD_GROUPS.keys()
+    if unknown:
+        raise ValueError(f"Unknown field(s) {', '.join(sorted(unknown))}, "
+                         f"expected some of: {', '.join(FIELD_GROUPS)}")
+    return requested if requested and requested != FIELD_GROUPS.keys() else None
+
+def projection_key(fields: Optional[FrozenSet[str]] = None, max_rooms: Optional[int] = None,
+                   max_amenities: Optional[int] = None) -> str:
+    """Cache key suffix of a projection and limits ("" for the default full result)"""
+    max_rooms = MAX_ROOMS if max_rooms is None else max_rooms
+    max_amenities = MAX_AMENITIES if max_amenities is None else max_amenities
+    if fields is None and max_rooms == MAX_ROOMS and max_amenities == MAX_AMENITIES:
+        return ""
+    return f"{','.join(sorted(fields)) if fields else '*'};{max_rooms};{max_amenities}"
+
+def projected_sections(fields: Optional[FrozenSet[str]]) -> Dict[str, bool]:
+    """Page sections (see streaming.SECTIONS) the requested fields are extracted from"""
+    if fields is None:
+        return SECTIONS
+    return {FIELD_GROUPS[field]: SECTIONS[FIELD_GROUPS[field]] for field in fields}
+
+def parse_prefix(parser: ParserBackend, content: bytes, sections: Dict[str, bool]) -> Any:
+    """Parse only as much of a downloaded page as holds the given sections (lxml backend)"""
+    page = StreamingPage(parser, sections)
+    for offset in range(0, len(content), STREAM_CHUNK_SIZE):
+        if page.feed(content[offset:offset + STREAM_CHUNK_SIZE]):
+            break
+    return page.close()
+
+def new_async_client() -> httpx.AsyncClient:
+    """Create a pooled async HTTP client with the scraper's headers and limits"""
+    return httpx.AsyncClient(
+        headers=HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+        )
+    )
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the shared pooled async HTTP client, creating it on first use
     
-    # Headers to mimic a real browser
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
+    The client is bound to the running event loop, so a new one is created
+    if the loop changes (e.g. between separate asyncio.run calls).
+    """
+    global _async_client, _async_client_loop
+    
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = new_async_client()
+        _async_client_loop = loop
+    return _async_client
+
+async def close_async_client() -> None:
+    """Close the shared async HTTP client and release pooled connections"""
+    global _async_client, _async_client_loop
+    
+    # A client left over from another (closed) loop cannot be closed from here
+    if _async_client is not None and _async_client_loop is asyncio.get_running_loop():
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+async def fetch_page(client: httpx.AsyncClient, url: str,
+                     on_chunk: Optional[Callable[[bytes], Awaitable[bool]]] = None) -> httpx.Response:
+    """
+    GET a page through the fetch layer, recording stage times and downloaded bytes
+    
+    Connect time (DNS, TCP and TLS) is only observed when the request had to
+    open a new connection; download covers the rest of the final attempt and
+    wait the time spent queued for a host slot or backing off between retries.
+    
+    With on_chunk the body of a successful response is streamed instead of
+    buffered: on_chunk is awaited with each chunk and returns True to stop
+    the download early. The returned response is closed and has no content.
+    """
+    connect_started = None
+    connect_seconds = 0.0
+    request_started = None
+    
+    async def trace(event: str, info: dict) -> None:
+        nonlocal connect_started, connect_seconds, request_started
+        if event == "connection.connect_tcp.started":
+            connect_started = time.perf_counter()
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            connect_seconds = time.perf_counter() - connect_started
+        elif event.endswith(".send_request_headers.started"):
+            request_started = time.perf_counter()
+    
+    start = time.perf_counter()
+    if on_chunk is None:
+        response = await fetch_layer.get(client, url, extensions={"trace": trace})
+        size = len(response.content)
+    else:
+        response = await fetch_layer.get(client, url, stream=True, extensions={"trace": trace})
+        size = 0
+        try:
+            if response.is_success:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    if await on_chunk(chunk):
+                        STREAM_EARLY_STOPS.inc()
+                        break
+        finally:
+            await response.aclose()
+    end = time.perf_counter()
+    if connect_started is not None:
+        STAGE_SECONDS.observe(connect_seconds, "connect")
+    download = end - (request_started or start)
+    STAGE_SECONDS.observe(download, "download")
+    STAGE_SECONDS.observe(max(end - start - download - connect_seconds, 0.0), "wait")
+    DOWNLOADED_BYTES.inc(amount=size)
+    PAGES.inc()
+    return response
+
+def error_type(error: Exception) -> str:
+    """Label for the errors metric: the HTTP status for bad responses, else the exception class"""
+    response = getattr(error, "response", None)
+    if isinstance(error, httpx.HTTPStatusError) and response is not None:
+        return f"http_{response.status_code}"
+    return type(error).__name__
+
+# Fallback selector lists, tried in order until one matches. The registry
+# reorders them per page layout so the selector that usually wins goes first
+NAME_SELECTORS = registry.register('hotel_name', [
+    'h2[data-testid="title"]',
+    '#hp_hotel_name',
+    '.hp__hotel-name',
+    'h1[data-testid="title"]'
+])
+
+RATING_SELECTORS = registry.register('rating', [
+    'div[data-testid="review-score-component"]',
+    '.review-score-badge',
+    '.review-score-widget'
+])
+
+AMENITY_SELECTORS = registry.register('amenities', [
+    '.hotel-facilities-group .bui-list__description',
+    '.facilities__list .facilities__item',
+    '.hp-amenity-list .hp-amenity-item'
+])
+
+ROOM_SELECTORS = registry.register('rooms', [
+    'tr[data-block-id^="hotel_room"]',
+    'table.hprt-table tr.hprt-table-row',
+    '.room-item',
+    '.room-info'
+])
+
+ROOM_NAME_SELECTORS = registry.register('room_name', [
+    '.room-name',
+    '.hprt-roomtype-icon-link',
+    '.room-title'
+])
+
+PRICE_SELECTORS = registry.register('price', [
+    'span.prco-valign-middle-helper',
+    'span.hprt-price-price-standard',
+    '.room-price',
+    '.price'
+])
+
+OCCUPANCY_SELECTORS = registry.register('occupancy', [
+    '.occupancy-info',
+    '.room-occupancy'
+])
+
+# Per-row field selectors, resolved together by ParserBackend.first_matches
+ROOM_FIELD_SELECTORS = tuple(ROOM_NAME_SELECTORS + PRICE_SELECTORS + OCCUPANCY_SELECTORS)
+
+CURRENCY_SELECTORS = registry.register('currency', [
+    '.currency',
+    '.price-currency'
+])
+
+def extract_hotel_id(url: str) -> str:
+    """Extract hotel ID from URL"""
+    hotel_id_match = re.search(r'/hotel/([^/]+)', url)
+    return hotel_id_match.group(1) if hotel_id_match else "unknown"
+
+def normalize_hotel_id(url: str) -> str:
+    """
+    Stable identifier of the hotel a URL points to
     
+    Unlike extract_hotel_id, which returns the first path segment after
+    /hotel/ (the country code on current Booking.com URLs), this keeps the
+    country and the hotel slug and drops the language suffix, extension,
+    query and case: /hotel/fr/grand-plaza.en-gb.html -> "fr/grand-plaza".
+    """
+    path = urlsplit(url).path.lower()
+    match = re.search(r'/hotel/([^?#]+)', path)
+    if not match:
+        return "unknown"
+    hotel_path = match.group(1).rstrip('/')
+    hotel_path = re.sub(r'\.html?$', '', hotel_path)
+    # Drop the language suffix (".en-gb", ".fr")
+    return re.sub(r'\.[a-z]{2}(?:-[a-z]{2})?$', '', hotel_path)
+
+def archive_page(content: bytes, url: str, checkin_date: str) -> None:
+    """Keep the raw page in the archive when SCRAPER_ARCHIVE_DIR is set"""
+    archive = get_archive()
+    if archive is None:
+        return
     try:
-        # Add check-in date to URL if not present
-        if 'checkin=' not in url:
-            separator = '&' if '?' in url else '?'
-            url = f"{url}{separator}checkin={checkin_date}"
-        
-        print(f"Scraping URL: {url}")
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract hotel name
-        hotel_name = ""
-        name_selectors = [
-            'h2[data-testid="title"]',
-            '#hp_hotel_name',
-            '.hp__hotel-name',
-            'h1[data-testid="title"]'
-        ]
-        
-        for selector in name_selectors:
-            name_elem = soup.select_one(selector)
-            if name_elem:
-                hotel_name = name_elem.get_text(strip=True)
-                break
-        
-        # Extract hotel ID from URL
-        hotel_id_match = re.search(r'/hotel/([^/]+)', url)
-        hotel_id = hotel_id_match.group(1) if hotel_id_match else "unknown"
-        
-        # Extract ratings
-        overall_rating = 0.0
-        location_rating = 0.0
-        
-        rating_selectors = [
-            'div[data-testid="review-score-component"]',
-            '.review-score-badge',
-            '.review-score-widget'
-        ]
-        
-        for selector in rating_selectors:
-            rating_elem = soup.select_one(selector)
-            if rating_elem:
-                rating_text = rating_elem.get_text(strip=True)
-                overall_rating = extract_rating(rating_text)
+        archive.add(url, normalize_hotel_id(url), checkin_date, content)
+    except OSError as e:
+        print(f"Error archiving {url}: {e}")
+
+def page_layout(content: bytes, head: Optional[bytes] = None) -> Optional[PageLayout]:
+    """Fingerprint a page for the selector registry (None when adaptive selectors are off)"""
+    return registry.layout(content, head) if ADAPTIVE_SELECTORS else None
+
+def record_lookup(group: str, layout: Optional[PageLayout], selector: Optional[str], tried: int) -> None:
+    """Record a selector group lookup in the registry and the lookup metrics"""
+    registry.record(group, layout, selector, tried)
+    if profiling.ENABLED:
+        profiling.note_selector(group, selector, tried)
+    if selector is None:
+        SELECTOR_LOOKUPS.inc(group, "miss")
+    elif selector == registry.primary(group):
+        SELECTOR_LOOKUPS.inc(group, "primary")
+    else:
+        SELECTOR_LOOKUPS.inc(group, "fallback")
+
+def select_first(parser: ParserBackend, node: Any, group: str,
+                 layout: Optional[PageLayout]) -> Optional[Any]:
+    """Return the first element matched by a selector group, or None"""
+    candidates = registry.candidates(group, layout)
+    for tried, selector in enumerate(candidates, 1):
+        elem = parser.select_one(node, selector)
+        if elem is not None:
+            record_lookup(group, layout, selector, tried)
+            return elem
+    record_lookup(group, layout, None, len(candidates))
+    return None
+
+def pick_first(matches: Dict[str, Any], group: str, layout: Optional[PageLayout]) -> Optional[Any]:
+    """Return the element of the best selector of group present in matches, or None"""
+    candidates = registry.candidates(group, layout)
+    for tried, selector in enumerate(candidates, 1):
+        elem = matches.get(selector)
+        if elem is not None:
+            record_lookup(group, layout, selector, tried)
+            return elem
+    record_lookup(group, layout, None, len(candidates))
+    return None
+
+def extract_hotel_name(parser: ParserBackend, root: Any,
+                       layout: Optional[PageLayout] = None) -> str:
+    """Extract hotel name"""
+    name_elem = select_first(parser, root, 'hotel_name', layout)
+    if name_elem is not None:
+        return parser.text(name_elem, strip=True)
+    return ""
+
+def extract_overall_rating(parser: ParserBackend, root: Any,
+                           layout: Optional[PageLayout] = None) -> float:
+    """Extract overall review score"""
+    rating_elem = select_first(parser, root, 'rating', layout)
+    if rating_elem is not None:
+        rating_text = parser.text(rating_elem, strip=True)
+        return extract_rating(rating_text)
+    return 0.0
+
+def extract_amenities(parser: ParserBackend, root: Any,
+                      layout: Optional[PageLayout] = None, max_amenities: Optional[int] = None) -> List[str]:
+    """Extract up to max_amenities (default MAX_AMENITIES) amenities from the first selector that yields any"""
+    limit = MAX_AMENITIES if max_amenities is None else max_amenities
+    amenities = []
+    candidates = registry.candidates('amenities', layout)
+    for tried, selector in enumerate(candidates, 1):
+        amenity_elems = parser.select(root, selector)
+        for elem in amenity_elems:
+            if len(amenities) >= limit:
                 break
-        
-        # Extract amenities
-        amenities = []
-        amenity_selectors = [
-            '.hotel-facilities-group .bui-list__description',
-            '.facilities__list .facilities__item',
-            '.hp-amenity-list .hp-amenity-item'
-        ]
-        
-        for selector in amenity_selectors:
-            amenity_elems = soup.select(selector)
-            for elem in amenity_elems:
-                amenity_text = elem.get_text(strip=True)
-                if amenity_text and len(amenity_text) > 2:
-                    amenities.append(amenity_text)
-            if amenities:
+            amenity_text = parser.text(elem, strip=True)
+            if amenity_text and len(amenity_text) > 2:
+                amenities.append(amenity_text)
+        if amenities:
+            record_lookup('amenities', layout, selector, tried)
+            return amenities
+    record_lookup('amenities', layout, None, len(candidates))
+    return amenities
+
+def extract_rooms(parser: ParserBackend, root: Any, hotel_id: str,
+                  layout: Optional[PageLayout] = None, max_rooms: Optional[int] = None) -> List[Room]:
+    """Extract up to max_rooms (default MAX_ROOMS) rooms and prices (a default unavailable room if none are found)"""
+    limit = MAX_ROOMS if max_rooms is None else max_rooms
+    rooms = []
+    candidates = registry.candidates('rooms', layout)
+    for tried, selector in enumerate(candidates, 1):
+        room_elems = parser.select(root, selector)
+        if room_elems:
+            for i, room_elem in enumerate(room_elems[:limit]):
+                try:
+                    # Resolve every field selector of the row in one pass
+                    matches = parser.first_matches(room_elem, ROOM_FIELD_SELECTORS)
+                    
+                    # Extract room name
+                    room_name = ""
+                    name_elem = pick_first(matches, 'room_name', layout)
+                    if name_elem is not None:
+                        room_name = parser.text(name_elem, strip=True)
+                    
+                    if not room_name:
+                        room_name = f"Room {i+1}"
+                    
+                    # Extract price
+                    price = 0.0
+                    price_elem = pick_first(matches, 'price', layout)
+                    if price_elem is not None:
+                        price_text = parser.text(price_elem, strip=True)
+                        price = extract_price(price_text)
+                    
+                    # Extract occupancy (default to 2)
+                    occupancy = 2
+                    occ_elem = pick_first(matches, 'occupancy', layout)
+                    if occ_elem is not None:
+                        occ_text = parser.text(occ_elem, strip=True)
+                        occ_match = re.search(r'(\d+)', occ_text)
+                        if occ_match:
+                            occupancy = int(occ_match.group(1))
+                    
+                    # Check for refundable and breakfast
+                    row_text = parser.text(room_elem).lower()
+                    refundable = "refundable" in row_text
+                    breakfast_included = "breakfast" in row_text
+                    available = price > 0
+                    
+                    room = Room(
+                        room_id=f"{hotel_id}_room_{i}",
+                        name=room_name,
+                        occupancy=occupancy,
+                        price=price,
+                        refundable=refundable,
+                        breakfast_included=breakfast_included,
+                        available=available
+                    )
+                    rooms.append(room)
+                    
+                except Exception as e:
+                    print(f"Error parsing room {i}: {e}")
+                    continue
+            
+            if rooms:
+                record_lookup('rooms', layout, selector, tried)
                 break
-        
-        # Extract rooms and prices
-        rooms = []
-        room_selectors = [
-            'tr[data-block-id^="hotel_room"]',
-            'table.hprt-table tr.hprt-table-row',
-            '.room-item',
-            '.room-info'
-        ]
-        
-        for selector in room_selectors:
-            room_elems = soup.select(selector)
-            if room_elems:
-                for i, room_elem in enumerate(room_elems[:5]):  # Limit to 5 rooms
-                    try:
-                        # Extract room name
-                        room_name = ""
-                        name_selectors = [
-                            '.room-name',
-                            '.hprt-roomtype-icon-link',
-                            '.room-title'
-                        ]
-                        
-                        for name_sel in name_selectors:
-                            name_elem = room_elem.select_one(name_sel)
-                            if name_elem:
-                                room_name = name_elem.get_text(strip=True)
-                                break
-                        
-                        if not room_name:
-                            room_name = f"Room {i+1}"
-                        
-                        # Extract price
-                        price = 0.0
-                        price_selectors = [
-                            'span.prco-valign-middle-helper',
-                            'span.hprt-price-price-standard',
-                            '.room-price',
-                            '.price'
-                        ]
-                        
-                        for price_sel in price_selectors:
-                            price_elem = room_elem.select_one(price_sel)
-                            if price_elem:
-                                price_text = price_elem.get_text(strip=True)
-                                price = extract_price(price_text)
-                                break
-                        
-                        # Extract occupancy (default to 2)
-                        occupancy = 2
-                        occupancy_selectors = [
-                            '.occupancy-info',
-                            '.room-occupancy'
-                        ]
-                        
-                        for occ_sel in occupancy_selectors:
-                            occ_elem = room_elem.select_one(occ_sel)
-                            if occ_elem:
-                                occ_text = occ_elem.get_text(strip=True)
-                                occ_match = re.search(r'(\d+)', occ_text)
-                                if occ_match:
-                                    occupancy = int(occ_match.group(1))
-                                break
-                        
-                        # Check for refundable and breakfast
-                        refundable = "refundable" in room_elem.get_text().lower()
-                        breakfast_included = "breakfast" in room_elem.get_text().lower()
-                        available = price > 0
-                        
-                        room = Room(
-                            room_id=f"{hotel_id}_room_{i}",
-                            name=room_name,
-                            occupancy=occupancy,
-                            price=price,
-                            refundable=refundable,
-                            breakfast_included=breakfast_included,
-                            available=available
-                        )
-                        rooms.append(room)
-                        
-                    except Exception as e:
-                        print(f"Error parsing room {i}: {e}")
-                        continue
-                
-                if rooms:
-                    break
-        
-        # If no rooms found, create a default room
-        if not rooms:
-            default_room = Room(
-                room_id=f"{hotel_id}_room_1",
-                name="Standard Room",
-                occupancy=2,
-                price=0.0,
-                refundable=False,
-                breakfast_included=False,
-                available=False
-            )
-            rooms.append(default_room)
-        
-        # Determine currency (default to USD)
-        currency = "USD"
-        currency_selectors = [
-            '.currency',
-            '.price-currency'
-        ]
-        
-        for selector in currency_selectors:
-            currency_elem = soup.select_one(selector)
-            if currency_elem:
-                currency_text = currency_elem.get_text(strip=True)
-                if currency_text in ['$', 'USD', '€', 'EUR', '£', 'GBP']:
-                    currency = currency_text
+    else:
+        record_lookup('rooms', layout, None, len(candidates))
+    
+    # If no rooms found, create a default room
+    if not rooms:
+        default_room = Room(
+            room_id=f"{hotel_id}_room_1",
+            name="Standard Room",
+            occupancy=2,
+            price=0.0,
+            refundable=False,
+            breakfast_included=False,
+            available=False
+        )
+        rooms.append(default_room)
+    
+    return rooms
+
+def extract_currency(parser: ParserBackend, root: Any,
+                     layout: Optional[PageLayout] = None) -> str:
+    """
+    Determine the page currency as an ISO 4217 code (default to USD)
+    
+    Taken from the currency element, or, when the page has none or it names
+    no known currency, from the first room price ("€ 120").
+    """
+    currency = None
+    currency_elem = select_first(parser, root, 'currency', layout)
+    if currency_elem is not None:
+        currency = detect_currency(parser.text(currency_elem, strip=True))
+    if currency is None:
+        for selector in PRICE_SELECTORS:
+            price_elem = parser.select_one(root, selector)
+            if price_elem is not None:
+                currency = normalize_price(parser.text(price_elem, strip=True), PRICE_LOCALE).currency
                 break
-        
-        # Create HotelData object
-        hotel_data = HotelData(
-            hotel_id=hotel_id,
-            hotel_name=hotel_name or "Unknown Hotel",
-            currency=currency,
-            scrape_date=datetime.now().isoformat(),
-            check_in_date=checkin_date,
-            rooms=rooms,
-            rating=Rating(overall_rating, location_rating),
-            amenities=amenities[:10]  # Limit to 10 amenities
+    return currency or "USD"
+
+def hotel_data_to_dict(hotel_data: HotelData, fields: Optional[FrozenSet[str]] = None) -> dict:
+    """Convert to dictionary for JSON serialization, keeping only the projected fields if given"""
+    result = {
+        "hotelId": hotel_data.hotel_id,
+        "hotelName": hotel_data.hotel_name,
+        "currency": hotel_data.currency,
+        "scrapeDate": hotel_data.scrape_date,
+        "checkInDate": hotel_data.check_in_date,
+        "rooms": [
+            {
+                "roomId": room.room_id,
+                "name": room.name,
+                "occupancy": room.occupancy,
+                "price": room.price,
+                "refundable": room.refundable,
+                "breakfastIncluded": room.breakfast_included,
+                "available": room.available
+            }
+            for room in hotel_data.rooms
+        ],
+        "rating": {
+            "overall": hotel_data.rating.overall,
+            "location": hotel_data.rating.location
+        },
+        "amenities": hotel_data.amenities
+    }
+    if fields is not None:
+        for field in FIELD_GROUPS:
+            if field not in fields:
+                del result[field]
+    return result
+
+def parse_hotel_page(content: bytes, url: str, checkin_date: str,
+                     parser: Optional[ParserBackend] = None, fields: Optional[FrozenSet[str]] = None,
+                     max_rooms: Optional[int] = None, max_amenities: Optional[int] = None) -> dict:
+    """
+    Extract hotel data from a fetched Booking.com hotel page
+    
+    Args:
+        content: Raw HTML of the hotel page
+        url: URL the page was fetched from (used for the hotel ID)
+        checkin_date: Check-in date in YYYY-MM-DD format
+        parser: Parsing backend (defaults to the SCRAPER_PARSER backend)
+        fields: Fields to extract (see parse_fields); None for all
+        max_rooms: Most rooms extracted (defaults to MAX_ROOMS)
+        max_amenities: Most amenities extracted (defaults to MAX_AMENITIES)
+    
+    Returns:
+        HotelData object as dictionary, with only the requested fields
+        besides hotelId, scrapeDate and checkInDate
+    """
+    parser = parser or get_parser()
+    
+    # Each stage is timed into the scraper_stage_seconds histogram
+    t = time.perf_counter()
+    if fields is not None and parser.name == "lxml":
+        # The sections of a projection usually end well before the page does
+        root = parse_prefix(parser, content, projected_sections(fields))
+    else:
+        root = parser.parse(content)
+    t = STAGE_SECONDS.lap(t, "parse")
+    layout = page_layout(content)
+    STAGE_SECONDS.lap(t, "layout")
+    return extract_hotel_data(parser, root, layout, url, checkin_date, fields, max_rooms, max_amenities)
+
+def extract_hotel_data(parser: ParserBackend, root: Any, layout: Optional[PageLayout],
+                       url: str, checkin_date: str, fields: Optional[FrozenSet[str]] = None,
+                       max_rooms: Optional[int] = None, max_amenities: Optional[int] = None) -> dict:
+    """Extract hotel data from a parsed page (see parse_hotel_page); unrequested fields are skipped"""
+    hotel_id = extract_hotel_id(url)
+    hotel_name, currency, rooms, rating, amenities = "", "", [], Rating(0.0, 0.0), []
+    t = time.perf_counter()
+    if fields is None or "hotelName" in fields:
+        hotel_name = extract_hotel_name(parser, root, layout) or "Unknown Hotel"
+        t = STAGE_SECONDS.lap(t, "hotel_name")
+    if fields is None or "currency" in fields:
+        currency = extract_currency(parser, root, layout)
+        t = STAGE_SECONDS.lap(t, "currency")
+    if fields is None or "rooms" in fields:
+        rooms = extract_rooms(parser, root, hotel_id, layout, max_rooms)
+        t = STAGE_SECONDS.lap(t, "rooms")
+    if fields is None or "rating" in fields:
+        rating = Rating(extract_overall_rating(parser, root, layout), 0.0)
+        t = STAGE_SECONDS.lap(t, "rating")
+    if fields is None or "amenities" in fields:
+        amenities = extract_amenities(parser, root, layout, max_amenities)
+        t = STAGE_SECONDS.lap(t, "amenities")
+    
+    # Create HotelData object
+    hotel_data = HotelData(
+        hotel_id=hotel_id,
+        hotel_name=hotel_name,
+        currency=currency,
+        scrape_date=datetime.now().isoformat(),
+        check_in_date=checkin_date,
+        rooms=rooms,
+        rating=rating,
+        amenities=amenities
+    )
+    
+    result = hotel_data_to_dict(hotel_data, fields)
+    STAGE_SECONDS.lap(t, "serialize")
+    return result
+
+def parse_range_page(content: bytes, url: str, with_details: bool,
+                     parser: Optional[ParserBackend] = None) -> dict:
+    """
+    Extract the per-date part of a hotel page for a range sweep
+    
+    Hotel-level details (name, rating, amenities) do not change with the
+    check-in date, so they are only extracted when with_details is set.
+    """
+    parser = parser or get_parser()
+    t = time.perf_counter()
+    root = parser.parse(content)
+    t = STAGE_SECONDS.lap(t, "parse")
+    layout = page_layout(content)
+    t = STAGE_SECONDS.lap(t, "layout")
+    page = {"rooms": extract_rooms(parser, root, extract_hotel_id(url), layout)}
+    t = STAGE_SECONDS.lap(t, "rooms")
+    page["currency"] = extract_currency(parser, root, layout)
+    STAGE_SECONDS.lap(t, "currency")
+    if with_details:
+        page["hotelName"] = extract_hotel_name(parser, root, layout) or "Unknown Hotel"
+        page["rating"] = {"overall": extract_overall_rating(parser, root, layout), "location": 0.0}
+        page["amenities"] = extract_amenities(parser, root, layout)
+    return page
+
+def checkin_dates(start_date: str, end_date: str, step_days: int = 1) -> List[str]:
+    """
+    List check-in dates from start_date to end_date inclusive
+    
+    Raises:
+        ValueError: on malformed dates, an empty or too long range, or step_days < 1
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if step_days < 1:
+        raise ValueError("step must be at least 1 day")
+    if end < start:
+        raise ValueError("end date must not be before start date")
+    
+    count = (end - start).days // step_days + 1
+    if count > MAX_RANGE_DATES:
+        raise ValueError(f"range covers {count} dates, the maximum is {MAX_RANGE_DATES}")
+    return [(start + timedelta(days=i * step_days)).isoformat() for i in range(count)]
+
+async def parse_off_loop(parse: Any, content: bytes, *args: Any) -> dict:
+    """
+    Run a page parser without blocking the event loop
+    
+    Pages go to the parse worker processes when SCRAPER_PARSE_WORKERS is set
+    (see parse_pool), otherwise to the default thread executor. Profiled
+    scrapes always parse in a thread so the profiler can sample them.
+    """
+    pool = get_parse_pool()
+    if pool is None or (profiling.ENABLED and profiling.current_profile.get() is not None):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, profiling.profiled(parse), content, *args
         )
+    return await pool.run(parse, content, *args)
+
+async def store_result(url: str, hotel_data: dict) -> None:
+    """Add a scrape result to the price store, writing the batch when it is due"""
+    store = get_store()
+    try:
+        if store.add(normalize_hotel_id(url), hotel_data):
+            await asyncio.get_running_loop().run_in_executor(None, store.flush)
+    except sqlite3.Error as e:
+        # The scrape itself succeeded; the batch stays buffered for the next flush
+        print(f"Error storing prices: {e}")
+
+def streaming_enabled() -> bool:
+    """Whether pages are parsed while they download (SCRAPER_STREAM_PARSE, lxml backend, no archive)"""
+    # The archive needs whole pages, so it turns early termination off
+    return STREAM_PARSE and get_archive() is None and get_parser().name == "lxml"
+
+async def stream_scrape_page(client: httpx.AsyncClient, url: str, checkin_date: str,
+                             fields: Optional[FrozenSet[str]] = None, max_rooms: Optional[int] = None,
+                             max_amenities: Optional[int] = None) -> dict:
+    """
+    Download and parse a hotel page at the same time
+    
+    Body chunks go through a queue to one executor thread (lxml parsers must
+    stay on one thread), which feeds them to a StreamingPage. Once every
+    section the requested fields need is in, the download stops; the thread
+    then extracts the hotel data from the partial tree, which is dropped
+    with it. See parse_hotel_page for fields and the limits.
+    
+    Returns:
+        HotelData object as dictionary
+    
+    Raises:
+        httpx.HTTPError: if the download fails
+    """
+    parser = get_parser()
+    loop = asyncio.get_running_loop()
+    chunks: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+    # Chunks handed over but not parsed yet; bounds how far the download
+    # runs ahead of the parser, and so how much is read past the last section
+    window = asyncio.Semaphore(STREAM_WINDOW)
+    parser_done = threading.Event()
+    
+    sections = projected_sections(fields)
+    
+    def parse() -> dict:
+        page = StreamingPage(parser, sections)
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None or page.feed(chunk):
+                    break
+                loop.call_soon_threadsafe(window.release)
+        finally:
+            parser_done.set()
+            loop.call_soon_threadsafe(window.release)
+        if not page.bytes_fed:
+            raise ValueError("Empty page")
+        root = page.close()
+        STAGE_SECONDS.observe(page.parse_seconds, "parse")
+        if profiling.ENABLED:
+            profiling.note_page(page.bytes_fed)
+        return extract_hotel_data(parser, root, page_layout(page.received, page.head), url, checkin_date,
+                                  fields, max_rooms, max_amenities)
+    
+    async def on_chunk(chunk: bytes) -> bool:
+        await window.acquire()
+        if parser_done.is_set():
+            return True
+        chunks.put(chunk)
+        return False
+    
+    parsing = loop.run_in_executor(None, profiling.profiled(parse))
+    try:
+        response = await fetch_page(client, url, on_chunk)
+        response.raise_for_status()
+    except BaseException:
+        chunks.put(None)
+        # The result is not needed; retrieve it so a parse failure is not logged
+        parsing.add_done_callback(lambda future: future.cancelled() or future.exception())
+        raise
+    chunks.put(None)
+    return await parsing
+
+T = TypeVar("T")
+
+def run_blocking(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code
+    
+    asyncio.run refuses to start while the calling thread's event loop is
+    running (Jupyter, a sync helper called from a coroutine); the coroutine
+    then gets its own loop on a worker thread, and the caller blocks on it.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+def scrape_booking(url: str, checkin_date: str, fields: Union[None, str, Iterable[str]] = None,
+                   max_rooms: Optional[int] = None, max_amenities: Optional[int] = None) -> dict:
+    """
+    Scrape Booking.com hotel data
+    
+    Blocking wrapper around async_scrape_booking that runs on its own event
+    loop and connection pool, so it goes through the same fetch layer. It
+    may be called while an event loop is running (see run_blocking).
+    
+    Args:
+        url: Booking.com hotel page URL
+        checkin_date: Check-in date in YYYY-MM-DD format
+        fields: Fields to extract, e.g. "rooms,currency" (see parse_fields); None for all
+        max_rooms: Most rooms extracted (defaults to SCRAPER_MAX_ROOMS)
+        max_amenities: Most amenities extracted (defaults to SCRAPER_MAX_AMENITIES)
+    
+    Returns:
+        HotelData object as dictionary
+    
+    Raises:
+        ValueError: on an unknown field name
+    """
+    fields = parse_fields(fields)
+    
+    async def run() -> dict:
+        async with new_async_client() as client:
+            return await async_scrape_booking(url, checkin_date, client, fields, max_rooms, max_amenities)
+    
+    return run_blocking(run())
+
+async def async_scrape_booking(url: str, checkin_date: str,
+                               client: Optional[httpx.AsyncClient] = None,
+                               fields: Optional[FrozenSet[str]] = None, max_rooms: Optional[int] = None,
+                               max_amenities: Optional[int] = None) -> dict:
+    """
+    Scrape Booking.com hotel data without blocking the event loop
+    
+    The page is fetched through the pooled async client and parsed off the
+    event loop (see parse_off_loop), so many scrapes can be in flight at once.
+    Fields that are not requested are not extracted, and a streamed page
+    (SCRAPER_STREAM_PARSE) stops downloading once the requested ones are in.
+    Only full results with the default room and amenity limits are
+    written to the price store.
+    
+    Args:
+        url: Booking.com hotel page URL
+        checkin_date: Check-in date in YYYY-MM-DD format
+        client: Optional async client (defaults to the shared pooled client)
+        fields: Fields to extract, from parse_fields; None for all
+        max_rooms: Most rooms extracted (defaults to SCRAPER_MAX_ROOMS)
+        max_amenities: Most amenities extracted (defaults to SCRAPER_MAX_AMENITIES)
+    
+    Returns:
+        HotelData object as dictionary
+    """
+    try:
+        url = build_scrape_url(url, checkin_date)
         
-        # Convert to dictionary for JSON serialization
-        return {
-            "hotelId": hotel_data.hotel_id,
-            "hotelName": hotel_data.hotel_name,
-            "currency": hotel_data.currency,
-            "scrapeDate": hotel_data.scrape_date,
-            "checkInDate": hotel_data.check_in_date,
-            "rooms": [
-                {
-                    "roomId": room.room_id,
-                    "name": room.name,
-                    "occupancy": room.occupancy,
-                    "price": room.price,
-                    "refundable": room.refundable,
-                    "breakfastIncluded": room.breakfast_included,
-                    "available": room.available
-                }
-                for room in hotel_data.rooms
-            ],
-            "rating": {
-                "overall": hotel_data.rating.overall,
-                "location": hotel_data.rating.location
-            },
-            "amenities": hotel_data.amenities
-        }
+        print(f"Scraping URL: {url}")
+        if streaming_enabled():
+            result = await stream_scrape_page(client or get_async_client(), url, checkin_date,
+                                              fields, max_rooms, max_amenities)
+        else:
+            response = await fetch_page(client or get_async_client(), url)
+            response.raise_for_status()
+            
+            loop = asyncio.get_running_loop()
+            if get_archive() is not None:
+                await loop.run_in_executor(None, archive_page, response.content, url, checkin_date)
+            if profiling.ENABLED:
+                profiling.note_page(len(response.content))
+            result = await parse_off_loop(parse_hotel_page, response.content, url, checkin_date, None,
+                                          fields, max_rooms, max_amenities)
+        # A projection or non-default limit drops rooms/amenities the store would take as gone
+        if projection_key(fields, max_rooms, max_amenities) == "" and get_store() is not None:
+            await store_result(url, result)
+        return result
         
     except Exception as e:
+        ERRORS.inc(error_type(e))
         print(f"Error scraping {url}: {e}")
         # Return error response
-        return {
-            "error": str(e),
-            "hotelId": "error",
-            "hotelName": "Error",
-            "currency": "USD",
-            "scrapeDate": datetime.now().isoformat(),
-            "checkInDate": checkin_date,
-            "rooms": [],
-            "rating": {"overall": 0.0, "location": 0.0},
-            "amenities": []
-        }
+        return error_result(str(e), checkin_date)
+
+async def async_scrape_booking_range(url: str, start_date: str, end_date: str,
+                                     step_days: int = 1, concurrency: Optional[int] = None,
+                                     client: Optional[httpx.AsyncClient] = None) -> dict:
+    """
+    Scrape one hotel across a window of check-in dates
+    
+    All dates share one connection pool and are fetched with at most
+    `concurrency` requests in flight. Hotel-level details are extracted from
+    a single page; every other page only has its rooms and prices extracted.
+    
+    Args:
+        url: Booking.com hotel page URL
+        start_date: First check-in date in YYYY-MM-DD format
+        end_date: Last check-in date in YYYY-MM-DD format (inclusive)
+        step_days: Days between consecutive check-in dates
+        concurrency: Maximum parallel fetches (defaults to RANGE_CONCURRENCY)
+        client: Optional async client (defaults to the shared pooled client)
+    
+    Returns:
+        Compact price matrix: prices[i][j] is the cheapest available price of
+        roomNames[j] for checkInDates[i], or None. Failed dates are listed in
+        errors; if every date failed the dict also has an "error" key.
+    
+    Raises:
+        ValueError: if the date range is invalid (see checkin_dates)
+    """
+    dates = checkin_dates(start_date, end_date, step_days)
+    base_url = strip_checkin(url)
+    client = client or get_async_client()
+    semaphore = asyncio.Semaphore(concurrency or RANGE_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    
+    details: dict = {}
+    details_claimed = False
+    pages: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    
+    async def scrape_date(checkin: str) -> None:
+        nonlocal details_claimed
+        page_url = build_scrape_url(base_url, checkin)
+        with_details = False
+        try:
+            async with semaphore:
+                response = await fetch_page(client, page_url)
+                response.raise_for_status()
+            
+            # The first page to get here also yields the hotel-level details
+            with_details = not details_claimed
+            details_claimed = True
+            if get_archive() is not None:
+                await loop.run_in_executor(None, archive_page, response.content, page_url, checkin)
+            page = await parse_off_loop(parse_range_page, response.content, page_url, with_details)
+            if with_details:
+                details.update(hotelName=page["hotelName"], rating=page["rating"],
+                               amenities=page["amenities"])
+            pages[checkin] = page
+        except Exception as e:
+            if with_details:
+                details_claimed = False
+            ERRORS.inc(error_type(e))
+            print(f"Error scraping {page_url}: {e}")
+            errors[checkin] = str(e)
+    
+    print(f"Scraping range: {base_url} ({len(dates)} dates)")
+    await asyncio.gather(*(scrape_date(checkin) for checkin in dates))
+    if pages and not details:
+        # The page claimed for the details failed after every other page had
+        # been parsed without them: fetch one of those again for the details
+        retry = next(checkin for checkin in dates if checkin in pages)
+        page = pages.pop(retry)
+        await scrape_date(retry)
+        if retry not in pages:
+            pages[retry] = page
+            errors.pop(retry)
+    
+    # Columns are room types in order of first appearance
+    room_names: List[str] = []
+    room_columns: Dict[str, int] = {}
+    currency = "USD"
+    for checkin in dates:
+        if checkin in pages:
+            currency = pages[checkin]["currency"]
+            for room in pages[checkin]["rooms"]:
+                if room.available and room.name not in room_columns:
+                    room_columns[room.name] = len(room_names)
+                    room_names.append(room.name)
+    
+    prices: List[List[Optional[float]]] = []
+    for checkin in dates:
+        row: List[Optional[float]] = [None] * len(room_names)
+        for room in pages.get(checkin, {}).get("rooms", []):
+            if room.available:
+                column = room_columns[room.name]
+                if row[column] is None or room.price < row[column]:
+                    row[column] = room.price
+        prices.append(row)
+    
+    result = {
+        "hotelId": extract_hotel_id(base_url),
+        "hotelName": details.get("hotelName", "Unknown Hotel"),
+        "currency": currency,
+        "scrapeDate": datetime.now().isoformat(),
+        "rating": details.get("rating", {"overall": 0.0, "location": 0.0}),
+        "amenities": details.get("amenities", []),
+        "checkInDates": dates,
+        "roomNames": room_names,
+        "prices": prices,
+        "errors": errors
+    }
+    if not pages:
+        result["error"] = errors[dates[0]]
+    return result
+
+def scrape_booking_range(url: str, start_date: str, end_date: str,
+                         step_days: int = 1, concurrency: Optional[int] = None) -> dict:
+    """
+    Blocking wrapper around async_scrape_booking_range
+    
+    Runs the sweep on its own event loop and connection pool; see
+    async_scrape_booking_range for arguments and the result shape.
+    """
+    async def run() -> dict:
+        async with new_async_client() as client:
+            return await async_scrape_booking_range(
+                url, start_date, end_date, step_days, concurrency, client
+            )
+    
+    return run_blocking(run())
 
 if __name__ == "__main__":
-    # Test the scraper
-    test_url = "https://www.booking.com/hotel/us/hilton-garden-inn-new-york-manhattan-midtown-east.html"
-    test_date = "2024-01-15"
+    import argparse
+    
+    arg_parser = argparse.ArgumentParser(description="Scrape one Booking.com hotel page")
+    arg_parser.add_argument("url", help="Hotel page URL (or a stand-in server's, see benchmarks/standin.py)")
+    arg_parser.add_argument("checkin", help="Check-in date in YYYY-MM-DD format")
+    arg_parser.add_argument("--fields", help="Comma-separated fields to extract (see FIELD_GROUPS)")
+    args = arg_parser.parse_args()
     
-    result = scrape_booking(test_url, test_date)
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    result = scrape_booking(args.url, args.checkin, args.fields)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
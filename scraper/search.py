@@ -0,0 +1,346 @@
+"""
+Search-result and listing page scraping
+
+A Booking.com search-result page (/searchresults.html) lists up to 25
+properties with their name, review score and the price of the recommended
+room for the requested dates, so one fetch covers what would otherwise be
+25 hotel page fetches. Every property card becomes a result in the
+HotelData shape with a single "headline" room (the card's price) and no
+amenities, plus the hotel page URL and its normalized hotel id (hotelKey).
+
+Following pagination, the first page gives the number of pages (from the
+pagination control, else from the "N properties found" heading); the
+remaining pages are fetched with at most `concurrency` requests in flight
+and hotels that show up on several pages (promoted cards) are kept once.
+
+    python search.py "https://www.booking.com/searchresults.html?ss=Paris" 2024-03-10 [--max-pages N]
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from metrics import ERRORS, STAGE_SECONDS
+from parsers import ParserBackend, get_parser
+from prices import normalize_price
+from scrape import (HotelData, PRICE_LOCALE, Rating, Room, build_scrape_url, error_result, error_type,
+                    extract_hotel_id, extract_rating, fetch_page, get_async_client, hotel_data_to_dict,
+                    new_async_client, normalize_hotel_id, page_layout, parse_off_loop, pick_first,
+                    record_lookup, run_blocking)
+from selector_registry import PageLayout, registry
+
+# Result pages fetched at once per search, and the most pages followed
+SEARCH_CONCURRENCY = int(os.environ.get("SCRAPER_SEARCH_CONCURRENCY", "4"))
+SEARCH_MAX_PAGES = int(os.environ.get("SCRAPER_SEARCH_MAX_PAGES", "40"))
+
+# Properties per result page unless the URL asks for another count (rows=)
+SEARCH_PAGE_SIZE = 25
+
+CARD_SELECTORS = registry.register('search_card', [
+    'div[data-testid="property-card"]',
+    '.sr_property_block'
+])
+
+CARD_NAME_SELECTORS = registry.register('search_name', [
+    'div[data-testid="title"]',
+    '.sr-hotel__name'
+])
+
+CARD_LINK_SELECTORS = registry.register('search_link', [
+    'a[data-testid="title-link"]',
+    'a.hotel_name_link',
+    'a[data-testid="property-image"]'
+])
+
+CARD_RATING_SELECTORS = registry.register('search_rating', [
+    'div[data-testid="review-score"] > div:first-child',
+    '.bui-review-score__badge'
+])
+
+CARD_PRICE_SELECTORS = registry.register('search_price', [
+    'span[data-testid="price-and-discounted-price"]',
+    '.bui-price-display__value',
+    '.prco-valign-middle-helper'
+])
+
+CARD_ROOM_SELECTORS = registry.register('search_room', [
+    'div[data-testid="recommended-units"] h4',
+    '.room_link strong'
+])
+
+PAGINATION_SELECTORS = registry.register('search_pagination', [
+    'div[data-testid="pagination"] li',
+    '.bui-pagination__item'
+])
+
+# Per-card field selectors, resolved together by ParserBackend.first_matches
+CARD_FIELD_SELECTORS = tuple(CARD_NAME_SELECTORS + CARD_LINK_SELECTORS + CARD_RATING_SELECTORS +
+                             CARD_PRICE_SELECTORS + CARD_ROOM_SELECTORS)
+
+_PROPERTIES_FOUND = re.compile(r'([\d,.\s]+)\s+propert', re.IGNORECASE)
+
+def search_page_url(url: str, checkin_date: str, offset: int = 0) -> str:
+    """URL of the result page starting at offset, with the check-in date added if missing"""
+    parts = urlsplit(build_scrape_url(url, checkin_date))
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'offset']
+    if offset:
+        query.append(('offset', str(offset)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def search_page_size(url: str) -> int:
+    """Properties per result page requested by the URL (rows=), else SEARCH_PAGE_SIZE"""
+    rows = dict(parse_qsl(urlsplit(url).query)).get('rows', '')
+    return int(rows) if rows.isdigit() and int(rows) > 0 else SEARCH_PAGE_SIZE
+
+def hotel_page_url(page_url: str, href: str) -> str:
+    """Absolute hotel page URL of a card link, without query or fragment"""
+    parts = urlsplit(urljoin(page_url, href.strip()))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+
+def extract_card(parser: ParserBackend, card: Any, page_url: str, checkin_date: str,
+                 layout: Optional[PageLayout] = None) -> Optional[dict]:
+    """
+    Extract one property card into the HotelData shape
+
+    Returns:
+        HotelData object as dictionary with url and hotelKey added, or None
+        for a card without a hotel page link
+    """
+    matches = parser.first_matches(card, CARD_FIELD_SELECTORS)
+    link = pick_first(matches, 'search_link', layout)
+    href = parser.attribute(link, 'href') if link is not None else None
+    if not href:
+        return None
+    url = hotel_page_url(page_url, href)
+    hotel_id = extract_hotel_id(url)
+
+    name_elem = pick_first(matches, 'search_name', layout)
+    hotel_name = parser.text(name_elem, strip=True) if name_elem is not None else ""
+
+    rating_elem = pick_first(matches, 'search_rating', layout)
+    overall = extract_rating(parser.text(rating_elem, strip=True)) if rating_elem is not None else 0.0
+
+    price, currency = 0.0, None
+    price_elem = pick_first(matches, 'search_price', layout)
+    if price_elem is not None:
+        price, currency = normalize_price(parser.text(price_elem, strip=True), PRICE_LOCALE)
+
+    room_elem = pick_first(matches, 'search_room', layout)
+    room_name = parser.text(room_elem, strip=True) if room_elem is not None else ""
+
+    # Same conditions check as the hotel page room rows
+    card_text = parser.text(card).lower()
+    room = Room(
+        room_id=f"{hotel_id}_room_0",
+        name=room_name or "Standard Room",
+        occupancy=2,
+        price=price,
+        refundable="refundable" in card_text,
+        breakfast_included="breakfast" in card_text,
+        available=price > 0
+    )
+    hotel_data = HotelData(
+        hotel_id=hotel_id,
+        hotel_name=hotel_name or "Unknown Hotel",
+        currency=currency or "USD",
+        scrape_date=datetime.now().isoformat(),
+        check_in_date=checkin_date,
+        rooms=[room],
+        rating=Rating(overall, 0.0),
+        amenities=[]
+    )
+    result = hotel_data_to_dict(hotel_data)
+    result["url"] = url
+    result["hotelKey"] = normalize_hotel_id(url)
+    return result
+
+def extract_total_pages(parser: ParserBackend, root: Any,
+                        layout: Optional[PageLayout] = None) -> Optional[int]:
+    """Highest page number in the pagination control, or None without one"""
+    candidates = registry.candidates('search_pagination', layout)
+    for tried, selector in enumerate(candidates, 1):
+        numbers = [int(text) for text in (parser.text(elem, strip=True) for elem in parser.select(root, selector))
+                   if text.isdigit()]
+        if numbers:
+            record_lookup('search_pagination', layout, selector, tried)
+            return max(numbers)
+    record_lookup('search_pagination', layout, None, len(candidates))
+    return None
+
+def extract_total_results(parser: ParserBackend, root: Any) -> Optional[int]:
+    """Number of properties in the "Paris: 1,234 properties found" heading, or None"""
+    heading = parser.select_one(root, 'h1')
+    if heading is None:
+        return None
+    match = _PROPERTIES_FOUND.search(parser.text(heading))
+    digits = re.sub(r'\D', '', match.group(1)) if match else ''
+    return int(digits) if digits else None
+
+def parse_search_page(content: bytes, url: str, checkin_date: str,
+                      parser: Optional[ParserBackend] = None) -> dict:
+    """
+    Extract every property card of a fetched search-result page
+
+    Args:
+        content: Raw HTML of the result page
+        url: URL the page was fetched from (hotel links are relative to it)
+        checkin_date: Check-in date in YYYY-MM-DD format
+        parser: Parsing backend (defaults to the SCRAPER_PARSER backend)
+
+    Returns:
+        {"hotels": [HotelData dicts in page order], "totalPages": int or None,
+        "totalResults": int or None}
+    """
+    parser = parser or get_parser()
+    t = time.perf_counter()
+    root = parser.parse(content)
+    t = STAGE_SECONDS.lap(t, "parse")
+    layout = page_layout(content)
+    t = STAGE_SECONDS.lap(t, "layout")
+
+    hotels = []
+    candidates = registry.candidates('search_card', layout)
+    for tried, selector in enumerate(candidates, 1):
+        cards = parser.select(root, selector)
+        if cards:
+            record_lookup('search_card', layout, selector, tried)
+            break
+    else:
+        cards = []
+        record_lookup('search_card', layout, None, len(candidates))
+    for i, card in enumerate(cards):
+        try:
+            hotel = extract_card(parser, card, url, checkin_date, layout)
+        except Exception as e:
+            print(f"Error parsing property card {i}: {e}")
+            continue
+        if hotel is not None:
+            hotels.append(hotel)
+    # Sold-out cards show no price; give them the currency of the other cards
+    page_currency = next((hotel["currency"] for hotel in hotels if hotel["rooms"][0]["available"]), None)
+    if page_currency is not None:
+        for hotel in hotels:
+            if not hotel["rooms"][0]["available"]:
+                hotel["currency"] = page_currency
+    t = STAGE_SECONDS.lap(t, "rooms")
+
+    page = {
+        "hotels": hotels,
+        "totalPages": extract_total_pages(parser, root, layout),
+        "totalResults": extract_total_results(parser, root),
+    }
+    STAGE_SECONDS.lap(t, "serialize")
+    return page
+
+async def async_scrape_search(url: str, checkin_date: str, max_pages: Optional[int] = None,
+                              concurrency: Optional[int] = None,
+                              client: Optional[httpx.AsyncClient] = None) -> dict:
+    """
+    Scrape every hotel of a search-result listing, following its pagination
+
+    Args:
+        url: Booking.com search-result URL (any offset= is replaced)
+        checkin_date: Check-in date in YYYY-MM-DD format
+        max_pages: Most result pages to fetch (defaults to SEARCH_MAX_PAGES)
+        concurrency: Maximum parallel page fetches (defaults to SEARCH_CONCURRENCY)
+        client: Optional async client (defaults to the shared pooled client)
+
+    Returns:
+        {"searchUrl", "checkInDate", "scrapeDate", "hotels" (HotelData dicts,
+        each hotel once, in listing order), "totalResults", "totalPages",
+        "pages" (pages fetched), "errors" (offset -> error of failed pages)}.
+        If the first page fails the error result of scrape.error_result is
+        returned instead.
+    """
+    client = client or get_async_client()
+    max_pages = max_pages or SEARCH_MAX_PAGES
+    page_size = search_page_size(url)
+    first_url = search_page_url(url, checkin_date)
+
+    async def scrape_page(page_url: str) -> dict:
+        response = await fetch_page(client, page_url)
+        response.raise_for_status()
+        return await parse_off_loop(parse_search_page, response.content, page_url, checkin_date)
+
+    print(f"Scraping search: {first_url}")
+    try:
+        first = await scrape_page(first_url)
+    except Exception as e:
+        ERRORS.inc(error_type(e))
+        print(f"Error scraping {first_url}: {e}")
+        return error_result(str(e), checkin_date)
+
+    total_pages = first["totalPages"]
+    if total_pages is None and first["totalResults"] is not None:
+        total_pages = math.ceil(first["totalResults"] / page_size)
+    total_pages = max(total_pages or 1, 1)
+
+    semaphore = asyncio.Semaphore(concurrency or SEARCH_CONCURRENCY)
+    pages: Dict[int, dict] = {0: first}
+    errors: Dict[str, str] = {}
+
+    async def scrape_offset(offset: int) -> None:
+        page_url = search_page_url(url, checkin_date, offset)
+        try:
+            async with semaphore:
+                pages[offset] = await scrape_page(page_url)
+        except Exception as e:
+            ERRORS.inc(error_type(e))
+            print(f"Error scraping {page_url}: {e}")
+            errors[str(offset)] = str(e)
+
+    offsets = [page * page_size for page in range(1, min(total_pages, max_pages))]
+    await asyncio.gather(*(scrape_offset(offset) for offset in offsets))
+
+    hotels: List[dict] = []
+    seen = set()
+    for offset in sorted(pages):
+        for hotel in pages[offset]["hotels"]:
+            if hotel["hotelKey"] not in seen:
+                seen.add(hotel["hotelKey"])
+                hotels.append(hotel)
+
+    return {
+        "searchUrl": first_url,
+        "checkInDate": checkin_date,
+        "scrapeDate": datetime.now().isoformat(),
+        "hotels": hotels,
+        "totalResults": first["totalResults"],
+        "totalPages": total_pages,
+        "pages": len(pages),
+        "errors": errors,
+    }
+
+def scrape_search(url: str, checkin_date: str, max_pages: Optional[int] = None,
+                  concurrency: Optional[int] = None) -> dict:
+    """
+    Blocking wrapper around async_scrape_search
+
+    Runs the search on its own event loop and connection pool; see
+    async_scrape_search for arguments and the result shape.
+    """
+    async def run() -> dict:
+        async with new_async_client() as client:
+            return await async_scrape_search(url, checkin_date, max_pages, concurrency, client)
+
+    return run_blocking(run())
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    arg_parser = argparse.ArgumentParser(description="Scrape the hotels of a Booking.com search")
+    arg_parser.add_argument("url")
+    arg_parser.add_argument("checkin")
+    arg_parser.add_argument("--max-pages", type=int)
+    arg_parser.add_argument("--concurrency", type=int)
+    args = arg_parser.parse_args()
+    print(json.dumps(scrape_search(args.url, args.checkin, args.max_pages, args.concurrency),
+                     indent=2, ensure_ascii=False))
@@ -0,0 +1,230 @@
+"""
+Adaptive selector registry
+
+Booking.com serves a handful of page layouts and each of them only matches
+one selector out of every fallback list in scrape.py. Walking the lists in
+declaration order wastes a full-tree query on every selector that cannot
+match. The registry avoids that:
+
+- Learning: pages are fingerprinted by the class attributes of their <html>
+  and <body> tags (the page template), and for each (layout, group) the
+  registry counts which selector won. Selectors are tried most-wins first.
+- Precheck: where a group usually matches nothing on a layout, each
+  selector is first reduced to the literal tokens it needs (class names,
+  ids, attribute names/values, tag names). If one of them does not occur
+  anywhere in the raw page the selector cannot match and the DOM query is
+  skipped.
+
+Hit/miss/skip counters per layout are exposed through stats() so markup
+changes on Booking's side show up as new fingerprints or falling hit rates.
+"""
+
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+_CLASS_OR_ID = re.compile(r'[.#]([-\w]+)')
+_ATTRIBUTE = re.compile(r'\[\s*([-\w]+)\s*(?:[~|^$*]?=\s*["\']?([^"\'\]]*)["\']?)?\s*\]')
+_TAG = re.compile(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)')
+_CLASS_ATTRIBUTE = re.compile(rb'\sclass\s*=\s*["\']?([^"\'>]*)')
+
+# Fingerprints beyond this many share one "other" bucket, bounding the stats
+MAX_LAYOUTS = 64
+
+def required_tokens(selector: str) -> Tuple[bytes, ...]:
+    """
+    Literal tokens that must appear in a page for selector to match
+
+    Tokens are lower-cased; pages are compared lower-cased as well, so the
+    check never rules out a selector that could match.
+    """
+    tokens = []
+    tokens.extend(_CLASS_OR_ID.findall(selector))
+    for name, value in _ATTRIBUTE.findall(selector):
+        tokens.append(name)
+        if value:
+            tokens.append(value)
+    # Tag names only count when they start a compound selector, not inside [...]
+    tokens.extend('<' + tag for tag in _TAG.findall(_ATTRIBUTE.sub(' ', selector)))
+    return tuple(dict.fromkeys(token.lower().encode('utf-8') for token in tokens))
+
+class PageLayout:
+    """Per-page view used by the registry: layout fingerprint and token checks"""
+
+    def __init__(self, content: bytes, head: Optional[bytes] = None):
+        """
+        Args:
+            content: Page bytes the selector tokens are checked against
+            head: Start of the page to fingerprint instead of content
+        """
+        self._content = content
+        self._lowered: Optional[bytes] = None
+        self._tokens: Dict[bytes, bool] = {}
+        self.fingerprint = layout_fingerprint(content if head is None else head)
+
+    def contains(self, tokens: Tuple[bytes, ...]) -> bool:
+        """True if every token occurs in the page (case-insensitively)"""
+        if self._lowered is None:
+            self._lowered = self._content.lower()
+        for token in tokens:
+            found = self._tokens.get(token)
+            if found is None:
+                found = self._tokens[token] = token in self._lowered
+            if not found:
+                return False
+        return True
+
+def _tag_classes(content: bytes, tag: bytes) -> bytes:
+    start = content.find(tag)
+    if start == -1:
+        return b""
+    end = content.find(b">", start)
+    match = _CLASS_ATTRIBUTE.search(content, start, end if end != -1 else start + 2048)
+    return match.group(1) if match else b""
+
+def layout_fingerprint(content: bytes) -> str:
+    """Short id of the page template, from the <html> and <body> class attributes"""
+    template = _tag_classes(content, b"<html") + b"|" + _tag_classes(content, b"<body")
+    return format(zlib.crc32(template), "08x")
+
+class SelectorRegistry:
+    """Named fallback selector groups with per-layout win statistics"""
+
+    def __init__(self):
+        self._groups: Dict[str, List[str]] = {}
+        self._tokens: Dict[str, Tuple[bytes, ...]] = {}
+        self._layouts: set = set()
+        # (fingerprint, group) -> selector -> counters
+        self._wins: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._stats: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+        # Set in parse worker processes: record() also counts into a delta
+        # that drain() hands back to the parent process
+        self.track_deltas = False
+        self._delta: Dict[Tuple[str, str, str], int] = defaultdict(int)
+
+    def register(self, group: str, selectors: List[str]) -> List[str]:
+        """Register a fallback list under a group name and return it"""
+        self._groups[group] = list(selectors)
+        for selector in selectors:
+            self._tokens[selector] = required_tokens(selector)
+        return selectors
+
+    def primary(self, group: str) -> str:
+        """The first declared selector of a group"""
+        return self._groups[group][0]
+
+    def layout(self, content: bytes, head: Optional[bytes] = None) -> PageLayout:
+        """Fingerprint a raw page (from head, when given)"""
+        layout = PageLayout(content, head)
+        if layout.fingerprint not in self._layouts:
+            if len(self._layouts) >= MAX_LAYOUTS:
+                layout.fingerprint = "other"
+            else:
+                with self._lock:
+                    self._layouts.add(layout.fingerprint)
+        return layout
+
+    def candidates(self, group: str, layout: Optional[PageLayout]) -> List[str]:
+        """
+        Selectors of group worth trying on this page, best first
+
+        Without a layout every selector is returned in declaration order.
+        """
+        selectors = self._groups[group]
+        if layout is None:
+            return selectors
+
+        key = (layout.fingerprint, group)
+        wins = self._wins.get(key)
+        ordered = sorted(selectors, key=lambda s: -wins.get(s, 0)) if wins else selectors
+
+        # Scanning the raw page costs more than a query that hits, so only
+        # precheck tokens where lookups on this layout usually miss
+        stats = self._stats.get(key)
+        if not stats or stats.get("misses", 0) <= stats.get("hits", 0):
+            return ordered
+        viable = [selector for selector in ordered if layout.contains(self._tokens[selector])]
+        skipped = len(selectors) - len(viable)
+        if skipped:
+            with self._lock:
+                self._stats[key]["skipped"] += skipped
+                if self.track_deltas:
+                    self._delta[(layout.fingerprint, group, "skipped")] += skipped
+        return viable
+
+    def record(self, group: str, layout: Optional[PageLayout], selector: Optional[str], tried: int) -> None:
+        """
+        Record the outcome of a lookup
+
+        Args:
+            group: Selector group name
+            layout: Page layout the lookup ran on (nothing is recorded without one)
+            selector: The selector that matched, or None if none did
+            tried: Number of selectors queried, including the winner
+        """
+        if layout is None:
+            return
+        key = (layout.fingerprint, group)
+        with self._lock:
+            stats = self._stats[key]
+            stats["lookups"] += 1
+            stats["queries"] += tried
+            if selector is None:
+                stats["misses"] += 1
+            else:
+                stats["hits"] += 1
+                self._wins[key][selector] += 1
+            if self.track_deltas:
+                delta = self._delta
+                delta[(layout.fingerprint, group, "lookups")] += 1
+                delta[(layout.fingerprint, group, "queries")] += tried
+                delta[(layout.fingerprint, group, "misses" if selector is None else "hits")] += 1
+                if selector is not None:
+                    delta[(layout.fingerprint, group, "win:" + selector)] += 1
+
+    def drain(self) -> Dict[Tuple[str, str, str], int]:
+        """Counts recorded since the last drain (only with track_deltas)"""
+        with self._lock:
+            delta, self._delta = dict(self._delta), defaultdict(int)
+        return delta
+
+    def merge(self, delta: Dict[Tuple[str, str, str], int]) -> None:
+        """Add counts drained from a worker process, winners included"""
+        with self._lock:
+            for (fingerprint, group, counter), count in delta.items():
+                key = (fingerprint, group)
+                self._layouts.add(fingerprint)
+                if counter.startswith("win:"):
+                    self._wins[key][counter[4:]] += count
+                else:
+                    self._stats[key][counter] += count
+
+    def stats(self) -> Dict[str, Dict[str, dict]]:
+        """Hit/miss statistics per group and layout fingerprint"""
+        with self._lock:
+            result: Dict[str, Dict[str, dict]] = {}
+            for (fingerprint, group), counters in self._stats.items():
+                wins = self._wins.get((fingerprint, group), {})
+                lookups = counters.get("lookups", 0)
+                result.setdefault(group, {})[fingerprint] = {
+                    "lookups": lookups,
+                    "hits": counters.get("hits", 0),
+                    "misses": counters.get("misses", 0),
+                    "hitRate": round(counters.get("hits", 0) / lookups, 4) if lookups else None,
+                    "queries": counters.get("queries", 0),
+                    "skipped": counters.get("skipped", 0),
+                    "winners": dict(sorted(wins.items(), key=lambda item: -item[1])),
+                }
+            return result
+
+    def reset(self) -> None:
+        """Forget learned winners and statistics"""
+        with self._lock:
+            self._wins.clear()
+            self._stats.clear()
+            self._layouts.clear()
+
+registry = SelectorRegistry()
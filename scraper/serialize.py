@@ -0,0 +1,37 @@
+"""
+Fast JSON encoding of scrape results
+
+Results are plain dicts of strings, numbers, booleans and lists, so they
+are encoded straight to UTF-8 JSON bytes without building a response model
+or walking them with a generic encoder. orjson is used when installed;
+otherwise the standard library encoder produces the same compact output.
+"""
+
+import json
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROOM_COLUMNS = ("roomId", "name", "occupancy", "price", "refundable", "breakfastIncluded", "available")
+
+def dumps(obj: Any) -> bytes:
+    """Encode obj as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def rooms_to_columns(rooms: List[dict]) -> Dict[str, list]:
+    """
+    Columnar form of a room list: one list per room field, same order
+
+    {"roomId": ["a", "b"], "price": [120.0, 95.5], ...} repeats each key once
+    instead of once per room, which keeps large batch responses small.
+    """
+    return {column: [room[column] for room in rooms] for column in ROOM_COLUMNS}
+
+def columnar(hotel_data: dict) -> dict:
+    """Copy of a HotelData dict with its rooms in columnar form"""
+    return {**hotel_data, "rooms": rooms_to_columns(hotel_data["rooms"])}
@@ -0,0 +1,485 @@
+"""
+Local price-history store (SQLite in WAL mode)
+
+Scrape results can be persisted next to the scraper instead of one
+round trip per hotel, room and price row. Results are buffered in memory
+and written in batches, each batch in a single transaction with
+executemany: hotels and rooms are upserted by key (the normalized hotel id
+from the URL and the room id within that hotel, not by name), and every
+room of every result becomes one price row.
+
+Tables:
+
+    hotels        hotel_id -> name, currency, amenities (JSON), ratings
+    rooms         (hotel_id, room_id) -> name, occupancy
+    daily_prices  (hotel_id, room_id, check_in, scraped_at) -> price, flags
+
+daily_prices is a WITHOUT ROWID table clustered on its composite primary
+key, so a room's history for a check-in date is one range scan; a second
+index on (hotel_id, check_in, scraped_at) serves "all rooms of a hotel for
+a date". Storing the same scrape twice replaces its rows. Every batch also
+updates the analytics rollups (see analytics.py) in the same transaction.
+
+    python store.py stats PRICE_DB
+    python store.py compact PRICE_DB [--vacuum]
+    python store.py history PRICE_DB fr/grand-plaza [--room ROOM_ID] [--checkin DATE]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from analytics import ROLLUP_SCHEMA, rebuild_rollups, update_rollups
+from delta import room_fingerprint, room_state
+
+STORE_PATH = os.environ.get("SCRAPER_STORE_PATH", "")
+# Results buffered before a batch is written
+STORE_BATCH = int(os.environ.get("SCRAPER_STORE_BATCH", "200"))
+# Buffered results are also written once the oldest is this old
+STORE_FLUSH_SECONDS = float(os.environ.get("SCRAPER_STORE_FLUSH_SECONDS", "5"))
+# Only write price rows of rooms that changed since the previous scrape
+STORE_DELTA = os.environ.get("SCRAPER_STORE_DELTA", "1") != "0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hotels (
+    hotel_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    amenities TEXT NOT NULL,
+    rating_overall REAL NOT NULL,
+    rating_location REAL NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    hotel_id TEXT NOT NULL,
+    room_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    occupancy INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (hotel_id, room_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_prices (
+    hotel_id TEXT NOT NULL,
+    room_id TEXT NOT NULL,
+    check_in TEXT NOT NULL,
+    scraped_at TEXT NOT NULL,
+    price REAL NOT NULL,
+    currency TEXT NOT NULL,
+    available INTEGER NOT NULL,
+    refundable INTEGER NOT NULL,
+    breakfast_included INTEGER NOT NULL,
+    PRIMARY KEY (hotel_id, room_id, check_in, scraped_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_prices_by_check_in ON daily_prices (hotel_id, check_in, scraped_at);
+CREATE TABLE IF NOT EXISTS room_state (
+    hotel_id TEXT NOT NULL,
+    check_in TEXT NOT NULL,
+    room_id TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    checked_at TEXT NOT NULL,
+    PRIMARY KEY (hotel_id, check_in, room_id)
+) WITHOUT ROWID;
+"""
+
+UPSERT_HOTEL = """
+INSERT INTO hotels (hotel_id, name, currency, amenities, rating_overall, rating_location, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (hotel_id) DO UPDATE SET
+    name = excluded.name, currency = excluded.currency, amenities = excluded.amenities,
+    rating_overall = excluded.rating_overall, rating_location = excluded.rating_location,
+    updated_at = excluded.updated_at
+WHERE excluded.updated_at >= hotels.updated_at
+"""
+
+UPSERT_ROOM = """
+INSERT INTO rooms (hotel_id, room_id, name, occupancy, updated_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (hotel_id, room_id) DO UPDATE SET
+    name = excluded.name, occupancy = excluded.occupancy, updated_at = excluded.updated_at
+WHERE excluded.updated_at >= rooms.updated_at
+"""
+
+INSERT_PRICE = """
+INSERT OR REPLACE INTO daily_prices
+    (hotel_id, room_id, check_in, scraped_at, price, currency, available, refundable, breakfast_included)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# (price, available, refundable, breakfast_included) of the row delta mode writes for a vanished room
+VANISHED = (0.0, False, False, False)
+
+def price_rows(hotel_id: str, data: dict) -> List[tuple]:
+    """daily_prices rows of a scrape result, one per room"""
+    return [
+        (hotel_id, room["roomId"], data["checkInDate"], data["scrapeDate"], room["price"], data["currency"],
+         room["available"], room["refundable"], room["breakfastIncluded"])
+        for room in data["rooms"]
+    ]
+
+class PriceStore:
+    """Batched writer and reader of the SQLite price history"""
+
+    def __init__(self, path: str, batch_size: int = STORE_BATCH,
+                 flush_seconds: float = STORE_FLUSH_SECONDS, delta: bool = STORE_DELTA):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            batch_size: Results buffered before add() asks for a flush
+            flush_seconds: Age of the oldest buffered result that also asks for one
+            delta: Write only rooms that are new, changed or vanished (see flush)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.delta = delta
+        self._lock = threading.Lock()
+        # The connection is shared by executor threads, one statement batch at a time
+        self._conn_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a crash loses at most the last transactions
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA + ROLLUP_SCHEMA)
+        if (self._conn.execute("SELECT EXISTS (SELECT 1 FROM daily_prices)").fetchone()[0]
+                and not self._conn.execute("SELECT EXISTS (SELECT 1 FROM check_in_rollups)").fetchone()[0]):
+            # A store written before the rollups existed
+            rebuild_rollups(self._conn)
+        elif self._conn.execute("SELECT EXISTS (SELECT 1 FROM check_in_rollups "
+                                "WHERE length(day_mins) < 2 * length(days))").fetchone()[0]:
+            # Rollups that packed day minima as float32
+            rebuild_rollups(self._conn)
+        self._pending: List[Tuple[str, dict]] = []
+        self._oldest = 0.0
+        self.rows_written = 0
+        self.rows_unchanged = 0
+
+    def add(self, hotel_id: str, hotel_data: dict) -> bool:
+        """
+        Buffer one scrape result for the next batch
+
+        Args:
+            hotel_id: Normalized hotel id (scrape.normalize_hotel_id of the URL)
+            hotel_data: HotelData dict (results with an "error" are ignored)
+
+        Returns:
+            True when the buffer is due to be written with flush()
+        """
+        if "error" in hotel_data:
+            return False
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((hotel_id, hotel_data))
+            return (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._oldest >= self.flush_seconds)
+
+    def add_many(self, results: Iterable[Tuple[str, dict]]) -> int:
+        """
+        Write (hotel_id, hotel_data) pairs in batches
+
+        Returns:
+            Price rows written
+        """
+        written = 0
+        for hotel_id, hotel_data in results:
+            if self.add(hotel_id, hotel_data):
+                written += self.flush()
+        return written + self.flush()
+
+    def flush(self) -> int:
+        """
+        Write buffered results in one transaction
+
+        In delta mode a price row is only written for a room that is new or
+        whose fingerprint differs from the last stored scrape of its hotel
+        and check-in date; a room that vanished from the page gets an
+        unavailable row. A result no newer than the stored state is
+        skipped. The rollups still see every new scrape.
+
+        Returns:
+            Price rows written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            oldest = self._oldest
+        if not pending:
+            return 0
+
+        try:
+            prices, unchanged = self._write(pending)
+        except BaseException:
+            # Keep the batch for the next flush, ahead of results added since
+            with self._lock:
+                if self._pending:
+                    oldest = min(oldest, self._oldest)
+                self._pending[:0] = pending
+                self._oldest = oldest
+            raise
+        with self._conn_lock:
+            self.rows_written += len(prices)
+            self.rows_unchanged += unchanged
+        return len(prices)
+
+    def _write(self, pending: List[Tuple[str, dict]]) -> Tuple[List[tuple], int]:
+        """
+        Write a batch in one transaction, rolled back on any error
+
+        Returns:
+            (price rows written, rooms left unwritten because they did not change)
+        """
+        hotels = []
+        rooms = []
+        for hotel_id, data in pending:
+            scraped_at = data["scrapeDate"]
+            rating = data["rating"]
+            hotels.append((hotel_id, data["hotelName"], data["currency"],
+                           json.dumps(data["amenities"], ensure_ascii=False),
+                           rating["overall"], rating["location"], scraped_at))
+            for room in data["rooms"]:
+                rooms.append((hotel_id, room["roomId"], room["name"], room["occupancy"], scraped_at))
+
+        with self._conn_lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(UPSERT_HOTEL, hotels)
+                self._conn.executemany(UPSERT_ROOM, rooms)
+                if self.delta:
+                    prices, scraped, unchanged = self._changed_prices(pending)
+                    update_rollups(self._conn, scraped, skip_stored=False)
+                else:
+                    prices = [row for hotel_id, data in pending for row in price_rows(hotel_id, data)]
+                    update_rollups(self._conn, prices)
+                    unchanged = 0
+                self._conn.executemany(INSERT_PRICE, prices)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return prices, unchanged
+
+    def _changed_prices(self, pending: List[Tuple[str, dict]]) -> Tuple[List[tuple], List[tuple], int]:
+        """
+        Delta-mode rows of a batch and the room state update (inside the write transaction)
+
+        Returns:
+            (price rows to write, every price row of the results newer than the
+            stored state, rooms left unwritten because they did not change)
+        """
+        # (hotel_id, check_in) -> (checked_at, roomId -> fingerprint), read once per batch
+        states: Dict[Tuple[str, str], Tuple[str, Dict[str, int]]] = {}
+        updated = set()
+        changed: List[tuple] = []
+        scraped: List[tuple] = []
+        unchanged = 0
+        for hotel_id, data in pending:
+            key = (hotel_id, data["checkInDate"])
+            if key not in states:
+                stored = self._conn.execute("SELECT room_id, fingerprint, checked_at FROM room_state "
+                                            "WHERE hotel_id = ? AND check_in = ?", key).fetchall()
+                states[key] = (max((row[2] for row in stored), default=""),
+                               {row[0]: row[1] for row in stored})
+            checked_at, previous = states[key]
+            scraped_at = data["scrapeDate"]
+            if scraped_at <= checked_at:
+                continue
+            current = room_state(data)
+            rows = price_rows(hotel_id, data)
+            scraped.extend(rows)
+            rows_changed = [row for row in rows if previous.get(row[1]) != current[row[1]]]
+            unchanged += len(rows) - len(rows_changed)
+            changed.extend(rows_changed)
+            changed.extend((hotel_id, room_id, key[1], scraped_at, 0.0, data["currency"], False, False, False)
+                           for room_id in previous if room_id not in current)
+            states[key] = (scraped_at, current)
+            updated.add(key)
+
+        self._conn.executemany("DELETE FROM room_state WHERE hotel_id = ? AND check_in = ?", list(updated))
+        self._conn.executemany(
+            "INSERT INTO room_state (hotel_id, check_in, room_id, fingerprint, checked_at) VALUES (?, ?, ?, ?, ?)",
+            [(*key, room_id, fingerprint, states[key][0])
+             for key in updated for room_id, fingerprint in states[key][1].items()],
+        )
+        return changed, scraped, unchanged
+
+    def price_history(self, hotel_id: str, room_id: Optional[str] = None,
+                      check_in: Optional[str] = None) -> List[dict]:
+        """
+        Stored prices of a hotel, oldest scrape first
+
+        Args:
+            hotel_id: Normalized hotel id (e.g. "fr/grand-plaza")
+            room_id: Only this room
+            check_in: Only this check-in date (YYYY-MM-DD)
+        """
+        query = ("SELECT room_id, check_in, scraped_at, price, currency, available, refundable, "
+                 "breakfast_included FROM daily_prices WHERE hotel_id = ?")
+        params: list = [hotel_id]
+        if room_id is not None:
+            query += " AND room_id = ?"
+            params.append(room_id)
+        if check_in is not None:
+            query += " AND check_in = ?"
+            params.append(check_in)
+        query += " ORDER BY check_in, scraped_at, room_id"
+        with self._conn_lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"roomId": r[0], "checkInDate": r[1], "scrapeDate": r[2], "price": r[3], "currency": r[4],
+             "available": bool(r[5]), "refundable": bool(r[6]), "breakfastIncluded": bool(r[7])}
+            for r in rows
+        ]
+
+    def compact(self) -> dict:
+        """
+        Collapse runs of identical consecutive price rows of a room and check-in date
+
+        The first row of each run is kept, so the history still shows when
+        every price appeared. Check-in dates without delta state get it from
+        the last row of each room, so delta writes continue from there.
+
+        Returns:
+            {"rows": rows before, "removed": rows deleted}
+        """
+        self.flush()
+        with self._conn_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = 0
+                removed = []
+                last: Dict[Tuple[str, str, str], tuple] = {}
+                previous_key, previous_values = None, None
+                cursor = self._conn.execute(
+                    "SELECT hotel_id, room_id, check_in, scraped_at, price, currency, available, refundable, "
+                    "breakfast_included FROM daily_prices ORDER BY hotel_id, room_id, check_in, scraped_at"
+                )
+                for row in cursor:
+                    total += 1
+                    key, values = row[:3], row[4:]
+                    if key == previous_key and values == previous_values:
+                        removed.append(row[:4])
+                    else:
+                        previous_key, previous_values = key, values
+                    last[key] = row
+                self._conn.executemany("DELETE FROM daily_prices WHERE hotel_id = ? AND room_id = ? "
+                                       "AND check_in = ? AND scraped_at = ?", removed)
+                self._conn.executemany(
+                    "INSERT INTO room_state (hotel_id, check_in, room_id, fingerprint, checked_at) "
+                    "VALUES (?, ?, ?, ?, ?)", self._seed_state(last))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"rows": total, "removed": len(removed)}
+
+    def _seed_state(self, last: Dict[Tuple[str, str, str], tuple]) -> List[tuple]:
+        """
+        room_state rows for check-in dates without any, from each room's last price row
+
+        Rooms whose last row records them as gone (see VANISHED) are left
+        out, so the next delta write does not report them gone again.
+        """
+        names = {(row[0], row[1]): row[2:] for row in
+                 self._conn.execute("SELECT hotel_id, room_id, name, occupancy FROM rooms")}
+        have_state = set(self._conn.execute("SELECT DISTINCT hotel_id, check_in FROM room_state"))
+        by_check_in: Dict[Tuple[str, str], List[tuple]] = {}
+        for (hotel_id, _, check_in), row in last.items():
+            if (hotel_id, check_in) not in have_state:
+                by_check_in.setdefault((hotel_id, check_in), []).append(row)
+        seeded = []
+        for (hotel_id, check_in), rows in by_check_in.items():
+            checked_at = max(row[3] for row in rows)
+            for _, room_id, _, _, price, currency, available, refundable, breakfast in rows:
+                if (price, available, refundable, breakfast) == VANISHED:
+                    continue
+                name, occupancy = names.get((hotel_id, room_id), ("", 0))
+                room = {"name": name, "occupancy": occupancy, "price": price, "available": bool(available),
+                        "refundable": bool(refundable), "breakfastIncluded": bool(breakfast)}
+                seeded.append((hotel_id, check_in, room_id, room_fingerprint(room, currency), checked_at))
+        return seeded
+
+    def query(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(connection, *args) with the connection to itself (e.g. an analytics query)"""
+        with self._conn_lock:
+            return func(self._conn, *args)
+
+    def stats(self) -> dict:
+        """Row counts, pending results and database size"""
+        with self._conn_lock:
+            counts = {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("hotels", "rooms", "daily_prices")}
+        with self._lock:
+            pending = len(self._pending)
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {"path": self.path, **counts, "pending": pending, "bytes": size, "delta": self.delta,
+                "rowsWritten": self.rows_written, "unchangedRowsSkipped": self.rows_unchanged}
+
+    def close(self) -> None:
+        """Write buffered results and close the database"""
+        self.flush()
+        with self._conn_lock:
+            # Refresh the planner statistics the indexes are chosen by
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[PriceStore]:
+    """Return the store configured by SCRAPER_STORE_PATH, or None when storing is off"""
+    global _store
+    if not STORE_PATH:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore(STORE_PATH)
+    return _store
+
+def close_store() -> None:
+    """Flush and close the configured store, if it was opened"""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+def main(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Price history store tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = commands.add_parser("stats", help="Show row counts and size")
+    stats_parser.add_argument("path")
+    compact_parser = commands.add_parser("compact", help="Collapse runs of identical price rows")
+    compact_parser.add_argument("path")
+    compact_parser.add_argument("--vacuum", action="store_true", help="Rewrite the file to release the space")
+    history_parser = commands.add_parser("history", help="Print a hotel's stored prices as NDJSON")
+    history_parser.add_argument("path")
+    history_parser.add_argument("hotel", help="Normalized hotel id, e.g. fr/grand-plaza")
+    history_parser.add_argument("--room")
+    history_parser.add_argument("--checkin")
+
+    args = parser.parse_args(argv)
+    store = PriceStore(args.path)
+    try:
+        if args.command == "stats":
+            print(json.dumps(store.stats(), indent=2))
+        elif args.command == "compact":
+            start = time.perf_counter()
+            result = store.compact()
+            if args.vacuum:
+                store.query(lambda conn: conn.execute("VACUUM"))
+            print(f"Removed {result['removed']} of {result['rows']} price rows "
+                  f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        else:
+            for row in store.price_history(args.hotel, args.room, args.checkin):
+                sys.stdout.write(json.dumps(row) + "\n")
+    finally:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
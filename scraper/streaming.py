@@ -0,0 +1,169 @@
+"""
+Incremental parsing of a page while it downloads
+
+The extractors only need a few sections of a hotel page (name, currency,
+review score, facilities and the room table), and on real pages these come
+before the bulk of the markup (reviews, scripts, recommendations).
+StreamingPage collects body chunks as they arrive and reports when every
+section has been located and closed, so the download can stop there.
+
+The raw bytes are first scanned for the literal tokens the section
+selectors need (see selector_registry.required_tokens). Only once every
+pending section has a selector whose tokens have all been seen is the prefix
+received so far parsed (libxml2 closes whatever is still open) and the
+selectors run on it. Re-parses are spaced out geometrically, so a section
+that never matches costs a bounded number of parses, not one per chunk.
+(lxml's HTMLPullParser would avoid re-parsing, but libxml2's HTML push
+parser stops emitting events part way through a document for some chunk
+boundaries, so it cannot tell when a section has closed.)
+
+A section is complete when the element to watch is closed in the prefix,
+i.e. the last element parsed lies outside it: the first match for
+single-element sections, and for list sections the context element of the
+selector ('.hotel-facilities-group' in
+'.hotel-facilities-group .bui-list__description') or the parent of the
+matched rows.
+
+Streaming needs the lxml backend. Pages without one of the sections are
+simply read to the end.
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from selector_registry import registry, required_tokens
+
+STREAM_PARSE = os.environ.get("SCRAPER_STREAM_PARSE", "") not in ("", "0")
+STREAM_CHUNK_SIZE = int(os.environ.get("SCRAPER_STREAM_CHUNK_SIZE", "16384"))
+# Chunks the download may run ahead of the parser
+STREAM_WINDOW = int(os.environ.get("SCRAPER_STREAM_WINDOW", "2"))
+
+# Selector group -> whether it matches a list of elements
+SECTIONS = {"hotel_name": False, "currency": False, "rating": False, "amenities": True, "rooms": True}
+
+# Bytes kept from the previous chunk so tokens split across chunks are found
+_OVERLAP = 128
+# Bytes to receive between re-parses of the prefix (at least; the gap grows with it)
+_REPARSE_BYTES = 4096
+
+class Section:
+    """Search state of one selector group"""
+
+    def __init__(self, group: str, is_list: bool):
+        self.group = group
+        self.is_list = is_list
+        self.candidates: List[Tuple[str, Tuple[bytes, ...]]] = [
+            (selector, required_tokens(selector)) for selector in registry.candidates(group, None)
+        ]
+        self.complete = False
+
+def _whole_characters(data: bytes) -> bytes:
+    """data without a UTF-8 sequence cut off by the chunk boundary at its end"""
+    for back in range(1, min(4, len(data) + 1)):
+        byte = data[-back]
+        if byte < 0x80:
+            return data
+        if byte >= 0xC0:
+            # Lead byte: keep it only if its sequence is complete
+            length = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return data if back >= length else data[:-back]
+    return data
+
+class StreamingPage:
+    """Page chunks collected as they arrive, parsed once the needed sections may be in"""
+
+    def __init__(self, parser: Any, sections: Dict[str, bool] = SECTIONS):
+        """
+        Args:
+            parser: The lxml parser backend (used to parse the prefix and run selectors on it)
+            sections: Selector groups to wait for, mapped to whether they match lists
+        """
+        from lxml.cssselect import CSSSelector
+
+        self._css_selector = CSSSelector
+        self._parser = parser
+        self._body = bytearray()
+        self._next_parse = 0
+        self._tail = b""
+        self._seen: Dict[bytes, bool] = {}
+        self.sections = [Section(group, is_list) for group, is_list in sections.items()]
+        self.head = b""
+        # Everything received, once closed (the selector registry checks tokens against it)
+        self.received = b""
+        self.bytes_fed = 0
+        self.parse_seconds = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return all(section.complete for section in self.sections)
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Take the next chunk of the body
+
+        Returns:
+            True once every section has been located and closed
+        """
+        started = time.perf_counter()
+        self._body += chunk
+        self.bytes_fed += len(chunk)
+        if len(self.head) < 4096:
+            # Enough of the page start for the layout fingerprint (<html>, <body>)
+            self.head = bytes(self._body[:4096])
+        lowered = self._tail + chunk.lower()
+        self._tail = lowered[-_OVERLAP:]
+
+        pending = [section for section in self.sections if not section.complete]
+        if (pending and self.bytes_fed >= self._next_parse
+                and all(self._tokens_seen(section, lowered) for section in pending)):
+            self._next_parse = self.bytes_fed + max(_REPARSE_BYTES, self.bytes_fed // 2)
+            root = self._parser.parse(_whole_characters(bytes(self._body)))
+            last = root
+            while len(last):
+                last = last[-1]
+            open_path = {last, *last.iterancestors()}
+            for section in pending:
+                watched = self._locate(section, root)
+                if watched is not None and watched not in open_path:
+                    section.complete = True
+        self.parse_seconds += time.perf_counter() - started
+        return self.complete
+
+    def _tokens_seen(self, section: Section, lowered: bytes) -> bool:
+        """Whether some selector of the section has all its tokens in the bytes seen so far"""
+        for _, tokens in section.candidates:
+            for token in tokens:
+                if not self._seen.get(token):
+                    self._seen[token] = token in lowered
+            if all(self._seen[token] for token in tokens):
+                return True
+        return False
+
+    def _locate(self, section: Section, root: Any) -> Optional[Any]:
+        """The element whose closing completes the section, if the section is in the tree"""
+        for selector, tokens in section.candidates:
+            if not all(self._seen.get(token) for token in tokens):
+                continue
+            matches = self._parser.select(root, selector)
+            if not matches:
+                continue
+            first = matches[0]
+            if not section.is_list:
+                return first
+            # A list is complete when its container closes
+            parts = selector.split()
+            if len(parts) > 1:
+                context = set(self._css_selector(parts[0])(root))
+                return next((a for a in first.iterancestors() if a in context), first.getparent())
+            return first.getparent()
+        return None
+
+    def close(self) -> Any:
+        """Parse everything received and return the document root"""
+        started = time.perf_counter()
+        self.received = bytes(self._body)
+        root = self._parser.parse(_whole_characters(self.received))
+        self._body = bytearray()
+        self.parse_seconds += time.perf_counter() - started
+        return root
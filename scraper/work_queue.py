@@ -0,0 +1,597 @@
+"""
+Durable scrape queue shared by several scraper nodes (SQLite)
+
+API processes that point SCRAPER_QUEUE_PATH at the same database file
+work through one queue instead of each scraping everything. Tasks are keyed
+by (hotel id, check-in date): queueing a pair that is already waiting or
+being scraped is a no-op, and so is queueing one finished less than
+`fresh_for` seconds ago, so the watchlist schedulers of every node can feed
+the queue without duplicating scrapes.
+
+A node claims tasks under a lease of SCRAPER_QUEUE_LEASE_SECONDS and renews
+it with a heartbeat while it works. Once a lease runs out (its node crashed
+or lost the database) the task becomes visible again and another node picks
+it up, up to SCRAPER_QUEUE_MAX_ATTEMPTS tries. Every claim has a new lease
+id and finishing a task needs the current one, so a node that lost its
+lease cannot overwrite the outcome of the node that took over.
+
+Nodes claim SCRAPER_QUEUE_PREFETCH tasks per round trip. A node that finds
+nothing queued steals half of the claimed but not started tasks of the node
+holding the most, so prefetching never leaves work waiting behind a busy
+node while another one is idle.
+
+SQLite locking needs a local file system: the nodes must share a disk (one
+host, or containers with a shared volume), not a network mount.
+
+Task states:
+
+    queued    waiting; visible once not_before has passed
+    claimed   prefetched by a node, not started (can be stolen)
+    running   being scraped by its owner
+    done      finished; kept as the idempotency record
+    failed    gave up after max_attempts
+
+    python work_queue.py stats QUEUE_DB
+    python work_queue.py enqueue QUEUE_DB URL CHECKIN [CHECKIN ...]
+    python work_queue.py purge QUEUE_DB [--older-than SECONDS]
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+QUEUE_PATH = os.environ.get("SCRAPER_QUEUE_PATH", "")
+# Seconds a claim stays valid without a heartbeat
+QUEUE_LEASE_SECONDS = float(os.environ.get("SCRAPER_QUEUE_LEASE_SECONDS", "30"))
+QUEUE_MAX_ATTEMPTS = int(os.environ.get("SCRAPER_QUEUE_MAX_ATTEMPTS", "3"))
+# First retry delay after a failed scrape, doubled per attempt
+QUEUE_RETRY_DELAY = float(os.environ.get("SCRAPER_QUEUE_RETRY_DELAY", "60"))
+# Scrapes a node runs at once
+QUEUE_CONCURRENCY = int(os.environ.get("SCRAPER_QUEUE_CONCURRENCY", "8"))
+# Tasks claimed per round trip
+QUEUE_PREFETCH = int(os.environ.get("SCRAPER_QUEUE_PREFETCH", "16"))
+# Pause before asking again when the queue is empty
+QUEUE_POLL_SECONDS = float(os.environ.get("SCRAPER_QUEUE_POLL_SECONDS", "1"))
+# Seconds finished tasks are kept before purge() drops them
+QUEUE_RETENTION = float(os.environ.get("SCRAPER_QUEUE_RETENTION", "86400"))
+
+QUEUED = "queued"
+CLAIMED = "claimed"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, CLAIMED, RUNNING, DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    check_in TEXT NOT NULL,
+    state TEXT NOT NULL,
+    not_before REAL NOT NULL,
+    owner TEXT,
+    lease_id TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL,
+    finished_by TEXT,
+    error TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (state, not_before);
+CREATE INDEX IF NOT EXISTS tasks_by_owner ON tasks (owner) WHERE owner IS NOT NULL;
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+ENQUEUE = """
+INSERT INTO tasks (task_key, url, check_in, state, not_before, attempts, enqueued_at)
+VALUES (?, ?, ?, 'queued', ?, 0, ?)
+ON CONFLICT (task_key) DO UPDATE SET
+    url = excluded.url, state = 'queued', not_before = excluded.not_before, attempts = 0,
+    owner = NULL, lease_id = NULL, lease_until = NULL, enqueued_at = excluded.enqueued_at,
+    finished_at = NULL, finished_by = NULL, error = NULL
+WHERE tasks.state IN ('done', 'failed') AND tasks.finished_at <= ?
+"""
+
+# Expired leases: claimed tasks go back untouched, running ones count as a failed attempt
+RECLAIM = """
+UPDATE tasks SET
+    state = CASE WHEN state = 'running' AND attempts >= ? THEN 'failed' ELSE 'queued' END,
+    finished_at = CASE WHEN state = 'running' AND attempts >= ? THEN ? END,
+    error = CASE WHEN state = 'running' THEN 'lease expired' ELSE error END,
+    owner = NULL, lease_id = NULL, lease_until = NULL
+WHERE state IN ('claimed', 'running') AND lease_until < ?
+"""
+
+CLAIM = """
+UPDATE tasks SET state = 'claimed', owner = ?, lease_id = ?, lease_until = ?
+WHERE task_key IN (
+    SELECT task_key FROM tasks WHERE state = 'queued' AND not_before <= ?
+    ORDER BY not_before, check_in LIMIT ?
+)
+RETURNING task_key, url, check_in, attempts, not_before
+"""
+
+# Take the tasks the victim would start last
+STEAL = """
+UPDATE tasks SET owner = ?, lease_id = ?, lease_until = ?
+WHERE task_key IN (
+    SELECT task_key FROM tasks WHERE state = 'claimed' AND owner = ?
+    ORDER BY not_before DESC, check_in DESC LIMIT ?
+)
+RETURNING task_key, url, check_in, attempts, not_before
+"""
+
+BUMP = """
+INSERT INTO counters (name, value) VALUES (?, ?)
+ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+"""
+
+def task_key(hotel_id: str, checkin: str) -> str:
+    """Idempotency key of a scrape: the normalized hotel id and the check-in date"""
+    return f"{hotel_id}|{checkin}"
+
+@dataclass
+class Task:
+    """A claimed task; lease_id must be presented to start or finish it"""
+    key: str
+    url: str
+    checkin: str
+    lease_id: str
+    attempts: int
+
+class WorkQueue:
+    """Lease-based scrape queue in a SQLite database shared by several processes"""
+
+    def __init__(self, path: str, lease_seconds: float = QUEUE_LEASE_SECONDS,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS, retry_delay: float = QUEUE_RETRY_DELAY,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            lease_seconds: Seconds a claim stays valid without a heartbeat
+            max_attempts: Scrapes of a task before it is marked failed
+            retry_delay: First retry delay after a failure, doubled per attempt
+            clock: Wall-clock time source shared by all nodes (injectable for tests)
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._clock = clock
+        # The connection is shared by executor threads, one transaction at a time
+        self._lock = threading.Lock()
+        # Other nodes hold the write lock for one short transaction; wait for it
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A killed process loses nothing committed; a power cut may lose the last transactions
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, func: Callable[[sqlite3.Connection], object]):
+        """Run func(conn) in one write transaction, taking the write lock up front"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, items: Iterable[Tuple[str, str, str]], fresh_for: float = 0.0,
+                delay: float = 0.0) -> Dict[str, int]:
+        """
+        Queue scrapes unless the same (hotel, check-in) is pending or fresh
+
+        Args:
+            items: (hotel_id, url, checkin) triples
+            fresh_for: Skip pairs finished less than this many seconds ago
+            delay: Seconds until the new tasks become visible
+
+        Returns:
+            {"added": n, "duplicates": m}
+        """
+        now = self._clock()
+
+        def write(conn):
+            added = duplicates = 0
+            for hotel_id, url, checkin in items:
+                cursor = conn.execute(ENQUEUE, (task_key(hotel_id, checkin), url, checkin,
+                                                now + delay, now, now - fresh_for))
+                if cursor.rowcount:
+                    added += 1
+                else:
+                    duplicates += 1
+            conn.execute(BUMP, ("duplicates", duplicates))
+            return {"added": added, "duplicates": duplicates}
+
+        return self._transaction(write)
+
+    def acquire(self, node_id: str, limit: int) -> List[Task]:
+        """
+        Claim up to limit visible tasks for node_id, stealing if none are queued
+
+        Expired leases are released first. When nothing is queued, half of
+        the claimed but unstarted tasks of the node holding the most are
+        moved to node_id (at most limit).
+
+        Returns:
+            The claimed tasks, in the order they should be started
+        """
+        now = self._clock()
+        lease_id = uuid.uuid4().hex
+        lease_until = now + self.lease_seconds
+
+        def claim(conn):
+            reclaimed = conn.execute(RECLAIM, (self.max_attempts, self.max_attempts, now, now)).rowcount
+            if reclaimed:
+                conn.execute(BUMP, ("reclaimed", reclaimed))
+            rows = conn.execute(CLAIM, (node_id, lease_id, lease_until, now, limit)).fetchall()
+            if not rows:
+                victim = conn.execute(
+                    "SELECT owner, COUNT(*) FROM tasks WHERE state = 'claimed' AND owner != ? "
+                    "GROUP BY owner ORDER BY 2 DESC LIMIT 1", (node_id,)).fetchone()
+                if victim is not None and victim[1] > 1:
+                    take = min(limit, victim[1] // 2)
+                    rows = conn.execute(STEAL, (node_id, lease_id, lease_until, victim[0], take)).fetchall()
+                    conn.execute(BUMP, ("stolen", len(rows)))
+            return rows
+
+        rows = self._transaction(claim)
+        # RETURNING gives no order; start in the order the queue would have
+        rows.sort(key=lambda row: (row[4], row[2]))
+        return [Task(key, url, checkin, lease_id, attempts) for key, url, checkin, attempts, _ in rows]
+
+    def start(self, task: Task) -> bool:
+        """
+        Mark a claimed task running and count the attempt
+
+        Returns:
+            False if the lease was lost (stolen or expired); the task must not be scraped
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE tasks SET state = 'running', attempts = attempts + 1, lease_until = ? "
+                "WHERE task_key = ? AND lease_id = ? AND state = 'claimed' RETURNING attempts",
+                (self._clock() + self.lease_seconds, task.key, task.lease_id)).fetchone()
+        if row is None:
+            return False
+        task.attempts = row[0]
+        return True
+
+    def finish(self, task: Task, node_id: str, error: Optional[str] = None) -> bool:
+        """
+        Record the outcome of a running task
+
+        A failed task is queued again after retry_delay * 2 ** (attempts - 1)
+        until it has had max_attempts, then marked failed.
+
+        Returns:
+            False if the lease was lost; another node owns the task now
+        """
+        now = self._clock()
+        if error is None:
+            state, not_before, counter = DONE, None, "completed"
+        elif task.attempts < self.max_attempts:
+            state, not_before, counter = QUEUED, now + self.retry_delay * 2 ** (task.attempts - 1), "retried"
+        else:
+            state, not_before, counter = FAILED, None, "failed"
+        finished_at = None if state == QUEUED else now
+
+        def write(conn):
+            changed = conn.execute(
+                "UPDATE tasks SET state = ?, not_before = COALESCE(?, not_before), finished_at = ?, "
+                "finished_by = ?, error = ?, owner = NULL, lease_id = NULL, lease_until = NULL "
+                "WHERE task_key = ? AND lease_id = ? AND state = 'running'",
+                (state, not_before, finished_at, node_id if finished_at else None, error,
+                 task.key, task.lease_id)).rowcount
+            if changed:
+                conn.execute(BUMP, (counter, 1))
+            return bool(changed)
+
+        return self._transaction(write)
+
+    def heartbeat(self, node_id: str, held: Iterable[Tuple[str, str]] = ()) -> Set[Tuple[str, str]]:
+        """
+        Record that node_id is alive and renew the leases of the tasks it is working on
+
+        Only the given tasks are renewed; any other task of the node runs
+        out of lease and goes back to the queue.
+
+        Args:
+            held: (task key, lease id) of the tasks being scraped or waiting in the node's buffer
+
+        Returns:
+            The subset of held the node still owns
+        """
+        now = self._clock()
+        held = set(held)
+
+        def write(conn):
+            conn.execute(
+                "INSERT INTO nodes (node_id, host, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (node_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (node_id, socket.gethostname(), os.getpid(), now, now))
+            conn.executemany("UPDATE tasks SET lease_until = ? WHERE task_key = ? AND lease_id = ? AND owner = ? "
+                             "AND state IN ('claimed', 'running')",
+                             [(now + self.lease_seconds, key, lease_id, node_id) for key, lease_id in held])
+            return {(key, lease_id) for key, lease_id in conn.execute(
+                "SELECT task_key, lease_id FROM tasks WHERE owner = ? AND state IN ('claimed', 'running')",
+                (node_id,)) if (key, lease_id) in held}
+
+        return self._transaction(write)
+
+    def release(self, node_id: str) -> int:
+        """
+        Hand back every task of a node that is shutting down, without counting an attempt
+
+        Returns:
+            Tasks released
+        """
+        def write(conn):
+            released = conn.execute(
+                "UPDATE tasks SET state = 'queued', attempts = attempts - (state = 'running'), "
+                "owner = NULL, lease_id = NULL, lease_until = NULL "
+                "WHERE owner = ? AND state IN ('claimed', 'running')", (node_id,)).rowcount
+            conn.execute("DELETE FROM nodes WHERE node_id = ?", (node_id,))
+            return released
+
+        return self._transaction(write)
+
+    def purge(self, older_than: float = QUEUE_RETENTION) -> int:
+        """
+        Drop finished tasks and silent nodes older than older_than seconds
+
+        Returns:
+            Tasks removed
+        """
+        cutoff = self._clock() - older_than
+
+        def write(conn):
+            conn.execute("DELETE FROM nodes WHERE heartbeat_at < ?", (cutoff,))
+            return conn.execute("DELETE FROM tasks WHERE state IN ('done', 'failed') AND finished_at < ?",
+                                (cutoff,)).rowcount
+
+        return self._transaction(write)
+
+    def stats(self) -> dict:
+        """Tasks by state, visible backlog, live nodes and lifetime counters"""
+        now = self._clock()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+            visible, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(not_before) FROM tasks WHERE state = 'queued' AND not_before <= ?",
+                (now,)).fetchone()
+            held = self._conn.execute(
+                "SELECT owner, state, COUNT(*) FROM tasks WHERE owner IS NOT NULL GROUP BY owner, state").fetchall()
+            nodes = self._conn.execute("SELECT node_id, host, pid, heartbeat_at FROM nodes "
+                                       "WHERE heartbeat_at >= ? ORDER BY node_id",
+                                       (now - self.lease_seconds,)).fetchall()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        by_owner: Dict[str, Dict[str, int]] = {}
+        for owner, state, count in held:
+            by_owner.setdefault(owner, {})[state] = count
+        return {
+            "path": self.path,
+            "tasks": {state: counts.get(state, 0) for state in STATES},
+            "visible": visible,
+            "oldestVisibleSeconds": round(now - oldest, 3) if oldest is not None else None,
+            "nodes": [{"nodeId": node_id, "host": host, "pid": pid,
+                       "heartbeatAgeSeconds": round(now - heartbeat_at, 3),
+                       "claimed": by_owner.get(node_id, {}).get(CLAIMED, 0),
+                       "running": by_owner.get(node_id, {}).get(RUNNING, 0)}
+                      for node_id, host, pid, heartbeat_at in nodes],
+            "leaseSeconds": self.lease_seconds,
+            **{name: counters.get(name, 0)
+               for name in ("completed", "retried", "failed", "reclaimed", "stolen", "duplicates")},
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class QueueNode:
+    """Works through a WorkQueue on the running event loop: prefetch, heartbeat, scrape, finish"""
+
+    def __init__(self, queue: WorkQueue, run_task: Callable[[str, str], Awaitable[dict]],
+                 on_result: Optional[Callable[[str, str, dict], None]] = None,
+                 node_id: Optional[str] = None, concurrency: int = QUEUE_CONCURRENCY,
+                 prefetch: int = QUEUE_PREFETCH, poll_interval: float = QUEUE_POLL_SECONDS):
+        """
+        Args:
+            queue: Shared queue
+            run_task: Coroutine function scraping (url, checkin) into a result
+                dict; a result with an "error" counts as a failed attempt
+            on_result: Called with (url, checkin, result) after each successful scrape
+            node_id: Name of this node in the queue (default host:pid:random)
+            concurrency: Scrapes running at once
+            prefetch: Tasks claimed per round trip to the database
+            poll_interval: Pause before asking again when nothing is available
+        """
+        self.queue = queue
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.prefetch = max(prefetch, 1)
+        self.poll_interval = poll_interval
+        self._run_task = run_task
+        self._on_result = on_result
+        self._buffer: Deque[Task] = deque()
+        # Tasks workers have started, by key; only these and the buffer are heartbeated
+        self._active: Dict[str, Task] = {}
+        self._acquiring: Optional[asyncio.Lock] = None
+        self._tasks: List[asyncio.Task] = []
+        self._counters = {"completed": 0, "failed": 0, "lost": 0, "errors": 0}
+
+    async def _call(self, func, *args):
+        """Run a blocking queue call off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def start(self) -> None:
+        """Register the node and start its workers on the running loop (no-op if running)"""
+        if self._tasks:
+            return
+        self._acquiring = asyncio.Lock()
+        self._tasks = [asyncio.create_task(self._heartbeat())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Stop the workers and hand unfinished tasks back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._tasks:
+            self._tasks = []
+            self._buffer.clear()
+            self._active.clear()
+            await self._call(self.queue.release, self.node_id)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            held = [(task.key, task.lease_id) for task in self._active.values()]
+            if any(not worker.done() for worker in self._tasks[1:]):
+                held += [(task.key, task.lease_id) for task in self._buffer]
+            try:
+                held = await self._call(self.queue.heartbeat, self.node_id, held)
+            except sqlite3.Error as e:
+                # The leases run out if this keeps failing; other nodes take over
+                print(f"Queue heartbeat failed: {e}")
+            else:
+                # Prefetched tasks another node stole (or that expired) are no longer ours
+                kept = [task for task in self._buffer if (task.key, task.lease_id) in held]
+                self._counters["lost"] += len(self._buffer) - len(kept)
+                self._buffer = deque(kept)
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+
+    async def _next_task(self) -> Task:
+        async with self._acquiring:
+            while not self._buffer:
+                tasks = await self._call(self.queue.acquire, self.node_id, self.prefetch)
+                if tasks:
+                    self._buffer.extend(tasks)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+            return self._buffer.popleft()
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                await self._work_one()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Typically "database is locked"; a task left claimed or running
+                # is no longer heartbeated, so its lease runs out and it is retried
+                self._counters["errors"] += 1
+                print(f"Queue worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _work_one(self) -> None:
+        """Take the next task, scrape it and record the outcome"""
+        task = await self._next_task()
+        if not await self._call(self.queue.start, task):
+            self._counters["lost"] += 1
+            return
+        self._active[task.key] = task
+        try:
+            try:
+                result = await self._run_task(task.url, task.checkin)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result = {"error": str(e)}
+            error = result.get("error")
+            if error is None and self._on_result is not None:
+                try:
+                    self._on_result(task.url, task.checkin, result)
+                except Exception as e:
+                    print(f"Queue result callback failed for {task.key}: {e}")
+            if await self._call(self.queue.finish, task, self.node_id, error):
+                self._counters["failed" if error else "completed"] += 1
+            else:
+                self._counters["lost"] += 1
+        finally:
+            self._active.pop(task.key, None)
+
+    def stats(self) -> dict:
+        """This node's counters; lost counts tasks whose lease went to another node, errors queue failures"""
+        return {"nodeId": self.node_id, "running": bool(self._tasks), "concurrency": self.concurrency,
+                "prefetched": len(self._buffer), **self._counters}
+
+_queue: Optional[WorkQueue] = None
+_queue_lock = threading.Lock()
+
+def get_queue() -> Optional[WorkQueue]:
+    """Return the queue configured by SCRAPER_QUEUE_PATH, or None when it is off"""
+    global _queue
+    if not QUEUE_PATH:
+        return None
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WorkQueue(QUEUE_PATH)
+    return _queue
+
+def close_queue() -> None:
+    """Close the configured queue, if it was opened"""
+    global _queue
+    if _queue is not None:
+        _queue.close()
+        _queue = None
+
+def main(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared scrape queue tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = commands.add_parser("stats", help="Show tasks by state and live nodes")
+    stats_parser.add_argument("path")
+    enqueue_parser = commands.add_parser("enqueue", help="Queue a hotel for one or more check-in dates")
+    enqueue_parser.add_argument("path")
+    enqueue_parser.add_argument("url")
+    enqueue_parser.add_argument("checkin", nargs="+")
+    enqueue_parser.add_argument("--fresh-for", type=float, default=0.0,
+                                help="Skip dates finished less than this many seconds ago")
+    purge_parser = commands.add_parser("purge", help="Drop old finished tasks")
+    purge_parser.add_argument("path")
+    purge_parser.add_argument("--older-than", type=float, default=QUEUE_RETENTION)
+
+    args = parser.parse_args(argv)
+    queue = WorkQueue(args.path)
+    try:
+        if args.command == "stats":
+            print(json.dumps(queue.stats(), indent=2))
+        elif args.command == "enqueue":
+            from scrape import normalize_hotel_id
+
+            hotel_id = normalize_hotel_id(args.url)
+            print(json.dumps(queue.enqueue([(hotel_id, args.url, checkin) for checkin in args.checkin],
+                                           args.fresh_for)))
+        else:
+            print(f"Removed {queue.purge(args.older_than)} finished tasks", file=sys.stderr)
+    finally:
+        queue.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the price analytics rollups and endpoints
+"""
+
+import sys
+import os
+from array import array
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+
+from fastapi.testclient import TestClient
+
+import analytics
+import api
+import store
+from store import PriceStore
+
+def result(checkin, scraped_at, prices, currency="EUR"):
+    rooms = [
+        {"roomId": f"room_{i}", "name": f"Room {i}", "occupancy": 2, "price": price,
+         "refundable": False, "breakfastIncluded": False, "available": price > 0}
+        for i, price in enumerate(prices)
+    ]
+    return {"hotelId": "fr", "hotelName": "Hotel", "currency": currency, "scrapeDate": scraped_at,
+            "checkInDate": checkin, "rooms": rooms, "rating": {"overall": 8.0, "location": 0.0},
+            "amenities": []}
+
+# (hotel, check-in, scraped at, room prices); 0 is a sold-out room
+SCRAPES = [
+    ("fr/a", "2024-03-10", "2024-03-01T08:00:00", [120.0, 150.0]),
+    ("fr/a", "2024-03-10", "2024-03-02T08:00:00", [110.0, 0.0]),
+    ("fr/a", "2024-03-10", "2024-03-02T20:00:00", [100.0, 140.0]),
+    ("fr/a", "2024-03-10", "2024-03-04T08:00:00", [130.0, 160.0]),
+    ("fr/a", "2024-03-11", "2024-03-01T08:00:00", [90.0]),
+    ("fr/a", "2024-03-12", "2024-03-01T08:00:00", [0.0]),
+    ("fr/b", "2024-03-10", "2024-03-01T08:00:00", [95.0]),
+    ("fr/b", "2024-03-11", "2024-03-03T08:00:00", [99.0]),
+]
+
+def filled_store(path, order=SCRAPES, batch_size=3, delta=True):
+    db = PriceStore(path, batch_size=batch_size, delta=delta)
+    db.add_many((hotel, result(checkin, at, prices)) for hotel, checkin, at, prices in order)
+    return db
+
+def test_check_in_stats_from_rollups(tmp_path):
+    db = filled_store(str(tmp_path / "prices.db"))
+    stats = db.query(analytics.check_in_stats, "fr/a", None, None)
+    assert stats["checkInDates"] == ["2024-03-10", "2024-03-11"]
+    assert stats["min"] == [100.0, 90.0]
+    assert stats["max"] == [130.0, 90.0]
+    # Cheapest per scrape day: 120, 100 (two scrapes on the 2nd), 130
+    assert stats["medianDailyMin"] == [120.0, 90.0]
+    assert stats["current"] == [130.0, 90.0]
+    assert stats["change"] == [30.0, None]
+    assert stats["scrapes"] == [4, 1]
+    db.close()
+
+def test_rollups_ignore_order_duplicates_and_rebuilds(tmp_path):
+    # Delta mode skips scrapes older than the stored state, so write every row
+    expected = filled_store(str(tmp_path / "in-order.db"), delta=False)
+    shuffled = filled_store(str(tmp_path / "shuffled.db"), SCRAPES[::-1] + SCRAPES[:2], batch_size=2,
+                            delta=False)
+    queries = [(analytics.check_in_stats, "fr/a", None, None), (analytics.lead_time_curve, None, None),
+               (analytics.compare_hotels, ["fr/a", "fr/b"], None, "2024-03-11")]
+    for query in queries:
+        assert shuffled.query(*query) == expected.query(*query)
+
+    shuffled.query(analytics.rebuild_rollups)
+    for query in queries:
+        assert shuffled.query(*query) == expected.query(*query)
+    expected.close()
+    shuffled.close()
+
+def test_day_minima_keep_cents_and_float32_rollups_are_rebuilt(tmp_path):
+    path = str(tmp_path / "prices.db")
+    db = PriceStore(path)
+    db.add_many([("fr/a", result("2024-03-10", "2024-03-01T08:00:00", [1234567.89]))])
+    assert db.query(analytics.check_in_stats, "fr/a", None, None)["medianDailyMin"] == [1234567.89]
+    # Pack the day minima as float32, as rollups used to
+    db.query(lambda conn: conn.execute("UPDATE check_in_rollups SET day_mins = ?",
+                                       (array("f", [1234567.89]).tobytes(),)))
+    db.close()
+
+    db = PriceStore(path)
+    assert db.query(analytics.check_in_stats, "fr/a", None, None)["medianDailyMin"] == [1234567.89]
+    db.close()
+
+def test_lead_time_and_compare(tmp_path):
+    db = filled_store(str(tmp_path / "prices.db"))
+    curve = db.query(analytics.lead_time_curve, "fr/a", 8)
+    assert curve["leadDays"] == [6, 8]
+    assert curve["mean"] == [130.0, 105.0]
+    assert curve["scrapes"] == [1, 2]
+
+    compare = db.query(analytics.compare_hotels, ["fr/a", "fr/b", "fr/none"], None, None)
+    assert compare["checkInDates"] == ["2024-03-10", "2024-03-11"]
+    assert compare["prices"] == [[130.0, 95.0, None], [90.0, 99.0, None]]
+    assert compare["cheapest"] == [1, 0]
+    assert compare["currencies"] == ["EUR", "EUR", None]
+    db.close()
+
+def test_current_prices_keep_a_bounded_span(tmp_path):
+    db = filled_store(str(tmp_path / "prices.db"))
+    db.add_many([("fr/a", result("0001-01-01", "2024-03-01T08:00:00", [80.0])),
+                 ("fr/b", result("2030-01-01", "2024-03-01T08:00:00", [70.0]))])
+    db.add_many([("fr/b", result("9999-12-31", "2024-03-01T08:00:00", [60.0]))])
+    spans = dict(db.query(lambda conn: conn.execute(
+        "SELECT hotel_id, length(prices) / 8 FROM current_prices").fetchall()))
+    # 0001-01-01 and 2030-01-01 are too far before the latest date to keep
+    assert spans == {"fr/a": 2, "fr/b": 1}
+
+    compare = db.query(analytics.compare_hotels, ["fr/a", "fr/b"], None, None)
+    assert compare["checkInDates"] == ["9999-12-31"]
+    compare = db.query(analytics.compare_hotels, ["fr/a", "fr/b"], "2024-01-01", None)
+    assert compare["checkInDates"] == ["2024-03-10", "2024-03-11"]
+    db.close()
+
+def test_analytics_endpoints(tmp_path, monkeypatch):
+    client = TestClient(api.app)
+    assert client.get("/analytics/check-in", params={"hotel": "fr/a"}).status_code == 503
+
+    filled_store(str(tmp_path / "prices.db")).close()
+    monkeypatch.setattr(store, "STORE_PATH", str(tmp_path / "prices.db"))
+    try:
+        response = client.get("/analytics/check-in", params={"hotel": "fr/a", "start": "2024-03-11"})
+        assert response.json()["checkInDates"] == ["2024-03-11"]
+        response = client.get("/analytics/compare", params={"hotels": "fr/a,fr/b"})
+        assert response.json()["cheapest"] == [1, 0]
+        response = client.get("/analytics/lead-time")
+        assert response.json()["leadDays"][0] == 6
+    finally:
+        store.close_store()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the raw page archive and offline replay
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import archive as archive_module
+from archive import PageArchive, replay
+from pages import render_hotel_page
+from scrape import parse_hotel_page
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+def test_pages_are_deduplicated(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    page = render_hotel_page(rooms=3, seed=1).encode("utf-8")
+    other = render_hotel_page(rooms=4, seed=2).encode("utf-8")
+    first = archive.add(URL, "fr/grand-plaza", "2024-01-15", page)
+    second = archive.add(URL, "fr/grand-plaza", "2024-01-15", page)
+    archive.add(URL, "fr/grand-plaza", "2024-01-16", other)
+    archive.close()
+
+    assert (first["segment"], first["offset"]) == (second["segment"], second["offset"])
+    stats = archive.stats()
+    assert stats["records"] == 3
+    assert stats["uniquePages"] == 2
+    assert stats["storedBytes"] < stats["rawBytes"]
+    assert [r["checkInDate"] for r in archive.records(checkin_date="2024-01-16")] == ["2024-01-16"]
+    assert archive.read(second) == page
+
+def test_reopened_archive_keeps_deduplicating(tmp_path):
+    page = render_hotel_page(rooms=3).encode("utf-8")
+    archive = PageArchive(str(tmp_path))
+    archive.add(URL, "fr/grand-plaza", "2024-01-15", page)
+    archive.close()
+
+    reopened = PageArchive(str(tmp_path))
+    # The index files are only read once something is added
+    assert reopened._blobs is None
+    reopened.add(URL, "fr/grand-plaza", "2024-01-15", page)
+    reopened.close()
+    assert len(os.listdir(tmp_path / "segments")) == 1
+    stats = reopened.stats()
+    assert (stats["records"], stats["uniquePages"]) == (2, 1)
+
+def test_replay_matches_live_parse(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    pages = {}
+    for day in range(15, 19):
+        checkin = f"2024-01-{day}"
+        pages[checkin] = render_hotel_page(rooms=day - 12, seed=day).encode("utf-8")
+        archive.add(URL, "fr/grand-plaza", checkin, pages[checkin], fetched_at=f"{checkin}T08:00:00")
+    archive.close()
+
+    results = list(replay(str(tmp_path), workers=2))
+    assert [r["checkInDate"] for r in results] == list(pages)
+    for result in results:
+        expected = parse_hotel_page(pages[result["checkInDate"]], URL, result["checkInDate"])
+        assert result["scrapeDate"] == result["checkInDate"] + "T08:00:00"
+        assert result["rooms"] == expected["rooms"]
+        assert result["hotelName"] == expected["hotelName"]
+
+def test_replay_reads_ahead_a_bounded_window(tmp_path, monkeypatch):
+    archive = PageArchive(str(tmp_path))
+    page = render_hotel_page(rooms=2).encode("utf-8")
+    for day in range(1, 13):
+        archive.add(URL, "fr/grand-plaza", f"2024-02-{day:02d}", page)
+    archive.close()
+
+    read = []
+    iter_records = archive_module.iter_records
+
+    def counting_records(*args):
+        for record in iter_records(*args):
+            read.append(record)
+            yield record
+
+    monkeypatch.setattr(archive_module, "iter_records", counting_records)
+    results = replay(str(tmp_path), workers=1, chunksize=2)
+    assert next(results)["checkInDate"] == "2024-02-01"
+    # REPLAY_WINDOW chunks for the one worker, plus the chunk read when the window was full
+    assert len(read) == 2 * (archive_module.REPLAY_WINDOW + 1)
+    assert [r["checkInDate"] for r in results] == [f"2024-02-{day:02d}" for day in range(2, 13)]
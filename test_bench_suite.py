@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline extraction benchmark suite
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+from bench_suite import compare, run_backend
+from pages import render_hotel_page
+
+def test_run_backend_times_every_stage():
+    corpus = [("small", render_hotel_page(rooms=2).encode("utf-8")),
+              ("no-rooms", render_hotel_page(rooms=0).encode("utf-8"))]
+    result = run_backend("lxml", corpus, repeat=2)
+    assert list(result["pages"]) == ["small", "no-rooms"]
+    stages = result["pages"]["small"]["stagesMs"]
+    assert list(stages) == ["parse", "layout", "hotel_name", "currency", "rooms", "rating",
+                            "amenities", "serialize"]
+    assert result["pages"]["small"]["pagesPerSec"] > 0
+    assert result["peakRssKb"] > 0
+
+def test_compare_flags_regressions_beyond_threshold():
+    def run(pages_per_sec, parse_ms):
+        return {"backend": "lxml", "pages": {"large": {"pagesPerSec": pages_per_sec,
+                                                       "stagesMs": {"parse": parse_ms, "rooms": 1.0}}}}
+
+    baseline = run(100.0, 5.0)
+    assert compare(baseline, run(90.0, 5.5), threshold=0.15) == []
+    regressions = compare(baseline, run(80.0, 7.5), threshold=0.15)
+    assert len(regressions) == 1
+    assert "lxml/large" in regressions[0] and "parse" in regressions[0]
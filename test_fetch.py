@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive fetch layer against the throttling stand-in server
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import httpx
+
+from fetch import CLOSED, OPEN, CircuitOpenError, FetchLayer, parse_retry_after
+from standin import start_standin_server
+
+def fetch_all(layer, urls):
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await asyncio.gather(*(layer.get(client, url) for url in urls),
+                                        return_exceptions=True)
+    return asyncio.run(run())
+
+def test_parse_retry_after():
+    now = datetime(2024, 1, 15, 12, 0, tzinfo=timezone.utc)
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=30), usegmt=True), now) == 30.0
+    assert parse_retry_after(format_datetime(now - timedelta(seconds=30), usegmt=True), now) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+def test_limit_adapts_to_host_capacity():
+    server, base_url = start_standin_server(latency=0.02, rooms=1, capacity=4)
+    try:
+        layer = FetchLayer(initial_limit=16, backoff_base=0.01, backoff_max=0.05, max_retries=10,
+                           breaker_threshold=1000)
+        results = fetch_all(layer, [f"{base_url}/hotel/xx/hotel-{i}.html" for i in range(60)])
+    finally:
+        server.shutdown()
+
+    assert all(isinstance(r, httpx.Response) and r.status_code == 200 for r in results)
+    stats = layer.stats()[base_url.split("//")[1]]
+    assert server.counts["throttled"] > 0
+    assert stats["throttled"] == server.counts["throttled"]
+    assert stats["limit"] < 16
+    assert stats["inFlight"] == 0
+
+def test_retry_after_pauses_the_host():
+    server, base_url = start_standin_server(rooms=1, error_rate=1.0, retry_after="1")
+    try:
+        layer = FetchLayer(max_retries=1, backoff_base=0.01, breaker_threshold=1000)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                first = asyncio.create_task(layer.get(client, f"{base_url}/hotel/xx/a.html"))
+                await asyncio.sleep(0.2)
+                server.error_rate = 0.0
+                return await first
+        start = time.perf_counter()
+        response = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert response.status_code == 200
+    assert elapsed >= 1.0
+    assert server.counts == {"served": 1, "throttled": 0, "errors": 1}
+
+def test_breaker_opens_fails_fast_and_recovers():
+    server, base_url = start_standin_server(rooms=1, error_rate=1.0)
+    host = base_url.split("//")[1]
+    url = f"{base_url}/hotel/xx/a.html"
+    try:
+        layer = FetchLayer(max_retries=0, breaker_threshold=3, breaker_open_seconds=0.3)
+        results = fetch_all(layer, [url] * 3)
+        assert [r.status_code for r in results] == [503, 503, 503]
+        assert layer.host(host).breaker == OPEN
+
+        # Open: no request reaches the host
+        assert isinstance(fetch_all(layer, [url])[0], CircuitOpenError)
+        assert server.counts["errors"] == 3
+
+        # Half-open after the open period: one trial, which closes the breaker
+        time.sleep(0.35)
+        server.error_rate = 0.0
+        results = fetch_all(layer, [url, url])
+        assert sorted(type(r).__name__ for r in results) == ["CircuitOpenError", "Response"]
+        assert layer.host(host).breaker == CLOSED
+        assert fetch_all(layer, [url])[0].status_code == 200
+    finally:
+        server.shutdown()
+
+    stats = layer.stats()[host]
+    assert stats["breakerOpens"] == 1
+    assert stats["rejected"] >= 2
+
+def test_cancelled_trial_does_not_keep_the_breaker_half_open():
+    statuses = [503]
+
+    def handler(request):
+        return httpx.Response(statuses[-1], headers={"Retry-After": "1"})
+
+    layer = FetchLayer(max_retries=0, breaker_threshold=1, breaker_open_seconds=0.05)
+    url = "https://hotels.test/hotel/xx/a.html"
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            assert (await layer.get(client, url)).status_code == 503
+            assert layer.host("hotels.test").breaker == OPEN
+            await asyncio.sleep(0.1)
+            # The trial request waits out Retry-After and is cancelled before it is sent
+            try:
+                await asyncio.wait_for(layer.get(client, url), 0.05)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                raise AssertionError("the trial should still be waiting")
+            layer.host("hotels.test").blocked_until = 0.0
+            statuses.append(200)
+            return await layer.get(client, url)
+
+    assert asyncio.run(run()).status_code == 200
+    state = layer.host("hotels.test")
+    assert (state.breaker, state.in_flight) == (CLOSED, 0)
+
+def test_loops_on_other_threads_keep_their_own_slots():
+    layer = FetchLayer(initial_limit=4, max_limit=4, breaker_threshold=1000)
+    state = layer.host("hotels.test")
+    seen = []
+
+    async def handler(request):
+        seen.append(state.in_flight)
+        await asyncio.sleep(0.005)
+        return httpx.Response(200)
+
+    def scrape_many():
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                await asyncio.gather(*(layer.get(client, f"https://hotels.test/hotel/xx/{i}.html")
+                                       for i in range(20)))
+        asyncio.run(run())
+
+    # Like two sync scrape_booking calls, each with its own loop from asyncio.run
+    threads = [threading.Thread(target=scrape_many) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen) == 40 and min(seen) >= 1 and max(seen) <= 8
+    assert (state.in_flight, state.stats()["requests"]) == (0, 40)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the stand-in server and the load generator
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import httpx
+import pytest
+
+import api
+import search
+from loadgen import classify, error_kind, percentile, request_factory, run_load, summarize
+from parsers import get_parser
+from result_cache import ScrapeCache
+from standin import start_standin_server
+
+@pytest.fixture
+def standin():
+    server, base_url = start_standin_server(rooms=3)
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
+
+def test_standin_throttles_fails_and_serves_search_pages(standin, tmp_path):
+    server, base_url = standin
+    with httpx.Client(base_url=base_url) as client:
+        server.rate_limit = 3
+        statuses = [client.get(f"/hotel/xx/h{i}.html").status_code for i in range(6)]
+        assert statuses.count(429) >= 2 and statuses[0] == 200
+        server.rate_limit, server.error_rate = 0, 1.0
+        assert client.get("/hotel/xx/h.html").status_code == 503
+        server.error_rate = 0
+        assert client.get("/nothing").status_code == 404
+
+        page = client.get("/searchresults.html", params={"ss": "Lyon", "rows": 10, "offset": 90}).content
+        result = search.parse_search_page(page, base_url + "/searchresults.html?ss=Lyon&rows=10",
+                                          "2030-01-01", get_parser("lxml"))
+        assert (len(result["hotels"]), result["totalPages"]) == (10, 10)
+
+    (tmp_path / "saved.html").write_bytes(b"<html><h2 data-testid='title'>Saved</h2></html>")
+    saved, saved_url = start_standin_server(pages_dir=str(tmp_path))
+    try:
+        assert b"Saved" in httpx.get(saved_url + "/hotel/xx/any.html").content
+    finally:
+        saved.shutdown()
+        saved.server_close()
+
+def test_percentiles_and_error_keys():
+    values = [float(n) for n in range(1, 101)]
+    assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (50.0, 99.0, 100.0)
+    assert percentile([0.2], 95) == 0.2 and percentile([], 50) is None
+
+    assert error_kind("Client error '429 Too Many Requests' for url 'http://x'\nFor more") == "upstream_429"
+    assert error_kind("Circuit open for x, retry in 3.0s") == "circuit_open"
+    response = httpx.Response(500, json={"detail": "Server error '503 Service Unavailable' for url"})
+    assert classify(response) == "http_500: upstream_503"
+    assert classify(None, httpx.ReadTimeout("")) == "ReadTimeout"
+    assert classify(httpx.Response(200, json={"success": True})) == "ok"
+
+def test_run_load_against_api(standin, monkeypatch):
+    _, base_url = standin
+    monkeypatch.setattr(api, "BOOKING_BASE_URL", base_url)
+    monkeypatch.setattr(api, "scrape_cache", ScrapeCache())
+    make = request_factory("scrape", base_url, hotels=4, checkins=2)
+
+    def request(i):
+        # Every fifth request asks for a page the stand-in does not have
+        method, path, kwargs, size = make(i)
+        if i % 5 == 4:
+            kwargs["json"]["url"] = base_url + "/missing/page.html"
+        return method, path, kwargs, size
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await run_load(client, request, rps=50, duration=0.4)
+
+    stats = asyncio.run(run())
+    report = summarize(stats, 50)
+    assert (report["sent"], report["completed"], report["ok"]) == (20, 20, 16)
+    assert report["errors"] == {"scrape: upstream_404": 4}
+    assert report["latencyMs"]["p50"] <= report["latencyMs"]["p99"] <= report["latencyMs"]["max"]
+    # 4 hotels x 2 dates; after those every request comes from the cache
+    assert report["cache"]["HIT"] == 8
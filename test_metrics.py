@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for scrape stage metrics and the /metrics endpoint
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import metrics
+from metrics import Counter, Histogram
+from fastapi.testclient import TestClient
+from scrape import async_scrape_booking, new_async_client
+from standin import start_standin_server
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test", ["stage"], buckets=(0.1, 1.0))
+    metrics.METRICS.remove(histogram)
+    histogram.observe(0.05, "parse")
+    histogram.observe(0.5, "parse")
+    histogram.observe(5.0, "parse")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="parse",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="parse"} 3' in lines
+    assert 'test_seconds_sum{stage="parse"} 5.55' in lines
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_total", "Test", ["type"])
+    metrics.METRICS.remove(counter)
+    counter.inc('bad "value"', amount=2)
+    assert counter.render()[-1] == 'test_total{type="bad \\"value\\""} 2'
+
+def test_scrape_records_stages_bytes_and_errors():
+    metrics.reset()
+    server, base_url = start_standin_server(rooms=3)
+
+    async def run():
+        async with new_async_client() as client:
+            ok = await async_scrape_booking(f"{base_url}/hotel/fr/grand-plaza.html", "2024-01-15", client)
+            missing = await async_scrape_booking(f"{base_url}/nothing-here", "2024-01-15", client)
+            return ok, missing
+
+    try:
+        ok, missing = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert "error" not in ok and "error" in missing
+    for stage in ("connect", "download", "parse", "rooms", "serialize"):
+        assert metrics.STAGE_SECONDS.count(stage) >= 1, stage
+    assert metrics.PAGES.value() == 2
+    assert metrics.DOWNLOADED_BYTES.value() > 0
+    assert metrics.ERRORS.value("http_404") == 1
+    assert metrics.SELECTOR_LOOKUPS.value("price", "primary") == 3
+    assert metrics.SELECTOR_LOOKUPS.value("amenities", "primary") == 1
+    assert metrics.SELECTOR_LOOKUPS.value("rooms", "primary") == 1
+
+    import api
+    response = TestClient(api.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'scraper_stage_seconds_count{stage="parse"} 1' in response.text
+    assert 'scraper_errors_total{type="http_404"} 1' in response.text
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the parse worker process pool
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import pytest
+
+import metrics
+import parse_pool
+from metrics import SELECTOR_LOOKUPS, STAGE_SECONDS
+from pages import render_hotel_page
+from parse_pool import ParsePool
+from scrape import parse_hotel_page, parse_off_loop
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+def test_pool_parses_like_the_thread_path_and_merges_metrics():
+    page = render_hotel_page(rooms=4).encode("utf-8")
+    expected = parse_hotel_page(page, URL, "2024-01-15")
+    metrics.reset()
+
+    pool = ParsePool(workers=2)
+    pool.start()
+    parse_pool._pool = pool
+    saved_workers, parse_pool.PARSE_WORKERS = parse_pool.PARSE_WORKERS, 2
+    try:
+        async def run():
+            return await asyncio.gather(*(parse_off_loop(parse_hotel_page, page, URL, "2024-01-15")
+                                          for _ in range(6)))
+        results = asyncio.run(run())
+    finally:
+        parse_pool.PARSE_WORKERS = saved_workers
+        parse_pool.close_parse_pool()
+
+    for result in results:
+        assert {k: v for k, v in result.items() if k != "scrapeDate"} == \
+               {k: v for k, v in expected.items() if k != "scrapeDate"}
+    # Stage timings and selector lookups recorded in the workers reach this process
+    assert STAGE_SECONDS.count("rooms") == 6
+    assert SELECTOR_LOOKUPS.value("price", "primary") == 6 * 4
+    assert pool.stats()["completed"] == 6
+
+@pytest.mark.parametrize("per_worker", [True, False])
+def test_workers_are_recycled_after_max_tasks(per_worker, monkeypatch):
+    # Python < 3.11 replaces the whole pool instead of single workers
+    monkeypatch.setattr(parse_pool, "PER_WORKER_RECYCLING", per_worker and parse_pool.PER_WORKER_RECYCLING)
+    pool = ParsePool(workers=1, max_tasks=2)
+    pool.start()
+    try:
+        async def run():
+            return [await pool.run(os.getpid) for _ in range(6)]
+        pids = asyncio.run(run())
+    finally:
+        pool.close()
+    assert os.getpid() not in pids
+    assert len(set(pids)) >= 3
+    assert pool.stats()["recycled"] == (0 if parse_pool.PER_WORKER_RECYCLING else 3)
+
+def test_submissions_beyond_the_queue_wait():
+    pool = ParsePool(workers=1, queue_size=1)
+    pool.start()
+    try:
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*(pool.run(time.sleep, 0.1) for _ in range(5)))
+            return time.perf_counter() - start
+        elapsed = asyncio.run(run())
+    finally:
+        pool.close()
+    stats = pool.stats()
+    assert elapsed >= 0.5
+    assert stats["waited"] == 3
+    assert stats["inPool"] == 0 and stats["waiting"] == 0
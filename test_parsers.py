@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tests that every parser backend extracts identical hotel data
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import httpx
+import pytest
+
+import scrape
+from parsers import PARSERS, get_parser
+from selector_registry import registry, required_tokens
+from scrape import ROOM_FIELD_SELECTORS, parse_fields, parse_hotel_page
+from pages import render_hotel_page
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+# Markup that exercises fallback selectors and text-extraction edge cases
+LEGACY_PAGE = """<html><head><meta charset="utf-8"><script>var price = "$1";</script>
+<style>.price { color: red }</style></head><body>
+<h1 id="hp_hotel_name" class="hp__hotel-name">  H&ocirc;tel <!-- old --> du&nbsp;Parc </h1>
+<div class="review-score-badge">Scored 9.1</div>
+<ul class="facilities__list"><li class="facilities__item">Wi</li><li class="facilities__item"> Free <b>WiFi</b> </li>
+<li class="facilities__item"><script>x()</script>Pool</li></ul>
+<div class="room-item"><div class="room-title">Suite <em>Vue Mer</em></div><div class="price">€ 1,234.50</div>
+<div class="room-occupancy">Sleeps 3</div><p>Breakfast included &amp; Refundable</p></div>
+<div class="room-item"><div class="price"> </div></div>
+<span class="price-currency">EUR</span>
+</body></html>"""
+
+PAGES = [
+    render_hotel_page(rooms=5, amenities=10),
+    render_hotel_page(rooms=40, amenities=25, padding_kb=200, seed=7),
+    render_hotel_page(rooms=0, amenities=0),
+    LEGACY_PAGE,
+]
+
+def extract(page: str, backend: str) -> dict:
+    data = parse_hotel_page(page.encode("utf-8"), URL, "2024-01-15", get_parser(backend))
+    data.pop("scrapeDate")
+    return data
+
+@pytest.mark.parametrize("backend", [name for name in PARSERS if name != "soup"])
+@pytest.mark.parametrize("page", range(len(PAGES)))
+def test_backend_matches_soup(backend, page):
+    assert extract(PAGES[page], backend) == extract(PAGES[page], "soup")
+
+def test_legacy_page_fields():
+    data = extract(LEGACY_PAGE, "soup")
+    # Fragments are stripped and joined without a separator, as get_text(strip=True) does
+    assert data["hotelName"] == "Hôteldu\xa0Parc"
+    assert data["rating"]["overall"] == 9.1
+    assert data["amenities"] == ["FreeWiFi", "Pool"]
+    assert data["currency"] == "EUR"
+    first = data["rooms"][0]
+    assert (first["name"], first["price"], first["occupancy"]) == ("SuiteVue Mer", 1234.5, 3)
+    assert first["refundable"] and first["breakfastIncluded"]
+    assert data["rooms"][1]["available"] is False
+
+@pytest.mark.parametrize("backend", list(PARSERS))
+@pytest.mark.parametrize("fields", ["rooms,currency", "amenities", "hotelName,rating"])
+def test_projection_matches_full_result(backend, fields):
+    page = render_hotel_page(rooms=8, amenities=25, padding_kb=100).encode("utf-8")
+    parser = get_parser(backend)
+    full = parse_hotel_page(page, URL, "2024-01-15", parser)
+    projected = parse_hotel_page(page, URL, "2024-01-15", parser, parse_fields(fields))
+    expected = {key: full[key] for key in ("hotelId", "checkInDate", *fields.split(","))}
+    projected.pop("scrapeDate")
+    assert projected == expected
+
+def test_projection_fields_and_limits():
+    assert parse_fields(None) is None and parse_fields("") is None
+    assert parse_fields("hotelName,currency,rooms,rating,amenities") is None
+    assert parse_fields(" rooms, currency") == {"rooms", "currency"}
+    with pytest.raises(ValueError):
+        parse_fields("rooms,price")
+    page = render_hotel_page(rooms=8, amenities=25).encode("utf-8")
+    data = parse_hotel_page(page, URL, "2024-01-15", max_rooms=7, max_amenities=20)
+    assert (len(data["rooms"]), len(data["amenities"])) == (7, 20)
+    data = parse_hotel_page(page, URL, "2024-01-15")
+    assert (len(data["rooms"]), len(data["amenities"])) == (5, 10)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_parser("regex")
+
+def test_required_tokens():
+    assert required_tokens('tr[data-block-id^="hotel_room"]') == (b"data-block-id", b"hotel_room", b"<tr")
+    assert required_tokens('.hotel-facilities-group .bui-list__description') == (
+        b"hotel-facilities-group", b"bui-list__description")
+    assert required_tokens('#hp_hotel_name') == (b"hp_hotel_name",)
+
+def test_adaptive_selectors_skip_and_learn():
+    expected = extract(LEGACY_PAGE, "soup")
+    registry.reset()
+    page = LEGACY_PAGE.encode("utf-8")
+    parser = get_parser("soup")
+    for _ in range(3):
+        adaptive = parse_hotel_page(page, URL, "2024-01-15", parser)
+    adaptive.pop("scrapeDate")
+    assert adaptive == expected
+
+    stats = registry.stats()
+    (layout, name_stats), = stats["hotel_name"].items()
+    assert name_stats["hits"] == 3
+    assert name_stats["winners"] == {"#hp_hotel_name": 3}
+    # Only the first lookup tries h2[data-testid="title"] before the winner
+    assert name_stats["queries"] == 4
+    assert registry.candidates("hotel_name", registry.layout(page))[0] == "#hp_hotel_name"
+
+def test_adaptive_selectors_precheck_missing_group():
+    registry.reset()
+    page = b'<html><body><h2 data-testid="title">Bare</h2></body></html>'
+    parser = get_parser("soup")
+    for _ in range(3):
+        parse_hotel_page(page, URL, "2024-01-15", parser)
+
+    (layout, currency_stats), = registry.stats()["currency"].items()
+    assert currency_stats["misses"] == 3
+    # Once the group is known to miss, selectors whose tokens are absent are not queried
+    assert currency_stats["queries"] == 2
+    assert currency_stats["skipped"] == 4
+
+ROW_PAGE = b"""<html><body><table>
+<tr class="row"><td><span class="price old">$300</span><span class="price">$250</span>
+<a class="room-title"><b class="room-name">Inner</b></a><span class="prco-valign-middle-helper x">$240</span>
+<div class="room-occupancy">4</div><div class="occupancy-info">2</div></td></tr>
+<tr class="row"><td><div class="room-price"><span class="price">99</span></div><p class="roomname">x</p></td></tr>
+</table></body></html>"""
+
+@pytest.mark.parametrize("backend", list(PARSERS))
+def test_first_matches_equals_select_one(backend):
+    parser = get_parser(backend)
+    root = parser.parse(ROW_PAGE)
+    selectors = ROOM_FIELD_SELECTORS + ('td > span.price',)
+    for row in parser.select(root, "tr.row"):
+        expected = {s: parser.select_one(row, s) for s in selectors}
+        expected = {s: elem for s, elem in expected.items() if elem is not None}
+        matches = parser.first_matches(row, selectors)
+        assert matches.keys() == expected.keys()
+        assert all(parser.text(matches[s]) == parser.text(expected[s]) for s in expected)
+
+def test_scrape_booking_fetches_and_parses(monkeypatch):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        if "missing" in request.url.path:
+            return httpx.Response(404)
+        return httpx.Response(200, content=render_hotel_page(rooms=3).encode("utf-8"))
+
+    monkeypatch.setattr(scrape, "new_async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    result = scrape.scrape_booking("https://www.booking.com/hotel/fr/grand-plaza.html", "2024-01-15")
+    assert requested == ["https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"]
+    assert result["checkInDate"] == "2024-01-15" and len(result["rooms"]) == 3 and "error" not in result
+    assert set(scrape.scrape_booking(URL, "2024-01-15", "currency")) >= {"currency", "hotelId"}
+    assert "404" in scrape.scrape_booking("https://www.booking.com/hotel/fr/missing.html", "2024-01-15")["error"]
+
+    # Called from a coroutine, the scrape runs on its own loop in a worker thread
+    async def from_a_coroutine():
+        return scrape.scrape_booking(URL, "2024-01-15")
+
+    assert len(asyncio.run(from_a_coroutine())["rooms"]) == 3
+
+def test_range_takes_details_from_another_date_when_the_claimed_page_fails(monkeypatch):
+    async def handler(request):
+        # The first date's page arrives first and claims the hotel details
+        if "2024-01-16" in str(request.url):
+            await asyncio.sleep(0.05)
+        return httpx.Response(200, content=render_hotel_page(rooms=3).encode("utf-8"))
+
+    parse_range_page = scrape.parse_range_page
+    failures = []
+
+    def failing_details(content, url, with_details):
+        if with_details and not failures:
+            # Fail only once the other date has been parsed without details
+            time.sleep(0.2)
+            failures.append(url)
+            raise ValueError("parse failed")
+        return parse_range_page(content, url, with_details)
+
+    async def scrape_range():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await scrape.async_scrape_booking_range(URL, "2024-01-15", "2024-01-16", client=client)
+
+    monkeypatch.setattr(scrape, "parse_range_page", failing_details)
+    result = asyncio.run(scrape_range())
+    assert failures == ["https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"]
+    assert result["hotelName"] != "Unknown Hotel" and result["amenities"]
+    assert result["errors"] == {"2024-01-15": "parse failed"}
+    assert all(price is not None for price in result["prices"][1])
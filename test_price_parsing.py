@@ -1,51 +1,98 @@
 #!/usr/bin/env python3
 """
-Test script to verify price parsing works correctly
+Correctness tests for price normalization (run directly for a throughput report)
 """
 
 import sys
 import os
+import random
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
 
+import pytest
+
+from prices import Price, normalize_price, normalize_prices
 from scrape import extract_price
 
-def test_price_parsing():
-    """Test various price formats"""
-    test_cases = [
-        ("7.97.9", 7.97),  # The problematic case
-        ("$123.45", 123.45),
-        ("€99.99", 99.99),
-        ("£150", 150.0),
-        ("1,234.56", 1234.56),
-        ("Invalid", 0.0),
-        ("", 0.0),
-        ("123", 123.0),
-        ("45.67.89", 45.67),  # Multiple dots
-        ("12.34.56.78", 12.34),  # Many dots
+@pytest.mark.parametrize("text, expected", [
+    ("7.97.9", 7.97),  # The problematic case
+    ("$123.45", 123.45),
+    ("€99.99", 99.99),
+    ("£150", 150.0),
+    ("1,234.56", 1234.56),
+    ("Invalid", 0.0),
+    ("", 0.0),
+    ("123", 123.0),
+    ("45.67.89", 45.67),  # Multiple dots
+    ("12.34.56.78", 12.34),  # Many dots
+])
+def test_extract_price(text, expected):
+    assert extract_price(text) == pytest.approx(expected)
+
+@pytest.mark.parametrize("text, expected", [
+    ("€ 1.234,56", Price(1234.56, "EUR")),
+    ("1.234,56 €", Price(1234.56, "EUR")),
+    ("US$1,234.56", Price(1234.56, "USD")),
+    ("1 234,56 zł", Price(1234.56, "PLN")),
+    ("1 234,56 €", Price(1234.56, "EUR")),
+    ("1 234 Kč", Price(1234.0, "CZK")),
+    ("CHF 1'234.50", Price(1234.5, "CHF")),
+    ("₹1,23,456", Price(123456.0, "INR")),
+    ("R$ 99,90", Price(99.9, "BRL")),
+    ("EUR 1.234.567", Price(1234567.0, "EUR")),
+    ("120 SEK", Price(120.0, "SEK")),
+    ("¥15,000", Price(15000.0, "JPY")),
+    ("1,5", Price(1.5, None)),
+    ("120.", Price(120.0, None)),
+    ("BED 120", Price(120.0, None)),  # Three capitals that are no currency code
+])
+def test_normalize_price(text, expected):
+    assert normalize_price(text) == expected
+
+@pytest.mark.parametrize("locale, expected", [
+    (None, 1234.0),
+    ("de-DE", 1234.0),
+    ("en_GB", 1.234),
+    ("de-CH", 1.234),
+])
+def test_locale_settles_a_single_separator(locale, expected):
+    assert normalize_price("1.234", locale).amount == pytest.approx(expected)
+
+def test_batch_matches_single_and_is_array_backed():
+    texts = ["€ 12,50", "$ 5", "€ 12,50", "n/a", "1.234,00 €"]
+    batch = normalize_prices(texts)
+    assert len(batch) == len(texts)
+    assert list(batch) == [normalize_price(text) for text in texts]
+    assert batch.amounts.typecode == "d"
+    assert batch.currencies == [None, "EUR", "USD"]
+    assert list(batch.currency_ids) == [1, 2, 1, 0, 1]
+
+def price_strings(count, distinct, seed=0):
+    rng = random.Random(seed)
+    formats = [
+        lambda a: f"€ {a:,.2f}".replace(",", " ").replace(".", ","),
+        lambda a: f"US${a:,.2f}",
+        lambda a: f"{a:,.2f} zł".replace(",", "X").replace(".", ",").replace("X", "."),
+        lambda a: f"CHF {a:,.0f}".replace(",", "'"),
     ]
-    
-    print("🧪 Testing price parsing...")
-    print("=" * 40)
-    
-    all_passed = True
-    for input_price, expected in test_cases:
-        try:
-            result = extract_price(input_price)
-            status = "✅" if abs(result - expected) < 0.01 else "❌"
-            print(f"{status} '{input_price}' -> {result} (expected: {expected})")
-            if abs(result - expected) >= 0.01:
-                all_passed = False
-        except Exception as e:
-            print(f"❌ '{input_price}' -> ERROR: {e}")
-            all_passed = False
-    
-    print("=" * 40)
-    if all_passed:
-        print("🎉 All price parsing tests passed!")
-    else:
-        print("⚠️  Some price parsing tests failed!")
-    
-    return all_passed
+    pool = [rng.choice(formats)(rng.uniform(10, 50000)) for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+def throughput(texts):
+    normalize_price.cache_clear()
+    start = time.perf_counter()
+    batch = normalize_prices(texts)
+    return len(texts) / (time.perf_counter() - start), batch
+
+def test_generated_batches_match_single_prices():
+    # The strings the throughput report uses (run this file directly for it)
+    for texts in (price_strings(2000, 2000), price_strings(20000, 200)):
+        normalize_price.cache_clear()
+        batch = normalize_prices(texts)
+        assert len(batch) == len(texts)
+        assert list(batch) == [normalize_price(text) for text in texts]
 
 if __name__ == "__main__":
-    test_price_parsing() 
\ No newline at end of file
+    for name, texts in [("distinct", price_strings(100000, 100000)), ("repeated", price_strings(1000000, 5000))]:
+        rate, _ = throughput(texts)
+        print(f"{name:>9}: {rate:,.0f} prices/s")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for on-demand and sampled scrape profiling
+"""
+
+import sys
+import os
+import re
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import profiling
+import scrape
+from standin import start_standin_server
+
+HOTEL_URL = "https://www.booking.com/hotel/fr/grand-plaza.html"
+TOKEN = "s3cret"
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    server, base_url = start_standin_server(latency=0.05)
+
+    def standin_scrape(url, checkin):
+        return scrape.async_scrape_booking(url.replace("https://www.booking.com", base_url), checkin)
+
+    monkeypatch.setattr(api, "async_scrape_booking", standin_scrape)
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_INTERVAL", 0.001)
+    api.scrape_cache.clear()
+    yield TestClient(api.app)
+    server.shutdown()
+
+def test_profiling_requires_admin_token(client):
+    response = client.post("/scrape?profile=true", json={"url": HOTEL_URL, "checkin": "2024-01-15"},
+                           headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+def test_requested_profile_is_saved_with_page_details(client):
+    response = client.post("/scrape?profile=true", json={"url": HOTEL_URL, "checkin": "2024-01-15"},
+                           headers={"X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    assert response.headers["X-Cache"] == "BYPASS"
+    profile_id = response.headers["X-Profile-Id"]
+
+    summary = client.get(f"/profiles/{profile_id}?format=json", headers={"X-Admin-Token": TOKEN}).json()
+    assert summary["pageBytes"] > 0
+    assert summary["samples"] > 0
+    assert {"group": "hotel_name", "selector": 'h2[data-testid="title"]', "tried": 1} in summary["selectorPath"]
+
+    folded = client.get(f"/profiles/{profile_id}", headers={"X-Admin-Token": TOKEN}).text
+    assert all(re.match(r'^\S.*;.* \d+$', line) for line in folded.splitlines())
+
+    assert client.get(f"/profiles/{profile_id}").status_code == 403
+    assert client.get("/profiles/..%2Fapi", headers={"X-Admin-Token": TOKEN}).status_code == 404
+
+def test_sampled_profiles_are_saved_in_background(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    response = client.get("/scrape", params={"url": HOTEL_URL, "checkin": "2024-01-16"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    saved = sorted(os.listdir(tmp_path))
+    assert len(saved) == 2 and saved[0].endswith(".folded") and saved[1].endswith(".json")
+
+def test_disabled_profiling_leaves_functions_unwrapped(monkeypatch):
+    monkeypatch.setattr(profiling, "ENABLED", False)
+    assert profiling.profiled(scrape.parse_hotel_page) is scrape.parse_hotel_page
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the scrape result cache (TTL, LRU eviction, request coalescing)
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+
+from result_cache import COALESCED, HIT, MISS, ScrapeCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = ScrapeCache(ttl=60, max_bytes=10_000, clock=clock)
+    cache.put("a", {"hotelId": "a"})
+    clock.now += 59
+    assert cache.get("a") == {"hotelId": "a"}
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["bytes"] == 0
+
+def test_lru_eviction_by_size():
+    cache = ScrapeCache(ttl=60, max_bytes=100)
+    entry = {"pad": "x" * 30}  # 40 bytes of JSON
+    cache.put("a", entry)
+    cache.put("b", entry)
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", entry)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 100
+
+def test_coalescing_and_errors_not_cached():
+    cache = ScrapeCache(ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"hotelId": "a"}
+
+    async def failing_fetch():
+        return {"error": "503 Service Unavailable"}
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_fetch("a", fetch) for _ in range(5)))
+        statuses = sorted(status for _, status in results)
+        assert statuses == [COALESCED] * 4 + [MISS]
+        assert (await cache.get_or_fetch("a", fetch))[1] == HIT
+
+        await cache.get_or_fetch("b", failing_fetch)
+        assert (await cache.get_or_fetch("b", failing_fetch))[1] == MISS
+
+    asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.stats()["inFlight"] == 0
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Tests for the scraper API endpoints (no network access)
+"""
+
+import sys
+import os
+import json
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import httpx
+from fastapi.testclient import TestClient
+
+import api
+import scrape
+from pages import render_hotel_page
+
+HOTEL_URL = "https://www.booking.com/hotel/fr/grand-plaza.html"
+
+async def fake_scrape(url, checkin):
+    """Stand-in for async_scrape_booking: fails for 'broken' hotels, slow for 'slow' ones"""
+    if "slow" in url:
+        await asyncio.sleep(0.2)
+    if "broken" in url:
+        return {"error": "404 Not Found"}
+    return {"hotelId": url.rsplit("/", 1)[-1], "checkInDate": checkin, "rooms": []}
+
+def make_client(monkeypatch):
+    monkeypatch.setattr(api, "async_scrape_booking", fake_scrape)
+    api.scrape_cache.clear()
+    return TestClient(api.app)
+
+def test_scrape_post(monkeypatch):
+    client = make_client(monkeypatch)
+    response = client.post("/scrape", json={"url": HOTEL_URL, "checkin": "2024-01-15"})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    assert response.json()["data"]["checkInDate"] == "2024-01-15"
+
+def mock_booking(monkeypatch):
+    """Serve generated hotel pages (404 for 'missing' hotels) to the scraper's HTTP client"""
+    def handler(request):
+        if "missing" in request.url.path:
+            return httpx.Response(404)
+        return httpx.Response(200, content=render_hotel_page(rooms=3, amenities=4).encode("utf-8"))
+
+    monkeypatch.setattr(scrape, "new_async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(scrape, "_async_client", None)
+
+def test_async_scrape_booking_result_and_error(monkeypatch):
+    mock_booking(monkeypatch)
+
+    async def scrape_both():
+        async with scrape.new_async_client() as client:
+            found = await scrape.async_scrape_booking(HOTEL_URL, "2024-01-15", client)
+            missing = await scrape.async_scrape_booking(HOTEL_URL.replace("grand-plaza", "missing"),
+                                                        "2024-01-15", client)
+            return found, missing
+
+    found, missing = asyncio.run(scrape_both())
+    assert set(found) == {"hotelId", "hotelName", "currency", "scrapeDate", "checkInDate", "rooms", "rating",
+                          "amenities"}
+    assert found["checkInDate"] == "2024-01-15" and len(found["amenities"]) == 4
+    assert len(found["rooms"]) == 3
+    assert set(found["rooms"][0]) == {"roomId", "name", "occupancy", "price", "refundable",
+                                      "breakfastIncluded", "available"}
+    assert "404" in missing["error"] and missing["checkInDate"] == "2024-01-15"
+
+def test_scrape_endpoint_through_the_scraper(monkeypatch):
+    mock_booking(monkeypatch)
+    api.scrape_cache.clear()
+    client = TestClient(api.app)
+    response = client.post("/scrape", json={"url": HOTEL_URL, "checkin": "2024-01-15"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True and body["error"] is None
+    assert body["data"]["checkInDate"] == "2024-01-15" and len(body["data"]["rooms"]) == 3
+
+    response = client.post("/scrape", json={"url": HOTEL_URL.replace("grand-plaza", "missing"),
+                                            "checkin": "2024-01-15"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is False and body["data"] is None and "404" in body["error"]
+
+def test_scrape_rejects_foreign_url(monkeypatch):
+    client = make_client(monkeypatch)
+    response = client.post("/scrape", json={"url": "https://example.com/hotel/x", "checkin": "2024-01-15"})
+    assert response.status_code == 400
+
+def test_scrape_rejects_impossible_dates(monkeypatch):
+    client = make_client(monkeypatch)
+    response = client.post("/scrape", json={"url": HOTEL_URL, "checkin": "2026-13-45"})
+    assert response.status_code == 400
+    assert "not a valid date" in response.json()["detail"]
+    response = client.post("/scrape/range", json={"url": HOTEL_URL, "start": "2024-02-30", "end": "2024-03-02"})
+    assert response.status_code == 400
+
+def test_batch_streams_ndjson_with_inline_errors(monkeypatch):
+    client = make_client(monkeypatch)
+    items = [
+        {"url": HOTEL_URL.replace("grand-plaza", "slow-hotel"), "checkin": "2024-01-15"},
+        {"url": HOTEL_URL, "checkin": "2024-01-15"},
+        {"url": HOTEL_URL.replace("grand-plaza", "broken"), "checkin": "2024-01-15"},
+        {"url": HOTEL_URL, "checkin": "15/01/2024"},
+    ]
+    response = client.post("/scrape/batch", json={"items": items, "concurrency": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[1]["success"] is True
+    assert by_index[2] == {**by_index[2], "success": False, "error": "404 Not Found"}
+    assert by_index[3]["success"] is False
+    assert "YYYY-MM-DD" in by_index[3]["error"]
+    # The slow item finishes last even though it was submitted first
+    assert lines[-1]["index"] == 0
+
+def test_batch_columnar_rooms(monkeypatch):
+    async def scrape_with_rooms(url, checkin):
+        rooms = [{"roomId": f"r{i}", "name": f"Room {i}", "occupancy": 2, "price": 100.0 + i,
+                  "refundable": True, "breakfastIncluded": False, "available": True} for i in range(3)]
+        return {"hotelId": "grand-plaza", "checkInDate": checkin, "rooms": rooms}
+
+    client = make_client(monkeypatch)
+    monkeypatch.setattr(api, "async_scrape_booking", scrape_with_rooms)
+    items = [{"url": HOTEL_URL, "checkin": "2024-01-15"}]
+    response = client.post("/scrape/batch", json={"items": items, "columnar": True})
+    line = json.loads(response.text)
+    assert list(line) == ["success", "data", "error", "index", "url", "checkin"]
+    rooms = line["data"]["rooms"]
+    assert rooms["roomId"] == ["r0", "r1", "r2"]
+    assert rooms["price"] == [100.0, 101.0, 102.0]
+    assert rooms["available"] == [True, True, True]
+
+def test_batch_rejects_bad_concurrency(monkeypatch):
+    client = make_client(monkeypatch)
+    response = client.post("/scrape/batch", json={"items": [], "concurrency": 10_000})
+    assert response.status_code == 400
+
+def test_range_rejects_inverted_window(monkeypatch):
+    client = make_client(monkeypatch)
+    response = client.post("/scrape/range", json={"url": HOTEL_URL, "start": "2024-02-01", "end": "2024-01-01"})
+    assert response.status_code == 400
+    assert "end date" in response.json()["detail"]
+
+def test_scrape_cache_header(monkeypatch):
+    client = make_client(monkeypatch)
+    body = {"url": HOTEL_URL, "checkin": "2024-03-01"}
+    assert client.post("/scrape", json=body).headers["X-Cache"] == "MISS"
+    # Same hotel through a different URL spelling is served from the cache
+    body["url"] = HOTEL_URL.replace(".html", ".en-gb.html?aid=1")
+    assert client.post("/scrape", json=body).headers["X-Cache"] == "HIT"
+    assert client.get("/scrape", params=body).headers["X-Cache"] == "HIT"
+    assert client.get("/stats/cache").json()["hits"] == 2
+
+def test_scrape_delta_returns_changed_rooms(monkeypatch):
+    client = make_client(monkeypatch)
+    monkeypatch.setattr(api, "delta_tracker", api.DeltaTracker())
+    prices = [100.0, 120.0]
+
+    async def priced_scrape(url, checkin):
+        rooms = [{"roomId": f"fr_room_{i}", "name": f"Room {i}", "occupancy": 2, "price": price,
+                  "available": True, "refundable": False, "breakfastIncluded": False}
+                 for i, price in enumerate(prices)]
+        return {"hotelId": "fr", "checkInDate": checkin, "currency": "EUR", "rooms": rooms}
+
+    monkeypatch.setattr(api, "async_scrape_booking", priced_scrape)
+    body = {"url": HOTEL_URL, "checkin": "2024-01-15", "delta": True}
+    assert len(client.post("/scrape", json=body).json()["data"]["rooms"]) == 2
+    assert client.post("/scrape", json=body).json()["data"]["noChange"] is True
+
+    api.scrape_cache.clear()
+    prices[:] = [90.0]
+    data = client.get("/scrape", params=body).json()
+    assert [room["price"] for room in data["rooms"]] == [90.0]
+    assert data["removedRooms"] == ["fr_room_1"]
+    # Without delta the full result comes back and the delta state is untouched
+    assert len(client.post("/scrape", json={**body, "delta": False}).json()["data"]["rooms"]) == 1
+    assert client.get("/stats/delta").json()["results"] == 3
+
+def test_delta_consumers_keep_their_own_baselines(monkeypatch):
+    client = make_client(monkeypatch)
+    monkeypatch.setattr(api, "delta_tracker", api.DeltaTracker())
+    prices = [100.0, 120.0]
+
+    async def priced_scrape(url, checkin):
+        rooms = [{"roomId": f"fr_room_{i}", "name": f"Room {i}", "occupancy": 2, "price": price,
+                  "available": True, "refundable": False, "breakfastIncluded": False}
+                 for i, price in enumerate(prices)]
+        return {"hotelId": "fr", "checkInDate": checkin, "currency": "EUR", "rooms": rooms}
+
+    monkeypatch.setattr(api, "async_scrape_booking", priced_scrape)
+    first = {"url": HOTEL_URL, "checkin": "2024-01-15", "delta": True, "deltaConsumer": "first"}
+    second = {**first, "deltaConsumer": "second"}
+    assert len(client.post("/scrape", json=first).json()["data"]["rooms"]) == 2
+    assert len(client.post("/scrape", json=second).json()["data"]["rooms"]) == 2
+
+    # A price change is reported to each consumer once, whoever polls first
+    api.scrape_cache.clear()
+    prices[0] = 95.0
+    assert [room["price"] for room in client.post("/scrape", json=first).json()["data"]["rooms"]] == [95.0]
+    assert client.post("/scrape", json=first).json()["data"]["noChange"] is True
+    data = client.get("/scrape", params={**second, "delta_consumer": "second"}).json()
+    assert [room["price"] for room in data["rooms"]] == [95.0]
+    assert client.post("/scrape", json=second).json()["data"]["noChange"] is True
+    assert client.get("/stats/delta").json()["keys"] == 2
+
+    response = client.post("/scrape", json={**first, "deltaConsumer": "x" * 200})
+    assert response.status_code == 400
+
+def test_scrape_fields_projection(monkeypatch):
+    client = make_client(monkeypatch)
+    calls = []
+
+    async def projected_scrape(url, checkin, fields=None, max_rooms=None, max_amenities=None):
+        calls.append((fields, max_rooms, max_amenities))
+        return {"hotelId": "fr", "checkInDate": checkin, "rooms": []}
+
+    monkeypatch.setattr(api, "async_scrape_booking", projected_scrape)
+    body = {"url": HOTEL_URL, "checkin": "2024-01-15"}
+    assert client.post("/scrape", json=body).headers["X-Cache"] == "MISS"
+    # A projection is cached apart from the full result
+    response = client.post("/scrape", json={**body, "fields": "rooms,currency", "maxRooms": 20})
+    assert response.headers["X-Cache"] == "MISS"
+    response = client.get("/scrape", params={**body, "fields": "currency,rooms", "max_rooms": 20})
+    assert response.headers["X-Cache"] == "HIT"
+    assert calls == [(None, None, None), ({"rooms", "currency"}, 20, None)]
+
+    assert client.post("/scrape", json={**body, "fields": "price"}).status_code == 400
+    assert client.post("/scrape", json={**body, "maxRooms": 0}).status_code == 400
+    assert client.post("/scrape", json={**body, "fields": "rooms", "delta": True}).status_code == 400
+
+def test_job_runs_in_background(monkeypatch):
+    with make_client(monkeypatch) as client:
+        items = [{"url": f"{HOTEL_URL}-{i}", "checkin": "2024-01-15"} for i in range(3)]
+        items.append({"url": "https://www.booking.com/hotel/fr/broken", "checkin": "2024-01-15"})
+        response = client.post("/jobs", json={"items": items})
+        assert response.status_code == 202
+        job_id = response.json()["jobId"]
+
+        status = client.get(f"/jobs/{job_id}", params={"wait": 5}).json()
+        results = status["results"]
+        while status["status"] != "done":
+            status = client.get(f"/jobs/{job_id}", params={"wait": 5, "since": status["version"]}).json()
+            results += status["results"]
+        assert (status["completed"], status["failed"]) == (4, 1)
+        assert sorted(result["index"] for result in results) == [0, 1, 2, 3]
+
+        events = client.get(f"/jobs/{job_id}/events").text
+        assert events.count("event: result") == 4
+        assert events.rstrip().splitlines()[-2] == "event: done"
+
+def test_job_validation_and_expiry(monkeypatch):
+    with make_client(monkeypatch) as client:
+        assert client.post("/jobs", json={"items": []}).status_code == 400
+        assert client.get("/jobs/unknown").status_code == 404
+
+def test_job_workers_interleave_jobs():
+    from jobs import JobManager
+    started = []
+
+    async def run_item(index, item):
+        started.append(item)
+        await asyncio.sleep(0)
+        return {"index": index, "success": True}
+
+    async def run():
+        manager = JobManager(run_item, workers=1)
+        manager.submit([f"big-{i}" for i in range(4)])
+        small = manager.submit(["small-0"])
+        await small.wait(0, 5)
+        await manager.close()
+
+    asyncio.run(run())
+    assert started.index("small-0") <= 2
+
+def test_watchlist_endpoints(monkeypatch):
+    with make_client(monkeypatch) as client:
+        assert client.post("/watchlist", json={"url": "https://example.com/hotel"}).status_code == 400
+        response = client.post("/watchlist", json={"url": HOTEL_URL, "days": 3})
+        assert response.status_code == 201
+        entry = response.json()
+        assert entry in client.get("/watchlist").json()
+        assert client.get("/stats/scheduler").json()["targets"] >= 3
+        assert client.delete(f"/watchlist/{entry['id']}").status_code == 200
+        assert client.delete(f"/watchlist/{entry['id']}").status_code == 404
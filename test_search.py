@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for search-result page scraping against saved result pages
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import search
+from parsers import PARSERS, get_parser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+SEARCH_URL = "https://www.booking.com/searchresults.en-gb.html?ss=Paris&rows=3"
+
+def fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+def parse(name: str, backend: str = "soup") -> dict:
+    page = search.parse_search_page(fixture(name), SEARCH_URL, "2024-03-10", get_parser(backend))
+    for hotel in page["hotels"]:
+        hotel.pop("scrapeDate")
+    return page
+
+@pytest.mark.parametrize("backend", [name for name in PARSERS if name != "soup"])
+@pytest.mark.parametrize("name", ["search_paris_page1.html", "search_lyon_legacy.html"])
+def test_backend_matches_soup(backend, name):
+    assert parse(name, backend) == parse(name, "soup")
+
+def test_property_cards_in_hotel_data_shape():
+    page = parse("search_paris_page1.html")
+    assert (page["totalPages"], page["totalResults"]) == (3, 7)
+    first, _, sold_out = page["hotels"]
+    assert first["hotelKey"] == "fr/grand-plaza"
+    assert first["url"] == "https://www.booking.com/hotel/fr/grand-plaza.en-gb.html"
+    assert (first["hotelName"], first["currency"], first["rating"]["overall"]) == ("Grand Plaza Hotel", "EUR", 8.6)
+    # The headline price is the discounted one, not the struck-through original
+    room = first["rooms"][0]
+    assert (room["roomId"], room["name"], room["price"], room["refundable"]) == \
+        ("fr_room_0", "Deluxe Double Room", 1240.0, True)
+    assert sold_out["rooms"][0]["available"] is False and sold_out["currency"] == "EUR"
+
+    legacy = parse("search_lyon_legacy.html")
+    assert (legacy["totalPages"], legacy["totalResults"]) == (None, 2)
+    assert [hotel["hotelKey"] for hotel in legacy["hotels"]] == ["fr/les-terrasses", "fr/hostel-croix-rousse"]
+    assert legacy["hotels"][0]["hotelName"] == "Les Terrasses"
+    assert legacy["hotels"][0]["rooms"][0]["price"] == 1050.0 and legacy["hotels"][0]["currency"] == "USD"
+
+def fixture_client(fail_offsets=(), latency=0.0):
+    """Client answering result pages from the fixtures by offset; tracks requests in flight"""
+    pages = {0: "search_paris_page1.html", 3: "search_paris_page2.html", 6: "search_paris_page3.html"}
+    state = {"in_flight": 0, "max_in_flight": 0, "offsets": []}
+
+    async def handler(request):
+        offset = int(request.url.params.get("offset", "0"))
+        state["offsets"].append(offset)
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(latency)
+        state["in_flight"] -= 1
+        if offset in fail_offsets or offset not in pages:
+            return httpx.Response(404)
+        return httpx.Response(200, content=fixture(pages[offset]))
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), state
+
+def run_search(client, **options) -> dict:
+    async def run():
+        async with client:
+            return await search.async_scrape_search(SEARCH_URL, "2024-03-10", client=client, **options)
+    return asyncio.run(run())
+
+def test_follows_pagination_with_bounded_concurrency():
+    client, state = fixture_client(latency=0.05)
+    result = run_search(client, concurrency=1)
+    assert sorted(state["offsets"]) == [0, 3, 6] and state["max_in_flight"] == 1
+    assert (result["pages"], result["totalPages"], result["errors"]) == (3, 3, {})
+    # Grand Plaza is promoted again on page 2 and kept once, in listing order
+    assert [hotel["hotelKey"] for hotel in result["hotels"]] == [
+        "fr/grand-plaza", "fr/le-marais-lodge", "fr/hotel-du-parc", "fr/rive-gauche-suites",
+        "fr/montmartre-view", "fr/gare-du-nord-inn"]
+    assert all("offset=" not in hotel["url"] for hotel in result["hotels"])
+
+    client, state = fixture_client(fail_offsets={3})
+    result = run_search(client, max_pages=2)
+    assert sorted(state["offsets"]) == [0, 3]
+    assert list(result["errors"]) == ["3"] and len(result["hotels"]) == 3
+
+    client, _ = fixture_client(fail_offsets={0})
+    assert "error" in run_search(client)
+
+def test_search_endpoint(monkeypatch):
+    async def fake_search(url, checkin, max_pages, concurrency):
+        return {"searchUrl": url, "checkInDate": checkin, "hotels": [], "pages": max_pages}
+
+    monkeypatch.setattr(api, "async_scrape_search", fake_search)
+    client = TestClient(api.app)
+    body = {"url": SEARCH_URL, "checkin": "2024-03-10", "maxPages": 2}
+    response = client.post("/scrape/search", json=body)
+    assert response.json()["success"] is True and response.json()["data"]["pages"] == 2
+    assert client.post("/scrape/search", json={**body, "maxPages": 0}).status_code == 400
+    assert client.post("/scrape/search", json={**body, "url": "https://example.com/s"}).status_code == 400
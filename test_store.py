@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite price-history store
+"""
+
+import sys
+import os
+import sqlite3
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import pytest
+
+import scrape
+import store
+from pages import render_hotel_page
+from standin import start_standin_server
+from store import PriceStore
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+def hotel_result(checkin="2024-01-15", scraped_at="2024-01-10T08:00:00", rooms=3, seed=0, name=None):
+    page = render_hotel_page(rooms=rooms, seed=seed).encode("utf-8")
+    result = scrape.parse_hotel_page(page, URL, checkin)
+    result["scrapeDate"] = scraped_at
+    if name:
+        result["hotelName"] = name
+    return result
+
+def test_batches_upsert_hotels_and_rooms_by_key(tmp_path):
+    db = PriceStore(str(tmp_path / "prices.db"), batch_size=2, delta=False)
+    assert not db.add("fr/grand-plaza", hotel_result())
+    # The same hotel renamed, and a second hotel from the same country
+    assert db.add("fr/grand-plaza", hotel_result(scraped_at="2024-01-11T08:00:00", name="Grand Plaza Paris"))
+    assert db.flush() == 6
+    db.add("fr/other-hotel", hotel_result(seed=1))
+    assert db.add("fr/other-hotel", {"error": "timeout", "checkInDate": "2024-01-15"}) is False
+    db.close()
+
+    reopened = PriceStore(str(tmp_path / "prices.db"))
+    stats = reopened.stats()
+    assert (stats["hotels"], stats["rooms"], stats["daily_prices"], stats["pending"]) == (2, 6, 9, 0)
+    history = reopened.price_history("fr/grand-plaza", room_id="fr_room_0")
+    assert [row["scrapeDate"] for row in history] == ["2024-01-10T08:00:00", "2024-01-11T08:00:00"]
+    assert history[0]["price"] > 0 and history[0]["currency"] == "EUR"
+    name = reopened._conn.execute("SELECT name FROM hotels WHERE hotel_id = 'fr/grand-plaza'").fetchone()[0]
+    assert name == "Grand Plaza Paris"
+    reopened.close()
+
+def test_storing_a_scrape_twice_keeps_one_row_per_room(tmp_path):
+    db = PriceStore(str(tmp_path / "prices.db"), delta=False)
+    result = hotel_result()
+    assert db.add_many([("fr/grand-plaza", result), ("fr/grand-plaza", result)]) == 6
+    assert db.stats()["daily_prices"] == 3
+    indexes = db._conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                               "AND tbl_name = 'daily_prices'").fetchall()
+    assert ("daily_prices_by_check_in",) in indexes
+    db.close()
+
+def test_failed_flush_keeps_the_batch(tmp_path, monkeypatch):
+    db = PriceStore(str(tmp_path / "prices.db"), delta=False)
+    db.add("fr/grand-plaza", hotel_result())
+    update_rollups = store.update_rollups
+
+    def failing_rollups(conn, rows, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "update_rollups", failing_rollups)
+    with pytest.raises(sqlite3.OperationalError):
+        db.flush()
+    # Nothing of the failed transaction is kept, and the results stay buffered
+    db.add("fr/other-hotel", hotel_result(seed=1))
+    stats = db.stats()
+    assert (stats["hotels"], stats["daily_prices"], stats["pending"]) == (0, 0, 2)
+
+    monkeypatch.setattr(store, "update_rollups", update_rollups)
+    assert db.flush() == 6
+    assert db.stats()["hotels"] == 2 and db.rows_written == 6
+    db.close()
+
+def test_scrapes_are_stored_when_configured(tmp_path, monkeypatch):
+    server, base_url = start_standin_server(rooms=2)
+    monkeypatch.setattr(store, "STORE_PATH", str(tmp_path / "prices.db"))
+    try:
+        # A limited scrape lacks rooms the store would otherwise record as gone
+        limited = scrape.scrape_booking(f"{base_url}/hotel/xx/grand-plaza.html", "2024-01-15", max_rooms=1)
+        assert len(limited["rooms"]) == 1
+        assert store.get_store().stats()["pending"] == 0
+        assert store.get_store().query(lambda conn: conn.execute("SELECT COUNT(*) FROM room_state").fetchone()[0]) == 0
+        result = scrape.scrape_booking(f"{base_url}/hotel/xx/grand-plaza.html", "2024-01-15")
+    finally:
+        server.shutdown()
+        store.close_store()
+
+    assert "error" not in result
+    db = PriceStore(str(tmp_path / "prices.db"))
+    history = db.price_history("xx/grand-plaza", check_in="2024-01-15")
+    assert [row["roomId"] for row in history] == [room["roomId"] for room in result["rooms"]]
+    db.close()
+
+def test_delta_mode_writes_only_changed_rooms(tmp_path):
+    db = PriceStore(str(tmp_path / "prices.db"))
+    first = hotel_result(scraped_at="2024-01-10T08:00:00")
+    same = hotel_result(scraped_at="2024-01-10T09:00:00")
+    changed = hotel_result(scraped_at="2024-01-10T10:00:00", rooms=2)
+    changed["rooms"][1] = dict(changed["rooms"][1], price=1.0)
+    late = hotel_result(scraped_at="2024-01-10T08:30:00", seed=5)
+    assert db.add_many([("fr/grand-plaza", first), ("fr/grand-plaza", same), ("fr/grand-plaza", changed),
+                        ("fr/grand-plaza", late)]) == 5
+    # 3 rooms first, then room 1 repriced and room 2 gone; the late result is older than the state
+    rows = [(row["roomId"], row["scrapeDate"], row["available"]) for row in db.price_history("fr/grand-plaza")]
+    assert rows[3:] == [("fr_room_1", "2024-01-10T10:00:00", True), ("fr_room_2", "2024-01-10T10:00:00", False)]
+    assert db.rows_unchanged == 4
+    db.close()
+
+def test_compaction_collapses_runs_of_identical_rows(tmp_path):
+    path = str(tmp_path / "prices.db")
+    db = PriceStore(path, delta=False)
+    prices = [100.0, 100.0, 120.0, 120.0, 100.0, 100.0]
+    for hour, price in enumerate(prices):
+        result = hotel_result(scraped_at=f"2024-01-10T{hour:02d}:00:00", rooms=1)
+        result["rooms"][0]["price"] = price
+        db.add("fr/grand-plaza", result)
+    db.flush()
+    assert db.compact() == {"rows": 6, "removed": 3}
+    assert [row["price"] for row in db.price_history("fr/grand-plaza")] == [100.0, 120.0, 100.0]
+    db.close()
+
+    # The compacted store continues in delta mode from its last row
+    reopened = PriceStore(path)
+    result = hotel_result(scraped_at="2024-01-10T07:00:00", rooms=1)
+    result["rooms"][0]["price"] = 100.0
+    assert reopened.add_many([("fr/grand-plaza", result)]) == 0
+    reopened.close()
+
+def test_compaction_does_not_seed_vanished_rooms(tmp_path):
+    db = PriceStore(str(tmp_path / "prices.db"))
+    db.add_many([("fr/grand-plaza", hotel_result(rooms=3))])
+    # fr_room_2 is gone from the next scrape, which delta mode records with a row
+    assert db.add_many([("fr/grand-plaza", hotel_result(scraped_at="2024-01-11T08:00:00", rooms=2))]) == 1
+    # A store whose room state was lost (or never written) gets it from the rows
+    db._conn.execute("DELETE FROM room_state")
+    db.compact()
+    seeded = db._conn.execute("SELECT room_id FROM room_state ORDER BY room_id").fetchall()
+    assert seeded == [("fr_room_0",), ("fr_room_1",)]
+    assert db.add_many([("fr/grand-plaza", hotel_result(scraped_at="2024-01-12T08:00:00", rooms=2))]) == 0
+    db.close()
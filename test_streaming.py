@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming, early-terminating page parsing
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper', 'benchmarks'))
+
+import pytest
+
+import scrape
+from metrics import DOWNLOADED_BYTES, STREAM_EARLY_STOPS
+from pages import render_hotel_page
+import parsers
+from parsers import get_parser
+from selector_registry import registry
+from standin import start_standin_server
+from streaming import StreamingPage
+
+URL = "https://www.booking.com/hotel/fr/grand-plaza.html?checkin=2024-01-15"
+
+def without_scrape_date(result):
+    return {k: v for k, v in result.items() if k != "scrapeDate"}
+
+def stream_parse(content, chunk_size):
+    parser = get_parser("lxml")
+    page = StreamingPage(parser)
+    for i in range(0, len(content), chunk_size):
+        if page.feed(content[i:i + chunk_size]):
+            break
+    root = page.close()
+    layout = scrape.page_layout(page.received, page.head)
+    return page, scrape.extract_hotel_data(parser, root, layout, URL, "2024-01-15")
+
+@pytest.mark.parametrize("chunk_size", [64, 1024, 16384])
+def test_stops_after_the_sections_and_extracts_the_same_data(chunk_size):
+    content = render_hotel_page(rooms=5, amenities=12, padding_kb=200).encode("utf-8")
+    page, result = stream_parse(content, chunk_size)
+    assert page.complete
+    assert page.bytes_fed < 40 * 1024
+    expected = scrape.parse_hotel_page(content, URL, "2024-01-15", get_parser("lxml"))
+    assert without_scrape_date(result) == without_scrape_date(expected)
+    assert len(result["amenities"]) == 10
+
+def test_sections_after_the_first_4kb_pass_the_selector_precheck():
+    # The facilities push the room table well past the head used for the layout fingerprint
+    content = render_hotel_page(rooms=8, amenities=80, padding_kb=20).encode("utf-8")
+    assert content.find(b"hprt-table") > 4096
+    registry.reset()
+    try:
+        # Lookups on this layout that mostly miss turn the token precheck on
+        layout = scrape.page_layout(content)
+        for group in ("rooms", "room_name", "price", "occupancy"):
+            registry.record(group, layout, None, 1)
+        page, result = stream_parse(content, 1024)
+        assert page.complete
+        expected = scrape.parse_hotel_page(content, URL, "2024-01-15", get_parser("lxml"))
+        assert without_scrape_date(result) == without_scrape_date(expected)
+        assert len(result["rooms"]) == scrape.MAX_ROOMS
+    finally:
+        registry.reset()
+
+def test_page_missing_a_section_is_read_to_the_end():
+    content = render_hotel_page(rooms=0, padding_kb=50).encode("utf-8")
+    page, result = stream_parse(content, 4096)
+    assert not page.complete
+    assert page.bytes_fed == len(content)
+    expected = scrape.parse_hotel_page(content, URL, "2024-01-15", get_parser("lxml"))
+    assert without_scrape_date(result) == without_scrape_date(expected)
+
+def test_streamed_scrape_downloads_less(monkeypatch):
+    server, base_url = start_standin_server(rooms=3, padding_kb=500)
+    url = f"{base_url}/hotel/xx/grand-plaza.html"
+
+    async def scrape_twice():
+        async with scrape.new_async_client() as client:
+            buffered = await scrape.async_scrape_booking(url, "2024-01-15", client)
+            buffered_bytes = DOWNLOADED_BYTES.value()
+            monkeypatch.setattr(scrape, "STREAM_PARSE", True)
+            # Streaming needs the lxml backend
+            monkeypatch.setattr(parsers, "DEFAULT_PARSER", "lxml")
+            streamed = await scrape.async_scrape_booking(url, "2024-01-15", client)
+            return buffered, buffered_bytes, streamed
+
+    DOWNLOADED_BYTES.reset()
+    STREAM_EARLY_STOPS.reset()
+    try:
+        buffered, buffered_bytes, streamed = asyncio.run(scrape_twice())
+    finally:
+        server.shutdown()
+
+    assert "error" not in streamed
+    assert without_scrape_date(streamed) == without_scrape_date(buffered)
+    assert len(streamed["rooms"]) == 3
+    assert STREAM_EARLY_STOPS.value() == 1
+    streamed_bytes = DOWNLOADED_BYTES.value() - buffered_bytes
+    assert streamed_bytes < buffered_bytes / 5
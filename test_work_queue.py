@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared lease-based work queue
+"""
+
+import sys
+import os
+import asyncio
+import multiprocessing
+import sqlite3
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
+
+from fastapi.testclient import TestClient
+
+import api
+from work_queue import QueueNode, WorkQueue
+
+HOTEL_URL = "https://www.booking.com/hotel/fr/grand-plaza.html"
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+def items(count, hotel="fr/grand-plaza"):
+    return [(hotel, HOTEL_URL, f"2024-03-{day:02d}") for day in range(1, count + 1)]
+
+def test_enqueue_is_idempotent_per_hotel_and_checkin(tmp_path):
+    clock = Clock()
+    queue = WorkQueue(str(tmp_path / "queue.db"), clock=clock)
+    assert queue.enqueue(items(3)) == {"added": 3, "duplicates": 0}
+    # Waiting or in-flight pairs are not queued twice
+    [task] = queue.acquire("a", 1)
+    assert queue.start(task)
+    assert queue.enqueue(items(3)) == {"added": 0, "duplicates": 3}
+    assert queue.finish(task, "a")
+
+    # A pair finished recently is fresh; older results are queued again
+    clock.now += 10
+    assert queue.enqueue(items(1), fresh_for=60) == {"added": 0, "duplicates": 1}
+    assert queue.enqueue(items(1), fresh_for=5) == {"added": 1, "duplicates": 0}
+    stats = queue.stats()
+    assert stats["tasks"]["queued"] == 3 and stats["completed"] == 1 and stats["duplicates"] == 4
+
+def test_expired_lease_is_reclaimed_and_fenced(tmp_path):
+    clock = Clock()
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=30, max_attempts=2, retry_delay=10, clock=clock)
+    queue.enqueue(items(1))
+    [task] = queue.acquire("a", 4)
+    assert queue.start(task)
+    clock.now += 20
+    assert queue.heartbeat("a", [(task.key, task.lease_id)]) == {(task.key, task.lease_id)}
+    clock.now += 40
+    # a stopped heartbeating: b gets the task, and a can no longer finish it
+    [retry] = queue.acquire("b", 4)
+    assert retry.key == task.key and retry.lease_id != task.lease_id
+    assert queue.start(retry) and retry.attempts == 2
+    assert not queue.finish(task, "a")
+    # The last attempt fails for good
+    assert queue.finish(retry, "b", error="Server error '503'")
+    stats = queue.stats()
+    assert stats["tasks"]["failed"] == 1 and (stats["reclaimed"], stats["failed"]) == (1, 1)
+
+    # A failure before the last attempt is retried after the backoff
+    queue.enqueue(items(1, "fr/other"))
+    [task] = queue.acquire("a", 1)
+    queue.start(task)
+    queue.finish(task, "a", error="timeout")
+    assert queue.acquire("a", 1) == []
+    clock.now += 10
+    assert [task.key for task in queue.acquire("a", 1)] == ["fr/other|2024-03-01"]
+
+def test_idle_node_steals_prefetched_tasks(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), clock=Clock())
+    queue.enqueue(items(6))
+    prefetched = queue.acquire("a", 6)
+    assert [task.checkin for task in prefetched] == [f"2024-03-0{day}" for day in range(1, 7)]
+    # b finds nothing queued and takes the half a would start last
+    stolen = queue.acquire("b", 10)
+    assert [task.checkin for task in stolen] == ["2024-03-04", "2024-03-05", "2024-03-06"]
+    assert [queue.start(task) for task in prefetched] == [True] * 3 + [False] * 3
+    assert all(queue.start(task) for task in stolen)
+    assert queue.stats()["stolen"] == 3
+
+    # A node shutting down hands its tasks back without using up an attempt
+    assert queue.release("b") == 3
+    assert {task.attempts for task in queue.acquire("c", 10)} == {0}
+
+def test_node_survives_queue_and_callback_errors(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.3)
+    queue.enqueue(items(4))
+    finish = queue.finish
+    calls = []
+
+    def flaky_finish(task, node_id, error=None):
+        calls.append(task.key)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return finish(task, node_id, error)
+
+    def on_result(url, checkin, result):
+        if checkin == "2024-03-02":
+            raise RuntimeError("cache full")
+
+    async def scrape(url, checkin):
+        await asyncio.sleep(0.01)
+        return {"checkInDate": checkin}
+
+    async def run():
+        node = QueueNode(queue, scrape, on_result, node_id="a", concurrency=1, prefetch=1, poll_interval=0.05)
+        node.start()
+        deadline = time.monotonic() + 10
+        while queue.stats()["tasks"]["done"] < 4 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await node.stop()
+        return node.stats()
+
+    queue.finish = flaky_finish
+    node_stats = asyncio.run(run())
+    stats = queue.stats()
+    # The task whose finish failed was no longer heartbeated: its lease ran out and it ran again
+    assert stats["tasks"]["done"] == 4 and stats["reclaimed"] == 1
+    assert calls.count(calls[0]) == 2 and node_stats["errors"] == 1
+
+def run_node(path, node_id, latency):
+    """Process body: a queue node whose scrapes sleep for latency seconds"""
+    async def scrape(url, checkin):
+        await asyncio.sleep(latency)
+        return {"checkInDate": checkin}
+
+    async def main():
+        queue = WorkQueue(path, lease_seconds=1.0)
+        node = QueueNode(queue, scrape, node_id=node_id, concurrency=2, prefetch=4, poll_interval=0.05)
+        node.start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+def test_killed_nodes_tasks_are_finished_by_the_others(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = WorkQueue(path, lease_seconds=1.0)
+    queue.enqueue(items(24, "fr/a") + items(24, "fr/b"))
+    context = multiprocessing.get_context("spawn")
+    nodes = {f"node-{i}": context.Process(target=run_node, args=(path, f"node-{i}", 0.1), daemon=True)
+             for i in range(3)}
+    for process in nodes.values():
+        process.start()
+    try:
+        # Kill two nodes while they are in the middle of scrapes
+        victims = ["node-0", "node-1"]
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            running = {node["nodeId"] for node in queue.stats()["nodes"] if node["running"]}
+            if set(victims) <= running:
+                break
+            time.sleep(0.02)
+        for node_id in victims:
+            nodes[node_id].kill()
+            nodes[node_id].join()
+        held = {key for (key,) in queue._conn.execute(
+            "SELECT task_key FROM tasks WHERE owner IN (?, ?)", victims)}
+        assert held
+
+        while time.monotonic() < deadline and queue.stats()["tasks"]["done"] < 48:
+            time.sleep(0.1)
+        stats = queue.stats()
+        assert stats["tasks"]["done"] == 48 and stats["failed"] == 0
+        assert stats["reclaimed"] >= len(held)
+        # What the killed nodes held was finished by the survivor
+        finished_by = dict(queue._conn.execute("SELECT task_key, finished_by FROM tasks").fetchall())
+        assert {finished_by[key] for key in held} == {"node-2"}
+        assert [node["nodeId"] for node in stats["nodes"]] == ["node-2"]
+    finally:
+        for process in nodes.values():
+            process.kill()
+            process.join()
+
+def test_queue_endpoint(tmp_path, monkeypatch):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    monkeypatch.setattr(api, "get_queue", lambda: queue)
+    client = TestClient(api.app)
+    body = {"items": [{"url": HOTEL_URL, "checkin": "2024-03-01"},
+                      {"url": HOTEL_URL.replace(".html", ".en-gb.html"), "checkin": "2024-03-01"}]}
+    # The second URL spells the same hotel differently
+    assert client.post("/queue", json=body).json() == {"added": 1, "duplicates": 1}
+    assert client.post("/queue", json={"items": [{"url": "https://example.com/h", "checkin": "2024-03-01"}]}) \
+        .status_code == 400
+    stats = client.get("/stats/queue").json()
+    assert stats["enabled"] is True and stats["tasks"]["queued"] == 1
+
+    monkeypatch.setattr(api, "get_queue", lambda: None)
+    assert client.post("/queue", json=body).status_code == 503